@@ -5,7 +5,9 @@ from flask_bcrypt import Bcrypt
 from datetime import datetime, timedelta
 import os
 from dotenv import load_dotenv
-from mongoengine import connect, disconnect
+import database
+import metrics
+import slow_queries
 
 # Load environment variables
 load_dotenv()
@@ -14,6 +16,17 @@ load_dotenv()
 jwt = JWTManager()
 bcrypt = Bcrypt()
 
+# Authenticated requests load their user once, through a short-lived cache;
+# handlers get it with get_current_user()
+@jwt.user_lookup_loader
+def load_current_user(_jwt_header, jwt_data):
+    import cache
+    return cache.load_user(jwt_data['sub'])
+
+@jwt.user_lookup_error_loader
+def current_user_not_found(_jwt_header, jwt_data):
+    return jsonify({'error': 'User not found'}), 404
+
 def create_app():
     app = Flask(__name__)
     
@@ -21,19 +34,23 @@ def create_app():
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-here')
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string')
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
-    
-    # MongoDB Configuration
-    mongodb_uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017/hotels_reserved')
+    app.config['BCRYPT_LOG_ROUNDS'] = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
     
     # Initialize extensions with app
     jwt.init_app(app)
     bcrypt.init_app(app)
     CORS(app)
+    # Request hooks and MongoDB listeners; before connecting, so the client
+    # gets the listeners
+    metrics.init_app(app)
+    slow_queries.init_app(app)
     
-    # Connect to MongoDB
+    # Register the MongoDB connection. No socket is opened until the first
+    # query, so a preforking server can import the app before forking
+    # workers; see gunicorn.conf.py.
     try:
-        connect(host=mongodb_uri)
-        print(f"Connected to MongoDB: {mongodb_uri}")
+        database.connect()
+        print(f"Connected to MongoDB: {database.mongodb_uri()}")
     except Exception as e:
         print(f"Failed to connect to MongoDB: {e}")
     
@@ -52,7 +69,23 @@ def create_app():
     
     @app.route('/api/health')
     def health_check():
-        return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+        import cache
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'hotel_cache': cache.hotels.stats()
+        })
+    
+    if metrics.ENABLED:
+        @app.route('/api/metrics')
+        def metrics_endpoint():
+            if not metrics.scrape_allowed(request.remote_addr):
+                from flask_jwt_extended import verify_jwt_in_request
+                from routes.hotels import _require_admin
+                verify_jwt_in_request()
+                if not _require_admin():
+                    return jsonify({'error': 'Admin privileges required'}), 403
+            return metrics.render(), 200, {'Content-Type': metrics.CONTENT_TYPE}
     
     return app
 
@@ -60,8 +93,15 @@ def create_app():
 app = create_app()
 
 if __name__ == '__main__':
+    # Development server; production runs gunicorn with gunicorn.conf.py.
+    # Open the pool and build the typeahead index up front; if MongoDB is not
+    # reachable yet the index is built on the first /api/hotels/suggest request
+    try:
+        database.warm_up()
+    except Exception as e:
+        print(f"Failed to warm up: {e}")
     try:
         app.run(debug=True, host='0.0.0.0', port=5000)
     finally:
         # Disconnect from MongoDB when shutting down
-        disconnect()
+        database.disconnect()
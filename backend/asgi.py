@@ -0,0 +1,71 @@
+"""
+ASGI deployment of the hotel and booking APIs (Quart + Motor).
+
+Serves the public /api/hotels routes and all /api/bookings routes with the
+same validation, models and responses as the Flask app, but on an event loop
+with an async MongoDB driver: a request waiting on MongoDB holds no thread, so
+one process can keep thousands of slow clients in flight. The models supply
+collection names, indexes and validation; every query goes through Motor.
+Authentication and admin routes stay on the Flask app (app.py), whose tokens
+this app accepts.
+
+    hypercorn asgi:app --bind 0.0.0.0:5001
+
+Configuration (environment), besides MONGODB_URI, JWT_SECRET_KEY and the
+MONGO_* pool settings of database.py:
+    ASYNC_MONGO_MAX_POOL_SIZE    Motor connection pool size, overriding MONGO_MAX_POOL_SIZE
+"""
+from datetime import datetime, timedelta
+import os
+
+from dotenv import load_dotenv
+from quart import Quart, jsonify
+from quart_cors import cors
+
+import async_support
+import database
+
+load_dotenv()
+
+
+def create_app():
+    app = Quart(__name__)
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'jwt-secret-string')
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=1)
+    app = cors(app)
+
+    mongodb_uri = database.mongodb_uri()
+
+    @app.before_serving
+    async def open_database():
+        # Motor binds to the running event loop, so connect inside it
+        options = database.pool_options()
+        if os.getenv('ASYNC_MONGO_MAX_POOL_SIZE'):
+            options['maxPoolSize'] = int(os.getenv('ASYNC_MONGO_MAX_POOL_SIZE'))
+        async_support.connect(mongodb_uri, **options)
+        from models import User, Hotel, Booking, HotelNight
+        await async_support.ensure_indexes(User, Hotel, Booking, HotelNight)
+        print(f"Connected to MongoDB (async): {mongodb_uri}")
+
+    @app.after_serving
+    async def close_database():
+        async_support.close()
+
+    from routes.async_hotels import async_hotels_bp
+    from routes.async_bookings import async_bookings_bp
+
+    app.register_blueprint(async_hotels_bp, url_prefix='/api/hotels')
+    app.register_blueprint(async_bookings_bp, url_prefix='/api/bookings')
+
+    @app.route('/api/health')
+    async def health_check():
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'server': 'asgi',
+            'hotel_cache': async_support.hotels.stats()
+        })
+
+    return app
+
+app = create_app()
@@ -0,0 +1,139 @@
+"""
+Database access and authentication for the ASGI variant of the API (asgi.py).
+
+The ASGI routes talk to MongoDB through Motor, so a request waiting on the
+database holds no thread. They read and write the same collections as the
+mongoengine models (collection names come from the model classes) and use
+the raw document shapes the sync routes already read with as_pymongo().
+
+Access tokens are the ones issued by /api/auth on the Flask app: HS256 JWTs
+signed with JWT_SECRET_KEY, whose subject is the user id.
+"""
+from functools import wraps
+import os
+
+from bson import ObjectId
+import jwt
+from quart import current_app, g, jsonify, request
+
+import cache
+import catalog
+
+_client = None
+_db = None
+
+# Raw hotel and user documents, per process, with the same limits as the
+# caches of the WSGI app. Like cache.HotelCache, the hotels are dropped when
+# the catalog version changes.
+hotels = cache.TTLCache(
+    maxsize=int(os.getenv('HOTEL_CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('HOTEL_CACHE_TTL', '60'))
+)
+hotel_catalog = catalog.VersionWatch(float(os.getenv('HOTEL_CACHE_VERSION_CHECK', '1')))
+users = cache.TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', '4096')),
+    ttl=int(os.getenv('USER_CACHE_TTL', '30'))
+)
+
+
+def connect(uri, **options):
+    """Create the Motor client; call from inside the server's event loop"""
+    global _client, _db
+    from motor.motor_asyncio import AsyncIOMotorClient
+    _client = AsyncIOMotorClient(uri, **options)
+    _db = _client.get_default_database('hotels_reserved')
+
+
+def close():
+    global _client, _db
+    if _client is not None:
+        _client.close()
+    _client = _db = None
+
+
+async def ensure_indexes(*models):
+    """
+    Create the indexes declared in the models' meta, as mongoengine does for
+    the Flask app. The ledger depends on the unique (hotel, night) index.
+    """
+    for model in models:
+        for spec in model._meta['index_specs']:
+            spec = dict(spec)
+            await collection(model).create_index(spec.pop('fields'), **spec)
+
+
+def collection(model):
+    """Motor collection backing a mongoengine Document class"""
+    return _db[model._get_collection_name()]
+
+
+def object_id(value):
+    """ObjectId for a path or body id, or None if it is not one"""
+    return ObjectId(value) if ObjectId.is_valid(value) else None
+
+
+async def _sync_catalog():
+    """Drop the cached hotels when a hotel was written, possibly by another worker"""
+    from models import CatalogState
+    if not hotel_catalog.due():
+        return
+    state = await collection(CatalogState).find_one({'_id': catalog.CATALOG}, {'version': 1})
+    if hotel_catalog.seen(state.get('version', 0) if state else 0):
+        hotels.clear()
+
+
+async def load_hotel(hotel_id):
+    """Raw hotel document with this id, or None if it does not exist"""
+    from models import Hotel
+    await _sync_catalog()
+    key = str(hotel_id)
+    found, hotel = hotels.get(key)
+    if found:
+        return hotel
+    oid = object_id(hotel_id)
+    hotel = await collection(Hotel).find_one({'_id': oid}) if oid else None
+    if hotel is not None:
+        hotels.set(key, hotel)
+    return hotel
+
+
+async def load_user(user_id):
+    from models import User
+    key = str(user_id)
+    found, user = users.get(key)
+    if found:
+        return user
+    oid = object_id(user_id)
+    user = await collection(User).find_one({'_id': oid}, {'password_hash': 0}) if oid else None
+    if user is not None:
+        users.set(key, user)
+    return user
+
+
+def jwt_required(view):
+    """
+    Async counterpart of flask_jwt_extended's jwt_required(): verifies the
+    Bearer access token and loads its user into ``g.user`` (and the token
+    claims into ``g.jwt``). Error responses match the Flask app.
+    """
+    @wraps(view)
+    async def wrapper(*args, **kwargs):
+        header = request.headers.get('Authorization', '')
+        if not header.startswith('Bearer '):
+            return jsonify({'msg': 'Missing Authorization Header'}), 401
+        try:
+            claims = jwt.decode(header[len('Bearer '):], current_app.config['JWT_SECRET_KEY'], algorithms=['HS256'])
+        except jwt.ExpiredSignatureError:
+            return jsonify({'msg': 'Token has expired'}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({'msg': str(e)}), 422
+        if claims.get('type') != 'access':
+            return jsonify({'msg': 'Only non-refresh tokens are allowed'}), 422
+
+        user = await load_user(claims['sub'])
+        if user is None:
+            return jsonify({'error': 'User not found'}), 404
+        g.jwt = claims
+        g.user = user
+        return await view(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+WSGI vs ASGI under many concurrent, slow clients.
+
+Opens ``--clients`` concurrent connections against each running server and
+keeps them busy for ``--seconds``, one request per connection. With
+``--slow-ms`` every client trickles its request headers out over that many
+milliseconds, the way clients on bad mobile links do; a threaded server holds
+a thread per such connection, an event loop does not. Reports requests per
+second, latency percentiles and failed requests per server.
+
+Start both servers first, e.g. the Flask app on :5000 and the ASGI app with
+``hypercorn asgi:app --bind 0.0.0.0:5001``, then:
+
+    python -m benchmarks.bench_asgi --target wsgi=http://localhost:5000 \\
+        --target asgi=http://localhost:5001 --clients 1000 --slow-ms 200
+
+Raise the open file limit (ulimit -n) above --clients first. Pass --token for
+/api/bookings paths.
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+async def fetch(host, port, path, token, slow_ms, timeout):
+    request = f'GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: close\r\n'
+    if token:
+        request += f'Authorization: Bearer {token}\r\n'
+    request = (request + '\r\n').encode('ascii')
+
+    reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+    try:
+        if slow_ms:
+            # Trickle the request out in small pieces
+            pieces = [request[i:i + 16] for i in range(0, len(request), 16)]
+            for piece in pieces:
+                writer.write(piece)
+                await writer.drain()
+                await asyncio.sleep(slow_ms / 1000 / len(pieces))
+        else:
+            writer.write(request)
+            await writer.drain()
+        status_line = await asyncio.wait_for(reader.readline(), timeout)
+        await asyncio.wait_for(reader.read(), timeout)
+        return int(status_line.split()[1])
+    finally:
+        writer.close()
+
+
+async def run(url, path, clients, seconds, slow_ms, token, timeout):
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + seconds
+
+    async def client():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                status = await fetch(host, port, path, token, slow_ms, timeout)
+            except (OSError, asyncio.TimeoutError, ValueError, IndexError):
+                status = None
+            if status is not None and status < 400:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors += 1
+                await asyncio.sleep(0.01)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(clients)))
+    elapsed = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1000, 1) if value is not None else None
+
+    return {
+        'url': url + path,
+        'clients': clients,
+        'slow_ms': slow_ms,
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99))
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare WSGI and ASGI servers under concurrent slow clients')
+    parser.add_argument('--target', action='append', required=True, metavar='NAME=URL',
+                        help='server to load, e.g. asgi=http://localhost:5001 (repeatable)')
+    parser.add_argument('--path', default='/api/hotels?per_page=10')
+    parser.add_argument('--clients', type=int, default=500)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--slow-ms', type=int, default=0, help='spread each request over this many milliseconds')
+    parser.add_argument('--timeout', type=float, default=30, help='seconds before a request counts as failed')
+    parser.add_argument('--token', help='access token for authenticated paths')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for target in args.target:
+        name, _, url = target.partition('=')
+        results[name] = asyncio.run(run(url.rstrip('/'), args.path, args.clients, args.seconds,
+                                        args.slow_ms, args.token, args.timeout))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.clients} clients, {args.slow_ms} ms per request upload, {args.seconds:g}s per server, {args.path}")
+    print(f"{'server':<8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8}")
+    for name, r in results.items():
+        print(f"{name:<8} {r['requests_per_second']:>9} {r['p50_ms']!s:>9} {r['p95_ms']!s:>9} "
+              f"{r['p99_ms']!s:>9} {r['errors']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Login throughput of the password hashing pool.
+
+Drives passwords.check_password from many client threads for a fixed time at
+each bcrypt cost and reports logins per second, per second per hashing
+worker (one worker per core by default), and how many attempts were refused
+with HashingBusy. Only the hashing cost is measured; no database is needed.
+
+    python -m benchmarks.bench_auth --rounds 10 12 --seconds 5 --clients 32
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+import json
+import os
+import time
+
+from flask import Flask
+from flask_bcrypt import Bcrypt
+
+import passwords
+
+
+def run(rounds, seconds, clients):
+    app = Flask(__name__)
+    app.config['BCRYPT_LOG_ROUNDS'] = rounds
+    bcrypt = Bcrypt(app)
+    passwords._bcrypt = lambda: bcrypt
+
+    password_hash = passwords.hash_password('benchmark-password')
+    deadline = time.perf_counter() + seconds
+
+    def client(_):
+        ok = busy = 0
+        while time.perf_counter() < deadline:
+            try:
+                if passwords.check_password(password_hash, 'benchmark-password'):
+                    ok += 1
+            except passwords.HashingBusy:
+                busy += 1
+                time.sleep(0.001)
+        return ok, busy
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        results = list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    logins = sum(ok for ok, _ in results)
+    return {
+        'rounds': rounds,
+        'workers': passwords.WORKERS,
+        'clients': clients,
+        'logins_per_second': round(logins / elapsed, 1),
+        'logins_per_second_per_core': round(logins / elapsed / passwords.WORKERS, 1),
+        'busy_rejections': sum(busy for _, busy in results)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Password hashing pool throughput benchmark')
+    parser.add_argument('--rounds', type=int, nargs='+', default=[10, 12], help='bcrypt costs to measure')
+    parser.add_argument('--seconds', type=float, default=5.0, help='duration per cost')
+    parser.add_argument('--clients', type=int, default=(os.cpu_count() or 2) * 4, help='concurrent login threads')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    print(f"=== Login throughput ({passwords.WORKERS} hashing workers, {args.clients} clients) ===\n")
+    print(f"{'rounds':>6} {'logins/s':>10} {'logins/s/core':>14} {'busy':>8}")
+    results = []
+    for rounds in args.rounds:
+        r = run(rounds, args.seconds, args.clients)
+        results.append(r)
+        print(f"{r['rounds']:>6} {r['logins_per_second']:>10} {r['logins_per_second_per_core']:>14} {r['busy_rejections']:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Per-row cost of the read path: full Document hydration vs projected raw dicts.
+
+Builds a 100-row page of hotel and booking documents shaped like the ones in
+the database, BSON-encodes them as the server would send them, then times
+
+  document: decode the full document, build a mongoengine Document, copy
+            its attributes into the response dict (the old read path)
+  raw:      decode only the projected fields and map the dict straight to
+            the response dict (routes.hotels / routes.bookings today)
+
+No database is needed; network and server time are left out so the numbers
+isolate the client-side CPU and memory spent per row.
+
+    python -m benchmarks.bench_projection --rows 100 --repeat 200
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import json
+import time
+import tracemalloc
+
+import bson
+from bson import ObjectId
+
+
+def make_hotel_docs(rows):
+    docs = []
+    for i in range(rows):
+        docs.append({
+            '_id': ObjectId(),
+            'name': f'Benchmark Hotel {i}',
+            'description': 'Comfortable rooms close to the old town, with a rooftop bar, '
+                           'a breakfast buffet and friendly staff available around the clock. ' * 4,
+            'address': f'{i} Main Street',
+            'city': 'New York',
+            'state': 'NY',
+            'country': 'USA',
+            'zip_code': '10001',
+            'phone': '+1-212-555-0100',
+            'email': f'hotel{i}@example.com',
+            'website': f'https://hotel{i}.example.com',
+            'rating': 4.5,
+            'price_per_night': 199.99,
+            'total_rooms': 200,
+            'available_rooms': 150,
+            'amenities': ['WiFi', 'Pool', 'Spa', 'Gym', 'Restaurant', 'Bar', 'Room Service', 'Concierge'],
+            'images': [f'https://images.example.com/hotel{i}/{n}.jpg?w=800' for n in range(5)],
+            'created_at': datetime(2024, 1, 1),
+            'updated_at': datetime(2024, 6, 1)
+        })
+    return docs
+
+
+def make_booking_docs(rows, hotel_docs):
+    docs = []
+    for i in range(rows):
+        check_in = datetime(2025, 3, 1) + timedelta(days=i % 30)
+        docs.append({
+            '_id': ObjectId(),
+            'user': ObjectId(),
+            'hotel': hotel_docs[i % len(hotel_docs)]['_id'],
+            'check_in_date': check_in,
+            'check_out_date': check_in + timedelta(days=3),
+            'num_guests': 2,
+            'room_type': 'Deluxe King',
+            'total_price': 599.97,
+            'status': 'confirmed',
+            'special_requests': 'High floor room with city view',
+            'created_at': datetime(2025, 1, 1) + timedelta(minutes=i),
+            'updated_at': datetime(2025, 1, 1) + timedelta(minutes=i)
+        })
+    return docs
+
+
+def project(doc, fields):
+    return {k: v for k, v in doc.items() if k == '_id' or k in fields}
+
+
+def hotel_document_row(doc):
+    from models import Hotel
+    hotel = Hotel._from_son(doc)
+    return {
+        'id': str(hotel.id),
+        'name': hotel.name,
+        'description': hotel.description,
+        'address': hotel.address,
+        'city': hotel.city,
+        'state': hotel.state,
+        'country': hotel.country,
+        'rating': hotel.rating,
+        'price_per_night': hotel.price_per_night,
+        'available_rooms': hotel.available_rooms,
+        'amenities': hotel.amenities,
+        'images': hotel.images
+    }
+
+
+def booking_document_row(doc):
+    from models import Booking
+    booking = Booking._from_son(doc)
+    return {
+        'id': str(booking.id),
+        'hotel': None,
+        'check_in_date': booking.check_in_date.isoformat(),
+        'check_out_date': booking.check_out_date.isoformat(),
+        'num_guests': booking.num_guests,
+        'room_type': booking.room_type,
+        'total_price': booking.total_price,
+        'status': booking.status,
+        'special_requests': booking.special_requests,
+        'created_at': booking.created_at.isoformat()
+    }
+
+
+def measure(encoded_rows, to_row, repeat):
+    """Return (microseconds per row, peak bytes allocated for one page)"""
+    def page():
+        return [to_row(bson.decode(raw)) for raw in encoded_rows]
+
+    page()  # warm up
+    start = time.perf_counter()
+    for _ in range(repeat):
+        page()
+    per_row_us = (time.perf_counter() - start) / (repeat * len(encoded_rows)) * 1e6
+
+    tracemalloc.start()
+    result = page()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return per_row_us, peak
+
+
+def run(rows, repeat):
+    from routes.hotels import HOTEL_LIST_FIELDS, _hotel_list_item
+    from routes.bookings import BOOKING_LIST_FIELDS, _booking_list_item
+
+    hotels = make_hotel_docs(rows)
+    bookings = make_booking_docs(rows, hotels)
+
+    cases = {
+        'hotels': (
+            hotels, HOTEL_LIST_FIELDS, hotel_document_row, _hotel_list_item
+        ),
+        'bookings': (
+            bookings, BOOKING_LIST_FIELDS, booking_document_row,
+            lambda doc: _booking_list_item(doc, None)
+        )
+    }
+
+    results = {}
+    for name, (docs, fields, document_row, raw_row) in cases.items():
+        full = [bson.encode(doc) for doc in docs]
+        projected = [bson.encode(project(doc, fields)) for doc in docs]
+        doc_us, doc_peak = measure(full, document_row, repeat)
+        raw_us, raw_peak = measure(projected, raw_row, repeat)
+        results[name] = {
+            'rows': rows,
+            'bytes_per_row': {'document': sum(map(len, full)) // rows, 'raw': sum(map(len, projected)) // rows},
+            'us_per_row': {'document': round(doc_us, 2), 'raw': round(raw_us, 2)},
+            'peak_bytes_per_page': {'document': doc_peak, 'raw': raw_peak}
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Document hydration vs raw projection benchmark')
+    parser.add_argument('--rows', type=int, default=100, help='rows per page')
+    parser.add_argument('--repeat', type=int, default=200, help='pages timed per case')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    results = run(args.rows, args.repeat)
+
+    print(f"=== Read path per-row cost ({args.rows}-row pages) ===\n")
+    print(f"{'listing':<10} {'path':<9} {'bytes/row':>10} {'us/row':>8} {'peak KiB/page':>14}")
+    for name, r in results.items():
+        for path in ('document', 'raw'):
+            print(f"{name:<10} {path:<9} {r['bytes_per_row'][path]:>10} "
+                  f"{r['us_per_row'][path]:>8} {r['peak_bytes_per_page'][path] / 1024:>14.1f}")
+        speedup = r['us_per_row']['document'] / r['us_per_row']['raw']
+        print(f"{'':<10} raw path is {speedup:.1f}x faster per row\n")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+Latency, throughput and database round trips of every API route.
+
+Drives each route of the auth, hotels and bookings blueprints with
+``--requests`` requests from ``--concurrency`` client threads and reports
+requests per second, p50/p95/p99 latency, failed requests (any status the
+route should not answer with) and MongoDB round trips per request.
+
+Targets:
+
+  (default)     the Flask app in this process, through its test client,
+                against MONGODB_URI. Seed it first, e.g.
+                ``python seed_data.py --hotels 1000 --users 10000 --bookings 100000``.
+  --mongomock   the Flask app in this process against an in-memory mongomock
+                database, seeded here with seed_data.load(). Needs the
+                mongomock package; fine for comparing commits, not for
+                absolute numbers. mongomock is not thread-safe, so this
+                target defaults to one client thread. Routes that need
+                query features mongomock lacks (MONGOMOCK_UNSUPPORTED) are
+                skipped.
+  --url URL     a running server over HTTP (round trips are not measured).
+
+Round trips are the commands sent to MongoDB (find, getMore, insert, ...)
+while a request is handled, as recorded by query_budget.record_queries().
+
+Write the results to a file per commit and diff them:
+
+    python -m benchmarks.bench_routes --mongomock --output before.json
+    python -m benchmarks.bench_routes --mongomock --output after.json --compare before.json
+
+Hotels, users and bookings created or changed while benchmarking stay in the
+database.
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import date, datetime, timedelta
+from fnmatch import fnmatch
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+
+BENCH_PASSWORD = 'password123'
+
+# Routes that always fail against mongomock, with the feature it is missing
+MONGOMOCK_UNSUPPORTED = {
+    'hotels.list_available': '$lookup with let',
+    'hotels.search': '$text'
+}
+
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+class AppClient:
+    """The Flask app in this process; requests run on the calling thread"""
+
+    counts_round_trips = True
+
+    def __init__(self, app):
+        self.app = app
+
+    def request(self, method, path, json_body=None, data=None, headers=None):
+        client = self.app.test_client()
+        response = client.open(path, method=method, json=json_body, data=data, headers=headers or {})
+        body = response.get_data()
+        return response.status_code, body
+
+
+class HttpClient:
+    """A running server; one keep-alive session per client thread"""
+
+    counts_round_trips = False
+
+    def __init__(self, url):
+        import requests
+        self.url = url.rstrip('/')
+        self.requests = requests
+        self.local = threading.local()
+
+    def request(self, method, path, json_body=None, data=None, headers=None):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = self.requests.Session()
+        response = session.request(method, self.url + path, json=json_body, data=data, headers=headers or {})
+        return response.status_code, response.content
+
+
+class Context:
+    """Ids and tokens the scenarios build their requests from"""
+
+    def __init__(self, client, seed):
+        self.client = client
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.run_id = f'{int(time.time())}{random.Random().randint(0, 9999):04d}'
+        self.hotel_ids = []
+        self.cities = []
+        self.user_token = None
+        self.admin_token = None
+        self.booking_ids = []
+        self.new_hotel_ids = []
+        self.counter = 0
+        self.lock = threading.Lock()
+
+    def next(self):
+        with self.lock:
+            self.counter += 1
+            return self.counter
+
+    def call(self, method, path, token=None, **kwargs):
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        status, body = self.client.request(method, path, headers=headers, **kwargs)
+        return status, json.loads(body) if body and body[:1] in (b'{', b'[') else None
+
+    def login(self, username, password):
+        status, body = self.call('POST', '/api/auth/login', json_body={'username': username, 'password': password})
+        if status != 200:
+            raise RuntimeError(f'Login as {username} failed ({status}): {body}')
+        return body['access_token']
+
+    def stay(self, rng, nights=None):
+        check_in = date.today() + timedelta(days=rng.randint(1, 300))
+        check_out = check_in + timedelta(days=nights or rng.randint(1, 4))
+        return check_in.isoformat(), check_out.isoformat()
+
+    def new_booking(self, rng):
+        check_in, check_out = self.stay(rng)
+        return {'hotel_id': rng.choice(self.hotel_ids), 'check_in_date': check_in, 'check_out_date': check_out,
+                'num_guests': rng.randint(1, 3), 'room_type': 'Standard Queen'}
+
+    def new_hotel(self, rng, number):
+        return {'name': f'Bench Hotel {self.run_id}-{number}', 'address': f'{number} Bench Street',
+                'city': rng.choice(self.cities), 'country': 'USA', 'price_per_night': rng.randint(50, 400),
+                'total_rooms': 20, 'available_rooms': 20, 'amenities': ['WiFi']}
+
+
+def setup(ctx, admin_username, admin_password):
+    ctx.admin_token = ctx.login(admin_username, admin_password)
+    username = f'bench{ctx.run_id}'
+    status, body = ctx.call('POST', '/api/auth/register', json_body={
+        'username': username, 'email': f'{username}@example.com', 'password': BENCH_PASSWORD,
+        'first_name': 'Bench', 'last_name': 'User'
+    })
+    if status != 201:
+        raise RuntimeError(f'Registering the benchmark user failed ({status}): {body}')
+    ctx.username = username
+    ctx.user_token = body['access_token']
+
+    status, body = ctx.call('GET', '/api/hotels?per_page=100')
+    ctx.hotel_ids = [hotel['id'] for hotel in (body or {}).get('hotels', [])]
+    ctx.cities = sorted({hotel['city'] for hotel in (body or {}).get('hotels', [])})
+    if not ctx.hotel_ids:
+        raise RuntimeError('The database has no hotels; seed it first (python seed_data.py --hotels ...)')
+
+
+def _prepare_bookings(ctx, count):
+    """Bookings of the benchmark user for the detail, update and cancel routes"""
+    while len(ctx.booking_ids) < count:
+        items = [ctx.new_booking(ctx.rng) for _ in range(min(50, count - len(ctx.booking_ids)))]
+        status, body = ctx.call('POST', '/api/bookings/batch', ctx.user_token,
+                                json_body={'mode': 'best_effort', 'bookings': items})
+        created = [result['booking']['id'] for result in (body or {}).get('results', [])
+                   if result.get('status') == 'created']
+        if not created:
+            raise RuntimeError(f'Could not create bookings for the benchmark ({status}): {body}')
+        ctx.booking_ids.extend(created)
+
+
+def _prepare_hotels(ctx, count):
+    """Hotels for the admin delete route"""
+    for _ in range(count):
+        status, body = ctx.call('POST', '/api/hotels', ctx.admin_token, json_body=ctx.new_hotel(ctx.rng, ctx.next()))
+        if status != 201:
+            raise RuntimeError(f'Could not create hotels for the benchmark ({status}): {body}')
+        ctx.new_hotel_ids.append(body['id'])
+
+
+def _import_body(ctx, rng, number):
+    rows = []
+    for row in range(5):
+        hotel = ctx.new_hotel(rng, f'import-{number}-{row}')
+        hotel['external_id'] = f'bench-{ctx.run_id}-{number}-{row}'
+        rows.append(json.dumps(hotel))
+    return ('\n'.join(rows) + '\n').encode('utf-8')
+
+
+def scenarios():
+    """
+    (name, expected statuses, prepare, request) for every route. ``request``
+    gets the context, a per-request RNG and the request's index, and returns
+    (method, path, token, keyword arguments for the client).
+    """
+    def stay_query(ctx, rng):
+        check_in, check_out = ctx.stay(rng)
+        return f'check_in={check_in}&check_out={check_out}'
+
+    return [
+        ('auth.register', {201}, None, lambda ctx, rng, i: (
+            'POST', '/api/auth/register', None, {'json_body': {
+                'username': f'bench{ctx.run_id}-{i}', 'email': f'bench{ctx.run_id}-{i}@example.com',
+                'password': BENCH_PASSWORD, 'first_name': 'Bench', 'last_name': 'User'}})),
+        ('auth.login', {200}, None, lambda ctx, rng, i: (
+            'POST', '/api/auth/login', None, {'json_body': {'username': ctx.username, 'password': BENCH_PASSWORD}})),
+        ('auth.profile', {200}, None, lambda ctx, rng, i: ('GET', '/api/auth/profile', ctx.user_token, {})),
+        ('auth.update_profile', {200}, None, lambda ctx, rng, i: (
+            'PUT', '/api/auth/profile', ctx.user_token, {'json_body': {'phone': f'+1-555-{i:07d}'}})),
+
+        ('hotels.list', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels?page={rng.randint(1, 5)}&per_page=20', None, {})),
+        ('hotels.list_cursor', {200}, None, lambda ctx, rng, i: ('GET', '/api/hotels?cursor=&per_page=20', None, {})),
+        ('hotels.list_city', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels?city={rng.choice(ctx.cities)[:3]}&min_price=50', None, {})),
+        ('hotels.list_available', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels?{stay_query(ctx, rng)}&guests=2', None, {})),
+        ('hotels.detail', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels/{rng.choice(ctx.hotel_ids)}', None, {})),
+        ('hotels.search', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels/search?q={rng.choice(ctx.cities)}', None, {})),
+        ('hotels.suggest', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels/suggest?prefix={rng.choice(ctx.cities)[:2]}', None, {})),
+        ('hotels.availability', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/hotels/{rng.choice(ctx.hotel_ids)}/availability?{stay_query(ctx, rng)}', None, {})),
+        ('hotels.availability_bulk', {200}, None, lambda ctx, rng, i: (
+            'POST', '/api/hotels/availability', None, {'json_body': dict(
+                zip(('check_in', 'check_out'), ctx.stay(rng)),
+                hotel_ids=rng.sample(ctx.hotel_ids, min(20, len(ctx.hotel_ids))))})),
+        ('hotels.create', {201}, None, lambda ctx, rng, i: (
+            'POST', '/api/hotels', ctx.admin_token, {'json_body': ctx.new_hotel(rng, f'create-{i}')})),
+        ('hotels.update', {200}, None, lambda ctx, rng, i: (
+            'PUT', f'/api/hotels/{rng.choice(ctx.hotel_ids)}', ctx.admin_token,
+            {'json_body': {'price_per_night': rng.randint(50, 400)}})),
+        ('hotels.delete', {200}, _prepare_hotels, lambda ctx, rng, i: (
+            'DELETE', f'/api/hotels/{ctx.new_hotel_ids[i]}', ctx.admin_token, {})),
+        ('hotels.import', {200}, None, lambda ctx, rng, i: (
+            'POST', '/api/hotels/import?format=ndjson', ctx.admin_token, {'data': _import_body(ctx, rng, i)})),
+
+        # A full hotel answers 400 (207 for a best effort batch), which is a valid answer
+        ('bookings.create', {201, 400}, None, lambda ctx, rng, i: (
+            'POST', '/api/bookings/', ctx.user_token, {'json_body': ctx.new_booking(rng)})),
+        ('bookings.batch', {201, 207}, None, lambda ctx, rng, i: (
+            'POST', '/api/bookings/batch', ctx.user_token,
+            {'json_body': {'mode': 'best_effort', 'bookings': [ctx.new_booking(rng) for _ in range(3)]}})),
+        ('bookings.list', {200}, None, lambda ctx, rng, i: ('GET', '/api/bookings/?per_page=20', ctx.user_token, {})),
+        ('bookings.list_cursor', {200}, None, lambda ctx, rng, i: (
+            'GET', '/api/bookings/?cursor=&per_page=20', ctx.user_token, {})),
+        ('bookings.detail', {200}, _prepare_bookings, lambda ctx, rng, i: (
+            'GET', f'/api/bookings/{ctx.booking_ids[i]}', ctx.user_token, {})),
+        ('bookings.update', {200, 400}, _prepare_bookings, lambda ctx, rng, i: (
+            'PUT', f'/api/bookings/{ctx.booking_ids[i]}', ctx.user_token,
+            {'json_body': dict(zip(('check_in_date', 'check_out_date'), ctx.stay(rng)), num_guests=2)})),
+        ('bookings.cancel', {200}, _prepare_bookings, lambda ctx, rng, i: (
+            'POST', f'/api/bookings/{ctx.booking_ids[i]}/cancel', ctx.user_token, {})),
+        ('bookings.export', {200}, None, lambda ctx, rng, i: (
+            'GET', f'/api/bookings/export?hotel_id={rng.choice(ctx.hotel_ids)}', ctx.admin_token, {})),
+    ]
+
+
+def run_scenario(ctx, name, expected, prepare, build, requests, concurrency):
+    from query_budget import record_queries
+    if prepare:
+        prepare(ctx, requests)
+
+    latencies = []
+    round_trips = []
+    errors = []
+    lock = threading.Lock()
+
+    def one(index):
+        rng = random.Random(f'{ctx.seed}:{name}:{index}')
+        method, path, token, kwargs = build(ctx, rng, index)
+        headers = {'Authorization': f'Bearer {token}'} if token else {}
+        # Only the app in this process can be watched; a server's commands are not seen
+        with (record_queries() if ctx.client.counts_round_trips else nullcontext([])) as queries:
+            start = time.perf_counter()
+            try:
+                status, _ = ctx.client.request(method, path, headers=headers, **kwargs)
+            except Exception as e:
+                status = repr(e)
+            elapsed = time.perf_counter() - start
+        with lock:
+            if status in expected:
+                latencies.append(elapsed)
+                round_trips.append(len(queries))
+            else:
+                errors.append(status)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    elapsed = time.perf_counter() - start
+
+    def ms(value):
+        return round(value * 1000, 2) if value is not None else None
+
+    result = {
+        'requests': requests,
+        'errors': len(errors),
+        'requests_per_second': round(len(latencies) / elapsed, 1),
+        'p50_ms': ms(percentile(latencies, 50)),
+        'p95_ms': ms(percentile(latencies, 95)),
+        'p99_ms': ms(percentile(latencies, 99)),
+        'db_round_trips': round(sum(round_trips) / len(round_trips), 2)
+        if ctx.client.counts_round_trips and round_trips else None
+    }
+    if errors:
+        # A few example statuses help tell a regression from a misconfiguration
+        result['error_statuses'] = sorted({str(status) for status in errors})[:5]
+    return result
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _connect_app(args):
+    """Import the Flask app with round trip counting in place"""
+    os.environ.setdefault('BCRYPT_LOG_ROUNDS', str(args.bcrypt_rounds))
+    # Registers its command listener, so import it before the app connects
+    import query_budget  # noqa: F401
+    if not args.mongomock:
+        from app import app
+        return app
+
+    import mongoengine
+    import mongomock
+    import database
+    from app import app
+    # The app registered a lazy connection to MONGODB_URI; nothing was opened
+    database.disconnect()
+    mongoengine.connect('hotels_benchmark', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    import seed_data
+    seed_data.load(args.hotels, args.users, args.bookings, seed=args.seed, workers=1)
+    return app
+
+
+def print_report(results):
+    meta = results['meta']
+    print(f"{meta['target']}, {meta['requests']} requests per route, concurrency {meta['concurrency']}, "
+          f"commit {meta['commit']}")
+    print(f"{'route':<26} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'db/req':>7} {'errors':>7}")
+    for name, r in results['routes'].items():
+        print(f"{name:<26} {r['requests_per_second']:>9} {r['p50_ms']!s:>9} {r['p95_ms']!s:>9} "
+              f"{r['p99_ms']!s:>9} {r['db_round_trips']!s:>7} {r['errors']:>7}")
+
+
+def print_comparison(results, baseline):
+    print(f"\nChange against {baseline['meta'].get('commit')} (negative is faster / fewer)")
+    print(f"{'route':<26} {'p50':>8} {'p95':>8} {'p99':>8} {'db/req':>8}")
+
+    def change(new, old):
+        if new is None or old in (None, 0):
+            return '-'
+        return f'{(new - old) / old * 100:+.0f}%'
+
+    for name, r in results['routes'].items():
+        old = baseline['routes'].get(name)
+        if old is None:
+            continue
+        print(f"{name:<26} {change(r['p50_ms'], old['p50_ms']):>8} {change(r['p95_ms'], old['p95_ms']):>8} "
+              f"{change(r['p99_ms'], old['p99_ms']):>8} {change(r['db_round_trips'], old['db_round_trips']):>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every API route')
+    parser.add_argument('--url', help='benchmark a running server instead of the app in this process')
+    parser.add_argument('--mongomock', action='store_true', help='in-process app on a seeded in-memory database')
+    parser.add_argument('--requests', type=int, default=200, help='requests per route')
+    parser.add_argument('--concurrency', type=int, help='client threads (default 8, or 1 with --mongomock)')
+    parser.add_argument('--routes', nargs='*', default=['*'], metavar='PATTERN',
+                        help='route names to run, e.g. hotels.* bookings.create')
+    parser.add_argument('--seed', type=int, default=42, help='random choices of ids, dates and data')
+    parser.add_argument('--admin', default='admin:password123', metavar='USER:PASSWORD',
+                        help='admin account (the sample data set uses admin:admin123)')
+    parser.add_argument('--bcrypt-rounds', type=int, default=4,
+                        help='bcrypt cost of the in-process app, unless BCRYPT_LOG_ROUNDS is set')
+    parser.add_argument('--hotels', type=int, default=50, help='hotels seeded for --mongomock')
+    parser.add_argument('--users', type=int, default=200, help='users seeded for --mongomock')
+    parser.add_argument('--bookings', type=int, default=500, help='bookings seeded for --mongomock')
+    parser.add_argument('--output', help='write the results as JSON to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare with')
+    parser.add_argument('--json', action='store_true', help='print results as JSON')
+    args = parser.parse_args()
+    if args.concurrency is None:
+        args.concurrency = 1 if args.mongomock else 8
+
+    if args.url:
+        client = HttpClient(args.url)
+        target = args.url
+    else:
+        client = AppClient(_connect_app(args))
+        target = 'mongomock' if args.mongomock else 'in-process'
+
+    ctx = Context(client, args.seed)
+    admin_username, _, admin_password = args.admin.partition(':')
+    setup(ctx, admin_username, admin_password)
+
+    results = {
+        'meta': {
+            'target': target,
+            'commit': _git_commit(),
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'requests': args.requests,
+            'concurrency': args.concurrency
+        },
+        'routes': {}
+    }
+    for name, expected, prepare, build in scenarios():
+        if not any(fnmatch(name, pattern) for pattern in args.routes):
+            continue
+        if args.mongomock and name in MONGOMOCK_UNSUPPORTED:
+            print(f'Skipping {name}: mongomock has no {MONGOMOCK_UNSUPPORTED[name]}', file=sys.stderr)
+        else:
+            results['routes'][name] = run_scenario(ctx, name, expected, prepare, build,
+                                                   args.requests, args.concurrency)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(results, json.load(f))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Streaming export of bookings as NDJSON or CSV, for accounting.
+
+Bookings are read from one server-side cursor with a fixed batch_size and a
+projection of the exported fields, and written out one batch at a time, so
+memory stays bounded by the batch size however many bookings match. The
+admin endpoint GET /api/bookings/export sends each batch as a chunk of the
+response as soon as it is read; the command line writes to a file or stdout.
+
+Rows come in no particular order: sorting would make MongoDB read (or
+sort in memory) every matching booking before returning the first one.
+
+    python booking_export.py bookings.csv --status confirmed --from 2024-01-01 --to 2024-12-31
+    python booking_export.py - --hotel <hotel id> > bookings.ndjson
+"""
+import argparse
+import csv
+from datetime import datetime
+import io
+import json
+import sys
+
+from bson import ObjectId
+
+import validation
+
+FORMATS = ('ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 2000
+
+COLUMNS = ('id', 'user_id', 'hotel_id', 'hotel_name', 'hotel_city', 'hotel_country',
+           'check_in_date', 'check_out_date', 'num_guests', 'room_type', 'total_price',
+           'status', 'special_requests', 'created_at', 'updated_at')
+
+EXPORT_FIELDS = {'user': 1, 'hotel': 1, 'hotel_summary': 1, 'check_in_date': 1, 'check_out_date': 1,
+                 'num_guests': 1, 'room_type': 1, 'total_price': 1, 'status': 1,
+                 'special_requests': 1, 'created_at': 1, 'updated_at': 1}
+
+
+def export_filter(hotel_id=None, status=None, check_in_from=None, check_in_to=None):
+    """
+    Raw filter for the export options. Dates are YYYY-MM-DD strings and
+    bound the check-in date, both inclusive. Raises ValueError on bad input.
+    """
+    from models import Booking
+    query = {}
+    if hotel_id:
+        if not ObjectId.is_valid(hotel_id):
+            raise ValueError('Invalid hotel id')
+        query['hotel'] = ObjectId(hotel_id)
+    if status:
+        statuses = Booking.status.choices
+        if status not in statuses:
+            raise ValueError(f"status must be one of: {', '.join(statuses)}")
+        query['status'] = status
+
+    check_in = {}
+    if check_in_from:
+        check_in['$gte'] = validation.parse_date(check_in_from)
+    if check_in_to:
+        check_in['$lte'] = validation.parse_date(check_in_to)
+    if check_in:
+        if '$gte' in check_in and '$lte' in check_in and check_in['$gte'] > check_in['$lte']:
+            raise ValueError("'from' must not be after 'to'")
+        # DateField values are stored as midnight datetimes
+        query['check_in_date'] = {op: datetime.combine(value, datetime.min.time()) for op, value in check_in.items()}
+    return query
+
+
+def _row(doc, hotel):
+    return {
+        'id': str(doc['_id']),
+        'user_id': str(doc['user']) if doc.get('user') else None,
+        'hotel_id': str(doc['hotel']) if doc.get('hotel') else None,
+        'hotel_name': hotel.get('name'),
+        'hotel_city': hotel.get('city'),
+        'hotel_country': hotel.get('country'),
+        'check_in_date': doc['check_in_date'].date().isoformat(),
+        'check_out_date': doc['check_out_date'].date().isoformat(),
+        'num_guests': doc.get('num_guests'),
+        'room_type': doc.get('room_type'),
+        'total_price': doc.get('total_price'),
+        'status': doc.get('status', 'confirmed'),
+        'special_requests': doc.get('special_requests'),
+        'created_at': doc['created_at'].isoformat() if doc.get('created_at') else None,
+        'updated_at': doc['updated_at'].isoformat() if doc.get('updated_at') else None
+    }
+
+
+def _rows(docs):
+    """Rows for one batch; bookings without a stored hotel summary are resolved with one $in"""
+    from models import Hotel
+    missing = list({doc['hotel'] for doc in docs if not doc.get('hotel_summary') and doc.get('hotel')})
+    hotels = {}
+    if missing:
+        hotels = {hotel['_id']: hotel for hotel in
+                  Hotel._get_collection().find({'_id': {'$in': missing}}, {'name': 1, 'city': 1, 'country': 1})}
+    return [_row(doc, doc.get('hotel_summary') or hotels.get(doc.get('hotel'), {})) for doc in docs]
+
+
+def iter_batches(query, batch_size=DEFAULT_BATCH_SIZE):
+    """Yield lists of at most batch_size export rows matching the raw filter"""
+    from models import Booking
+    cursor = Booking._get_collection().find(query, EXPORT_FIELDS, batch_size=batch_size)
+    try:
+        docs = []
+        for doc in cursor:
+            docs.append(doc)
+            if len(docs) >= batch_size:
+                yield _rows(docs)
+                docs = []
+        if docs:
+            yield _rows(docs)
+    finally:
+        # Free the server-side cursor when a client disconnects mid-export
+        cursor.close()
+
+
+def encode(batches, fmt):
+    """Yield the export as text, one string per batch (the CSV header first)"""
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    if fmt == 'ndjson':
+        for rows in batches:
+            yield ''.join(json.dumps(row) + '\n' for row in rows)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMNS, lineterminator='\n')
+    writer.writeheader()
+    yield buffer.getvalue()
+    for rows in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export bookings as NDJSON or CSV')
+    parser.add_argument('path', help="output file, or '-' for standard output")
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension, else ndjson')
+    parser.add_argument('--hotel', help='only bookings of this hotel id')
+    parser.add_argument('--status', help='only bookings with this status')
+    parser.add_argument('--from', dest='check_in_from', help='earliest check-in date (YYYY-MM-DD)')
+    parser.add_argument('--to', dest='check_in_to', help='latest check-in date (YYYY-MM-DD)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+
+    import database
+    database.connect()
+    try:
+        try:
+            query = export_filter(args.hotel, args.status, args.check_in_from, args.check_in_to)
+        except ValueError as e:
+            parser.error(str(e))
+        out = sys.stdout if args.path == '-' else open(args.path, 'w', newline='', encoding='utf-8')
+        try:
+            for chunk in encode(iter_batches(query, args.batch_size), fmt):
+                out.write(chunk)
+        finally:
+            if out is not sys.stdout:
+                out.close()
+    finally:
+        database.disconnect()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,219 @@
+"""
+Read-through caches for Hotel and User documents.
+
+Every booking and availability route loads its hotel by id, and the same few
+hundred hotels make up most of that traffic. Hotels are kept in a
+process-local LRU with a TTL, optionally backed by a shared cache so that
+several workers share misses. The worker that writes a hotel invalidates its
+entry; every other worker notices the catalog version change (see catalog.py)
+within HOTEL_CACHE_VERSION_CHECK seconds and drops its local entries; the
+hotel detail route does not wait for that and asks for an entry read at the
+version its ETag carries. Cached hotels are for reads and prices only: reservations read the capacity from
+MongoDB (see occupancy.py).
+
+Configuration (environment):
+    HOTEL_CACHE_SIZE       entries kept per process (default 1024, 0 disables)
+    HOTEL_CACHE_TTL        seconds an entry stays valid (default 60)
+    HOTEL_CACHE_REDIS_URL  optional shared Redis backend (needs the redis package)
+    HOTEL_CACHE_VERSION_CHECK  seconds between catalog version checks per process (default 1)
+    USER_CACHE_SIZE        users kept per process for authenticated requests (default 4096)
+    USER_CACHE_TTL         seconds a cached user stays valid (default 30)
+"""
+from collections import OrderedDict
+import os
+import threading
+import time
+
+import bson
+
+import catalog
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire after ``ttl`` seconds"""
+
+    def __init__(self, maxsize=1024, ttl=60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """Return (found, value)"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, entry[1]
+            if entry is not None:
+                del self._data[key]
+            self.misses += 1
+            return False, None
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._data), 'hits': self.hits, 'misses': self.misses}
+
+
+class LocalBackend:
+    """
+    In-process stand-in for a shared cache backend. Same interface as
+    RedisBackend: get/set/delete of bytes values with a TTL.
+    """
+
+    def __init__(self):
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.monotonic():
+                self._data.pop(key, None)
+                return None
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisBackend:
+    """Shared cache backend on Redis, so all workers share hotel misses"""
+
+    def __init__(self, url):
+        import redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value, ttl):
+        self._client.set(key, value, ex=ttl)
+
+    def delete(self, key):
+        self._client.delete(key)
+
+
+class HotelCache:
+    def __init__(self, maxsize=1024, ttl=60, backend=None, version_check=1.0):
+        self.local = TTLCache(maxsize, ttl)
+        self.backend = backend
+        self.shared_hits = 0
+        self.shared_misses = 0
+        self._catalog = catalog.VersionWatch(version_check)
+
+    def _sync_catalog(self):
+        """Drop the local entries when a hotel was written, possibly by another worker"""
+        if self._catalog.changed():
+            self.local.clear()
+
+    def _shared_key(self, key):
+        return f'hotel:{key}'
+
+    def get(self, hotel_id, version=None):
+        """
+        Return the Hotel with this id, or None if it does not exist.
+
+        Entries remember the catalog version they were read at. With
+        ``version`` (the one a conditional GET labels its response with), only
+        an entry read at that version is used, so a body never lags its ETag.
+        """
+        from models import Hotel
+        key = str(hotel_id)
+        self._sync_catalog()
+        found, entry = self.local.get(key)
+        if found and (version is None or entry[0] == version):
+            return entry[1]
+
+        if self.backend is not None:
+            data = self.backend.get(self._shared_key(key))
+            entry = bson.decode(data) if data is not None else None
+            if entry is not None and (version is None or entry['version'] == version):
+                self.shared_hits += 1
+                hotel = Hotel._from_son(entry['hotel'])
+                self.local.set(key, (entry['version'], hotel))
+                return hotel
+            self.shared_misses += 1
+
+        # Read before the hotel, so the entry is never labelled newer than it is
+        if version is None:
+            version = self._catalog.version
+        hotel = Hotel.objects(id=hotel_id).first()
+        if hotel is not None:
+            self.local.set(key, (version, hotel))
+            if self.backend is not None:
+                self.backend.set(self._shared_key(key), bson.encode({'version': version, 'hotel': hotel.to_mongo()}),
+                                 self.local.ttl)
+        return hotel
+
+    def invalidate(self, hotel_id):
+        key = str(hotel_id)
+        self.local.delete(key)
+        if self.backend is not None:
+            self.backend.delete(self._shared_key(key))
+
+    def stats(self):
+        stats = self.local.stats()
+        if self.backend is not None:
+            stats['shared_hits'] = self.shared_hits
+            stats['shared_misses'] = self.shared_misses
+        return stats
+
+
+def _default_backend():
+    url = os.getenv('HOTEL_CACHE_REDIS_URL')
+    return RedisBackend(url) if url else None
+
+
+hotels = HotelCache(
+    maxsize=int(os.getenv('HOTEL_CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('HOTEL_CACHE_TTL', '60')),
+    backend=_default_backend(),
+    version_check=float(os.getenv('HOTEL_CACHE_VERSION_CHECK', '1'))
+)
+
+# Users behind authenticated requests, loaded once per request by the JWT
+# user loader in app.py. Kept short-lived: a profile change in another worker
+# is picked up within USER_CACHE_TTL seconds.
+users = TTLCache(
+    maxsize=int(os.getenv('USER_CACHE_SIZE', '4096')),
+    ttl=int(os.getenv('USER_CACHE_TTL', '30'))
+)
+
+
+def load_user(user_id):
+    """Return the User with this id, or None if it does not exist"""
+    from models import User
+    key = str(user_id)
+    found, user = users.get(key)
+    if found:
+        return user
+    user = User.objects(id=user_id).first()
+    if user is not None:
+        users.set(key, user)
+    return user
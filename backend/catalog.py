@@ -0,0 +1,134 @@
+"""
+Catalog version and conditional GET support for the hotel read endpoints.
+
+Hotels only change through the admin routes, so instead of hashing response
+bodies we keep one tiny document with a version counter that every hotel
+write bumps. Hotel responses carry an ETag built from that version and the
+request URL, and a request whose If-None-Match (or If-Modified-Since) still
+matches gets a 304 after reading only that one document.
+
+The same version tells per-process copies of hotel data (the hotel cache,
+the typeahead index) that another worker wrote a hotel; see VersionWatch.
+"""
+from datetime import datetime
+from functools import wraps
+import hashlib
+import os
+import threading
+import time
+
+from flask import g, request, make_response
+
+CATALOG = 'hotels'
+MAX_AGE = int(os.getenv('CATALOG_CACHE_MAX_AGE', '60'))
+
+# Listings filtered by stay dates depend on bookings, not just the catalog
+AVAILABILITY_ARGS = ('check_in', 'check_out')
+
+
+def current_state():
+    """Return (version, updated_at) of the hotel catalog"""
+    from models import CatalogState
+    state = CatalogState.objects(name=CATALOG).only('version', 'updated_at').as_pymongo().first()
+    if not state:
+        return 0, None
+    return state.get('version', 0), state.get('updated_at')
+
+
+def bump():
+    """Record that the hotel catalog changed"""
+    from models import CatalogState
+    CatalogState.objects(name=CATALOG).update_one(
+        inc__version=1,
+        set__updated_at=datetime.utcnow(),
+        upsert=True
+    )
+
+
+class VersionWatch:
+    """
+    Reads the catalog version at most every ``interval`` seconds; changed()
+    returns True once after each hotel write, by this or any other worker.
+
+    Code that cannot read through mongoengine (the Motor routes) asks due()
+    whether to read the version, reads it itself and passes it to seen().
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+        self._version = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def due(self):
+        """Whether the version should be read now; True at most every ``interval`` seconds"""
+        with self._lock:
+            now = time.monotonic()
+            if now - self._checked_at < self.interval:
+                return False
+            self._checked_at = now
+            return True
+
+    def seen(self, version):
+        """Record the version just read; True if it differs from the last one"""
+        with self._lock:
+            changed = self._version is not None and version != self._version
+            self._version = version
+        return changed
+
+    @property
+    def version(self):
+        """The version last read, or None before the first read"""
+        return self._version
+
+    def changed(self):
+        if not self.due():
+            return False
+        version, _ = current_state()
+        return self.seen(version)
+
+
+def _etag(version):
+    url = hashlib.sha1(request.full_path.encode('utf-8')).hexdigest()[:16]
+    return f'{version}-{url}'
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def conditional_get(view):
+    """
+    Serve a hotel catalog view with ETag, Last-Modified and Cache-Control,
+    answering 304 Not Modified without running the view when the client's
+    copy is current.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if any(arg in request.args for arg in AVAILABILITY_ARGS):
+            return view(*args, **kwargs)
+
+        version, last_modified = current_state()
+        etag = _etag(version)
+        # The view reads cached hotels at this version (see cache.HotelCache.get)
+        g.catalog_version = version
+
+        if _not_modified(etag, last_modified):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        if last_modified:
+            response.last_modified = last_modified
+        response.cache_control.public = True
+        response.cache_control.max_age = MAX_AGE
+        return response
+    return wrapper
@@ -0,0 +1,82 @@
+"""
+MongoDB connection settings shared by every entry point.
+
+The Flask app registers its mongoengine connection with ``connect=False``:
+pymongo opens no sockets and starts no monitor threads until the first
+query. A preforking server can therefore import the app in its master
+process, and each worker opens its own pool after fork (see
+gunicorn.conf.py), because a MongoClient must never be shared across fork.
+
+Configuration (environment; unset values keep pymongo's defaults):
+    MONGO_MAX_POOL_SIZE                   connections per process (pymongo default 100)
+    MONGO_MIN_POOL_SIZE                   connections kept open when idle (default 0)
+    MONGO_MAX_IDLE_TIME_MS                close pooled connections idle this long
+    MONGO_CONNECT_TIMEOUT_MS              TCP connect timeout
+    MONGO_SOCKET_TIMEOUT_MS               timeout on each socket read/write
+    MONGO_SERVER_SELECTION_TIMEOUT_MS     how long an operation waits for a usable server
+    MONGO_WAIT_QUEUE_TIMEOUT_MS           how long a thread waits for a free pooled connection
+
+pymongo monitoring listeners (metrics, slow-query log, ...) are registered
+with add_listener() before connecting; connect() and reconnect() hand them to
+every client they create.
+"""
+import os
+
+from mongoengine import connect as mongoengine_connect, disconnect as mongoengine_disconnect
+from mongoengine.connection import get_db
+
+# Environment variable -> MongoClient option
+POOL_OPTIONS = {
+    'MONGO_MAX_POOL_SIZE': 'maxPoolSize',
+    'MONGO_MIN_POOL_SIZE': 'minPoolSize',
+    'MONGO_MAX_IDLE_TIME_MS': 'maxIdleTimeMS',
+    'MONGO_CONNECT_TIMEOUT_MS': 'connectTimeoutMS',
+    'MONGO_SOCKET_TIMEOUT_MS': 'socketTimeoutMS',
+    'MONGO_SERVER_SELECTION_TIMEOUT_MS': 'serverSelectionTimeoutMS',
+    'MONGO_WAIT_QUEUE_TIMEOUT_MS': 'waitQueueTimeoutMS'
+}
+
+_listeners = []
+
+
+def add_listener(listener):
+    """Pass a pymongo command or pool listener to clients created from now on"""
+    if listener not in _listeners:
+        _listeners.append(listener)
+
+
+def mongodb_uri():
+    return os.getenv('MONGODB_URI', 'mongodb://localhost:27017/hotels_reserved')
+
+
+def pool_options():
+    """MongoClient keyword arguments for the pool settings present in the environment"""
+    return {option: int(os.environ[name]) for name, option in POOL_OPTIONS.items() if os.getenv(name)}
+
+
+def connect():
+    """Register the default connection without opening any socket yet"""
+    options = pool_options()
+    if _listeners:
+        options['event_listeners'] = list(_listeners)
+    return mongoengine_connect(host=mongodb_uri(), connect=False, **options)
+
+
+def disconnect():
+    mongoengine_disconnect()
+
+
+def reconnect():
+    """Drop a connection inherited across fork and register a fresh one"""
+    disconnect()
+    return connect()
+
+
+def warm_up():
+    """
+    Open the pool and load per-process state before the first request, so
+    that request does not pay for server selection and index building.
+    """
+    get_db().command('ping')
+    import suggest
+    suggest.index.load()
@@ -0,0 +1,65 @@
+"""
+Gunicorn configuration for the Flask app.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app is imported once in the master (preload) and forked into workers.
+It registers its MongoDB connection without opening it, and each worker
+opens its own pool after fork, then warms it up before taking requests. On
+SIGTERM, workers stop accepting connections and get GUNICORN_GRACEFUL_TIMEOUT
+seconds to finish in-flight requests before they are killed.
+
+Configuration (environment):
+    GUNICORN_BIND                address (default HOST:PORT, i.e. 0.0.0.0:5000)
+    GUNICORN_WORKERS             worker processes (default 2 x CPU + 1)
+    GUNICORN_THREADS             request threads per worker (default 4)
+    GUNICORN_TIMEOUT             seconds before a stuck worker is restarted (default 30)
+    GUNICORN_GRACEFUL_TIMEOUT    seconds to drain in-flight requests on shutdown (default 30)
+    GUNICORN_KEEPALIVE           seconds to hold idle keep-alive connections (default 5)
+    GUNICORN_MAX_REQUESTS        recycle a worker after this many requests (default 0, never)
+    GUNICORN_PRELOAD             import the app in the master before forking (default true)
+    MONGO_*                      connection pool settings, see database.py
+"""
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '5000')}")
+workers = int(os.getenv('GUNICORN_WORKERS', str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', '5'))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))
+max_requests_jitter = max_requests // 10
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() == 'true'
+accesslog = '-'
+
+
+def on_starting(server):
+    import database
+    pool_size = database.pool_options().get('maxPoolSize')
+    if pool_size is not None and pool_size < threads:
+        server.log.warning(f'MONGO_MAX_POOL_SIZE={pool_size} is below GUNICORN_THREADS={threads}; '
+                           'request threads will queue for connections')
+
+
+def post_fork(server, worker):
+    # A MongoClient must not be shared across fork: drop whatever the master
+    # registered and give this worker its own pool
+    import database
+    database.reconnect()
+    try:
+        database.warm_up()
+    except Exception as e:
+        worker.log.warning(f'Warm-up failed, continuing cold: {e}')
+
+
+def worker_exit(server, worker):
+    # Runs after the worker has drained its in-flight requests
+    import database
+    import passwords
+    import slow_queries
+    passwords._executor.shutdown(wait=False, cancel_futures=True)
+    slow_queries.shutdown()
+    database.disconnect()
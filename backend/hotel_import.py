@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Streaming bulk import of hotels from NDJSON or CSV.
+
+Rows are parsed one at a time from a text stream (the request body of
+POST /api/hotels/import, or a file for the command line), validated with the
+same rules as the admin create route and written in batches of unordered bulk
+writes, so memory stays bounded whatever the file size. A row with an
+``external_id`` is upserted on it: importing the same file again updates the
+hotels instead of duplicating them.
+
+CSV files have one column per hotel field. ``amenities`` and ``images`` hold
+values separated by ``|``.
+
+    python hotel_import.py hotels.ndjson
+    python hotel_import.py hotels.csv --batch-size 1000
+"""
+import argparse
+import csv
+from datetime import datetime
+import json
+import sys
+
+from pymongo import InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError
+
+import validation
+
+FORMATS = ('ndjson', 'csv')
+DEFAULT_BATCH_SIZE = 500
+
+# Per-row errors kept in the report; the count of failed rows is always exact
+MAX_REPORTED_ERRORS = 1000
+
+LIST_SEPARATOR = '|'
+
+
+def read_ndjson(stream):
+    """Yield (row number, record) for each non-blank line of an NDJSON stream"""
+    for row, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            yield row, ValueError(f'Invalid JSON: {e}')
+
+
+def read_csv(stream):
+    """Yield (row number, record) for each data row of a CSV stream with a header"""
+    for row, record in enumerate(csv.DictReader(stream), start=1):
+        record = {key: value for key, value in record.items() if key and value not in (None, '')}
+        for field in ('amenities', 'images'):
+            if field in record:
+                record[field] = [v.strip() for v in record[field].split(LIST_SEPARATOR) if v.strip()]
+        yield row, record
+
+
+def read_rows(stream, fmt):
+    if fmt not in FORMATS:
+        raise ValueError(f"format must be one of: {', '.join(FORMATS)}")
+    return read_ndjson(stream) if fmt == 'ndjson' else read_csv(stream)
+
+
+class Report:
+    def __init__(self):
+        self.processed = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors = []
+        # Why the import stopped before the end of the input, if it did
+        self.aborted = None
+
+    def error(self, row, message):
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'row': row, 'error': message})
+
+    def to_dict(self):
+        return {
+            'processed': self.processed,
+            'inserted': self.inserted,
+            'updated': self.updated,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+            'aborted': self.aborted
+        }
+
+
+def _write_request(record, now):
+    """Validate one record and return its bulk write request"""
+    from models import Hotel
+    from suggest import normalize
+    fields = validation.parse_hotel(record)
+    external_id = record.get('external_id')
+    if external_id is not None:
+        fields['external_id'] = str(external_id)
+
+    # Bulk writes skip Hotel.save(), so set what it would
+    hotel = Hotel(city_key=normalize(fields['city']), created_at=now, updated_at=now, **fields)
+    hotel.validate()
+    doc = hotel.to_mongo().to_dict()
+    if external_id is None:
+        return InsertOne(doc)
+    created_at = doc.pop('created_at')
+    return UpdateOne(
+        {'external_id': doc['external_id']},
+        {'$set': doc, '$setOnInsert': {'created_at': created_at}},
+        upsert=True
+    )
+
+
+def _refresh_existing(external_ids, since):
+    """
+    Hotels updated in place (created before this import started) may be
+    cached by id, and their bookings carry a copy of name, city and country:
+    invalidate and refresh both. Other workers drop their cached copies when
+    the import bumps the catalog version.
+    """
+    from models import Booking, Hotel, HotelSummary
+    import cache
+    hotels = Hotel.objects(external_id__in=external_ids, created_at__lt=since).only('name', 'city', 'country')
+    requests = []
+    for hotel in hotels:
+        cache.hotels.invalidate(hotel.id)
+        summary = HotelSummary.from_hotel(hotel).to_mongo().to_dict()
+        requests.append(UpdateOne({'hotel': hotel.id, 'hotel_summary': {'$ne': summary}},
+                                  {'$set': {'hotel_summary': summary}}))
+    if requests:
+        Booking._get_collection().bulk_write(requests, ordered=False)
+
+
+def _flush(batch, report, since):
+    from models import Hotel
+    requests = [request for _, request in batch]
+    try:
+        result = Hotel._get_collection().bulk_write(requests, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for error in details['writeErrors']:
+            report.error(batch[error['index']][0], error.get('errmsg', 'Write failed'))
+
+    report.inserted += details.get('nInserted', 0) + details.get('nUpserted', 0)
+    report.updated += details.get('nMatched', 0)
+    external_ids = [request._filter['external_id'] for request in requests if isinstance(request, UpdateOne)]
+    if external_ids and details.get('nMatched', 0):
+        _refresh_existing(external_ids, since)
+
+
+def import_hotels(rows, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import (row number, record) pairs, as produced by read_rows(). Returns a
+    Report; ``progress`` is called with it after every batch. An error that
+    stops the import (a lost connection, an unreadable stream) is recorded as
+    ``aborted`` with the counts of what was written up to that point.
+    """
+    report = Report()
+    now = datetime.utcnow()
+    batch = []
+    try:
+        for row, record in rows:
+            report.processed += 1
+            if isinstance(record, Exception):
+                report.error(row, str(record))
+                continue
+            try:
+                batch.append((row, _write_request(record, now)))
+            except Exception as e:
+                report.error(row, str(e))
+                continue
+            if len(batch) >= batch_size:
+                _flush(batch, report, now)
+                batch = []
+                if progress:
+                    progress(report)
+        if batch:
+            _flush(batch, report, now)
+            batch = []
+            if progress:
+                progress(report)
+    except Exception as e:
+        # The batches already flushed stay written and counted in the report
+        report.aborted = f'Stopped after {report.processed} rows: {e}'
+        if batch:
+            report.aborted += f'; the last {len(batch)} valid rows may be partly written'
+
+    if report.inserted or report.updated:
+        # The catalog changed: new ETags, and every worker drops its cached
+        # hotels and rebuilds its typeahead index (see catalog.VersionWatch)
+        import catalog
+        import suggest
+        catalog.bump()
+        suggest.index.load()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bulk import hotels from NDJSON or CSV')
+    parser.add_argument('path', help="file to import, or '-' for standard input")
+    parser.add_argument('--format', choices=FORMATS, help='default: from the file extension')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ('csv' if args.path.lower().endswith('.csv') else 'ndjson')
+
+    import database
+    database.connect()
+
+    def progress(report):
+        print(f"{report.processed} rows: {report.inserted} inserted, {report.updated} updated, "
+              f"{report.failed} failed", file=sys.stderr)
+
+    stream = sys.stdin if args.path == '-' else open(args.path, newline='', encoding='utf-8')
+    try:
+        report = import_hotels(read_rows(stream, fmt), args.batch_size, progress)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+        database.disconnect()
+
+    print(json.dumps(report.to_dict(), indent=2))
+    return 1 if report.failed or report.aborted else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
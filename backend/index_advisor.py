@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+"""
+Index advisor: explain() every query shape the routes issue.
+
+Runs the same filters, sorts and pipelines as the route handlers against the
+database in MONGODB_URI, using sample values taken from that database (seed
+it first with seed_data.py, or a larger generated data set). Each shape is
+reported with its winning plan, keys and documents examined versus returned,
+and a warning plus a suggested index when it scans the collection, sorts in
+memory or examines far more documents than it returns.
+
+    python index_advisor.py            # text report
+    python index_advisor.py --json     # machine readable
+"""
+
+import argparse
+import json
+import os
+import re
+
+from dotenv import load_dotenv
+from mongoengine import connect, disconnect
+
+load_dotenv()
+
+# Flag a plan that examines this many documents per document returned
+EXAMINED_RATIO_LIMIT = 10
+
+
+def query_shapes():
+    """Return (route, collection, command) for every query shape the routes run"""
+    from models import User, Hotel, Booking, HotelNight, CatalogState
+    from suggest import normalize
+    import booking_export
+    import occupancy
+
+    hotel = Hotel.objects.only('id', 'city', 'available_rooms').as_pymongo().first()
+    user = User.objects.only('id', 'username', 'email').as_pymongo().first()
+    booking = Booking.objects.only('id', 'check_in_date', 'check_out_date').as_pymongo().first()
+    if not (hotel and user and booking):
+        raise SystemExit('The database needs at least one hotel, user and booking; run seed_data.py first')
+
+    hotels = Hotel._get_collection_name()
+    bookings = Booking._get_collection_name()
+    nights = HotelNight._get_collection_name()
+    users = User._get_collection_name()
+    check_in = booking['check_in_date']
+    check_out = booking['check_out_date']
+    stay = {'$gte': check_in, '$lt': check_out}
+
+    return [
+        ('GET /api/hotels (city prefix, price, rating)', hotels, {
+            'find': hotels,
+            'filter': {
+                'city_key': {'$regex': '^' + re.escape(normalize(hotel['city'])[:3])},
+                'price_per_night': {'$gte': 50, '$lte': 500},
+                'rating': {'$gte': 3}
+            },
+            'limit': 10
+        }),
+        ('GET /api/hotels?cursor=', hotels, {
+            'find': hotels,
+            'filter': {'_id': {'$gt': hotel['_id']}},
+            'sort': {'_id': 1},
+            'limit': 11
+        }),
+        ('GET /api/hotels?check_in&check_out', hotels, {
+            'aggregate': hotels,
+            'pipeline': occupancy.availability_stages(check_in.date(), check_out.date()) + [{'$limit': 10}],
+            'cursor': {}
+        }),
+        ('GET /api/hotels/search', hotels, {
+            'find': hotels,
+            'filter': {'$text': {'$search': hotel['city']}},
+            'projection': {'score': {'$meta': 'textScore'}},
+            'sort': {'score': {'$meta': 'textScore'}},
+            'limit': 20
+        }),
+        ('GET /api/hotels/<id>/availability', nights, {
+            'find': nights,
+            'filter': {'hotel': hotel['_id'], 'night': stay}
+        }),
+        ('POST /api/hotels/availability (peak $group)', nights, {
+            'aggregate': nights,
+            'pipeline': occupancy._peak_pipeline([hotel['_id']], check_in.date(), check_out.date()),
+            'cursor': {}
+        }),
+        ('POST/PUT /api/bookings (ledger night take)', nights, {
+            'findAndModify': nights,
+            'query': occupancy._take_query(hotel['_id'], check_in.date(), hotel.get('available_rooms', 1)),
+            'update': {'$inc': {'booked': 1}},
+            'upsert': True
+        }),
+        ('GET /api/bookings/export?status&from&to', bookings, {
+            'find': bookings,
+            'filter': booking_export.export_filter(
+                status='confirmed', check_in_from=check_in.date().isoformat(), check_in_to=check_out.date().isoformat()
+            ),
+            'projection': booking_export.EXPORT_FIELDS,
+            'batchSize': booking_export.DEFAULT_BATCH_SIZE
+        }),
+        ('GET /api/bookings/export?hotel_id', bookings, {
+            'find': bookings,
+            'filter': booking_export.export_filter(hotel_id=str(hotel['_id'])),
+            'projection': booking_export.EXPORT_FIELDS,
+            'batchSize': booking_export.DEFAULT_BATCH_SIZE
+        }),
+        ('GET /api/bookings', bookings, {
+            'find': bookings,
+            'filter': {'user': user['_id']},
+            'sort': {'created_at': -1, '_id': -1},
+            'limit': 10
+        }),
+        ('GET /api/bookings?status=', bookings, {
+            'find': bookings,
+            'filter': {'user': user['_id'], 'status': 'confirmed'},
+            'sort': {'created_at': -1, '_id': -1},
+            'limit': 10
+        }),
+        ('GET /api/bookings/<id>', bookings, {
+            'find': bookings,
+            'filter': {'_id': booking['_id']},
+            'limit': 1
+        }),
+        ('PUT /api/hotels/<id> (summary refresh)', bookings, {
+            'find': bookings,
+            'filter': {'hotel': hotel['_id']}
+        }),
+        ('POST /api/auth/login', users, {
+            'find': users,
+            'filter': {'username': user['username']},
+            'limit': 1
+        }),
+        ('POST /api/auth/register (email check)', users, {
+            'find': users,
+            'filter': {'email': user['email']},
+            'limit': 1
+        }),
+        ('hotel catalog version (ETag)', CatalogState._get_collection_name(), {
+            'find': CatalogState._get_collection_name(),
+            'filter': {'_id': 'hotels'},
+            'limit': 1
+        })
+    ]
+
+
+def _find_key(node, key):
+    """Depth-first search for the first ``key`` in nested explain output"""
+    if isinstance(node, dict):
+        if key in node:
+            return node[key]
+        children = node.values()
+    elif isinstance(node, list):
+        children = node
+    else:
+        return None
+    for child in children:
+        found = _find_key(child, key)
+        if found is not None:
+            return found
+    return None
+
+
+def _plan_stages(plan):
+    """Flatten a winning plan into [(stage, index name)] from the root down"""
+    stages = []
+    while plan:
+        if 'queryPlan' in plan:
+            plan = plan['queryPlan']
+        stages.append((plan.get('stage'), plan.get('indexName')))
+        if 'inputStage' in plan:
+            plan = plan['inputStage']
+        elif plan.get('inputStages'):
+            for child in plan['inputStages']:
+                stages.extend(_plan_stages(child))
+            break
+        else:
+            break
+    return stages
+
+
+def suggest_index(command):
+    """
+    Suggest a compound index for a find or findAndModify: equality fields
+    first, then sort fields, then range fields (the equality-sort-range rule).
+    """
+    query = command.get('filter', command.get('query', {}))
+    if any(key.startswith('$') for key in query):
+        return None
+    equality = [k for k, v in query.items() if not isinstance(v, dict) or '$eq' in v]
+    ranges = [k for k, v in query.items() if k not in equality and k != '_id']
+    sort = [(k, v) for k, v in command.get('sort', {}).items() if not isinstance(v, dict)]
+    fields = [(k, 1) for k in equality] + sort + [(k, 1) for k in ranges if k not in dict(sort)]
+    return fields or None
+
+
+def analyse(db, route, collection, command, verbosity='executionStats'):
+    """
+    Explain one command and flag its problems. With ``queryPlanner``
+    verbosity the query is planned but not run, so only the plan is judged
+    and the examined/returned counts are left out.
+    """
+    explain = db.command('explain', command, verbosity=verbosity)
+    stats = _find_key(explain, 'executionStats')
+    winning = _find_key(explain, 'winningPlan') or {}
+    stages = _plan_stages(winning)
+
+    problems = []
+    if any(stage == 'COLLSCAN' for stage, _ in stages):
+        problems.append('collection scan')
+    if any(stage == 'SORT' for stage, _ in stages):
+        problems.append('in-memory sort')
+
+    report = {
+        'route': route,
+        'collection': collection,
+        'plan': ' <- '.join(f'{stage}({index})' if index else stage for stage, index in stages),
+        'indexes_used': sorted({index for _, index in stages if index})
+    }
+    if stats is not None:
+        docs_examined = stats.get('totalDocsExamined', 0)
+        returned = stats.get('nReturned', 0)
+        if docs_examined > EXAMINED_RATIO_LIMIT * max(returned, 1):
+            problems.append(f'examines {docs_examined} docs for {returned} returned')
+        report.update(keys_examined=stats.get('totalKeysExamined', 0), docs_examined=docs_examined,
+                      returned=returned)
+    report['problems'] = problems
+    if problems and ('find' in command or 'findAndModify' in command):
+        report['suggested_index'] = suggest_index(command)
+    return report
+
+
+def run():
+    from models import User, Hotel, Booking, HotelNight, CatalogState
+    # Make sure every index declared in the models exists before explaining
+    for model in (User, Hotel, Booking, HotelNight, CatalogState):
+        model.ensure_indexes()
+    db = Hotel._get_db()
+    return [analyse(db, *shape) for shape in query_shapes()]
+
+
+def print_report(reports):
+    print("=== Index Advisor ===\n")
+    for r in reports:
+        status = 'OK ' if not r['problems'] else 'FIX'
+        print(f"[{status}] {r['route']}  ({r['collection']})")
+        print(f"      plan: {r['plan']}")
+        print(f"      keys examined: {r['keys_examined']}, docs examined: {r['docs_examined']}, returned: {r['returned']}")
+        for problem in r['problems']:
+            print(f"      ! {problem}")
+        if r.get('suggested_index'):
+            print(f"      suggested index: {r['suggested_index']}")
+        print()
+    missing = [r for r in reports if r['problems']]
+    print(f"{len(reports)} query shapes, {len(missing)} need attention")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Explain every route query shape and flag missing indexes')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    connect(host=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/hotels_reserved'))
+    try:
+        reports = run()
+    finally:
+        disconnect()
+
+    if args.json:
+        print(json.dumps(reports, indent=2, default=str))
+    else:
+        print_report(reports)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""
+Request and MongoDB metrics in the Prometheus text format (GET /api/metrics).
+
+Flask request hooks time every request per blueprint and endpoint, count
+responses by status and track requests in flight. A pymongo command listener
+counts and times the commands sent to MongoDB per collection and command, and
+a pool listener tracks open and checked-out connections and how long requests
+wait for one.
+
+The hot path only does a dict update and a bisect under one short lock per
+request and per command; rendering happens when the endpoint is scraped.
+Metrics are per process: under gunicorn each worker reports its own, so
+scrape the workers individually or add them up per ``instance``.
+
+The endpoint is only registered when metrics are enabled, and answers admin
+tokens and clients in METRICS_ALLOW.
+
+Configuration (environment):
+    METRICS_ENABLED    set to false to register no hooks, no listeners and no
+                       endpoint (default true)
+    METRICS_ALLOW      comma-separated addresses or networks that may scrape
+                       without a token, e.g. 10.0.0.0/8 (default none). Behind a
+                       reverse proxy every client has the proxy's address.
+"""
+from bisect import bisect_left
+import ipaddress
+import os
+import threading
+import time
+
+from flask import g, request
+from pymongo import monitoring
+
+ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() != 'false'
+ALLOW = [ipaddress.ip_network(network.strip(), strict=False)
+         for network in os.getenv('METRICS_ALLOW', '').split(',') if network.strip()]
+
+# Upper bounds in seconds; requests and commands have different scales
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1, 5)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+_metrics = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=''):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description, labels=()):
+        self.name = name
+        self.description = description
+        self.label_names = labels
+        self.values = {}
+        _metrics.append(self)
+
+    def inc(self, labels=(), amount=1):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        for labels, value in self.values.items():
+            yield self.name + _labels(self.label_names, labels), value
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def dec(self, labels=(), amount=1):
+        self.inc(labels, -amount)
+
+    def set(self, labels, value):
+        with _lock:
+            self.values[labels] = value
+
+
+class Histogram(Counter):
+    kind = 'histogram'
+
+    def __init__(self, name, description, labels=(), buckets=REQUEST_BUCKETS):
+        super().__init__(name, description, labels)
+        self.buckets = buckets
+
+    def observe(self, labels, value):
+        index = bisect_left(self.buckets, value)
+        with _lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                # Per-bucket counts (the last one is +Inf), sum
+                entry = self.values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][index] += 1
+            entry[1] += value
+
+    def samples(self):
+        for labels, (counts, total) in self.values.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield self.name + '_bucket' + _labels(self.label_names, labels, f'le="{bound}"'), cumulative
+            yield self.name + '_sum' + _labels(self.label_names, labels), total
+            yield self.name + '_count' + _labels(self.label_names, labels), cumulative
+
+
+REQUEST_LABELS = ('blueprint', 'endpoint', 'method')
+
+request_duration = Histogram('http_request_duration_seconds', 'Time to handle a request', REQUEST_LABELS)
+requests_total = Counter('http_requests_total', 'Requests handled, by response status',
+                         REQUEST_LABELS + ('status',))
+requests_in_flight = Gauge('http_requests_in_flight', 'Requests being handled', ('blueprint',))
+
+COMMAND_LABELS = ('collection', 'command')
+
+command_duration = Histogram('mongodb_command_duration_seconds', 'Round trip time of MongoDB commands',
+                             COMMAND_LABELS, COMMAND_BUCKETS)
+command_failures = Counter('mongodb_command_failures_total', 'MongoDB commands that returned an error',
+                           COMMAND_LABELS)
+
+pool_max_size = Gauge('mongodb_pool_max_size', 'maxPoolSize of the connection pool', ('address',))
+pool_connections = Gauge('mongodb_pool_connections', 'Open connections in the pool', ('address',))
+pool_checked_out = Gauge('mongodb_pool_checked_out', 'Connections in use by a request', ('address',))
+pool_checkout_wait = Histogram('mongodb_pool_checkout_wait_seconds', 'Time waited for a pooled connection',
+                               ('address',), COMMAND_BUCKETS)
+pool_checkout_failures = Counter('mongodb_pool_checkout_failures_total',
+                                 'Checkouts that failed, e.g. on waitQueueTimeoutMS', ('address', 'reason'))
+
+
+def _address(address):
+    return f'{address[0]}:{address[1]}' if isinstance(address, tuple) else str(address)
+
+
+def command_collection(command_name, command):
+    """Collection a command operates on, or '' for database commands"""
+    target = command.get('collection') if command_name == 'getMore' else command.get(command_name)
+    return target if isinstance(target, str) else ''
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Counts and times commands; durations come from the events themselves"""
+
+    def __init__(self):
+        # (connection, request id) -> labels, from started to succeeded/failed
+        self._pending = {}
+
+    def started(self, event):
+        self._pending[(event.connection_id, event.request_id)] = (
+            command_collection(event.command_name, event.command), event.command_name
+        )
+
+    def succeeded(self, event):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            command_duration.observe(labels, event.duration_micros / 1e6)
+
+    def failed(self, event):
+        labels = self._pending.pop((event.connection_id, event.request_id), None)
+        if labels is not None:
+            command_duration.observe(labels, event.duration_micros / 1e6)
+            command_failures.inc(labels)
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._waiting = threading.local()
+
+    def pool_created(self, event):
+        pool_max_size.set((_address(event.address),), event.options.get('maxPoolSize', 100))
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pool_connections.inc((_address(event.address),))
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pool_connections.dec((_address(event.address),))
+
+    def connection_check_out_started(self, event):
+        self._waiting.since = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        self._observe_wait(event)
+        pool_checkout_failures.inc((_address(event.address), str(event.reason)))
+
+    def connection_checked_out(self, event):
+        self._observe_wait(event)
+        pool_checked_out.inc((_address(event.address),))
+
+    def connection_checked_in(self, event):
+        pool_checked_out.dec((_address(event.address),))
+
+    def _observe_wait(self, event):
+        since = getattr(self._waiting, 'since', None)
+        if since is not None:
+            pool_checkout_wait.observe((_address(event.address),), time.perf_counter() - since)
+            self._waiting.since = None
+
+
+command_listener = CommandMetrics()
+pool_listener = PoolMetrics()
+
+
+def _request_labels():
+    return (request.blueprint or '', request.endpoint or 'unmatched', request.method)
+
+
+def _before_request():
+    g.metrics_started = time.perf_counter()
+    requests_in_flight.inc((request.blueprint or '',))
+
+
+def _after_request(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _teardown_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    labels = _request_labels()
+    request_duration.observe(labels, time.perf_counter() - started)
+    requests_total.inc(labels + (str(g.pop('metrics_status', 500)),))
+    requests_in_flight.dec((request.blueprint or '',))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format"""
+    lines = []
+    with _lock:
+        for metric in _metrics:
+            lines.append(f'# HELP {metric.name} {metric.description}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, value in metric.samples():
+                lines.append(f'{name} {_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def scrape_allowed(address):
+    """Whether ``address`` may read the metrics without an admin token"""
+    try:
+        address = ipaddress.ip_address(address or '')
+    except ValueError:
+        return False
+    return any(address in network for network in ALLOW)
+
+
+def init_app(app):
+    """Register the request hooks and the MongoDB listeners; call before database.connect()"""
+    if not ENABLED:
+        return
+    import database
+    database.add_listener(command_listener)
+    database.add_listener(pool_listener)
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
@@ -1,6 +1,8 @@
-from mongoengine import Document, StringField, IntField, FloatField, DateTimeField, DateField, ListField, ReferenceField, BooleanField
+from mongoengine import Document, EmbeddedDocument, StringField, IntField, FloatField, DateTimeField, DateField, ListField, ReferenceField, BooleanField, EmbeddedDocumentField, CASCADE
 from datetime import datetime
 
+from suggest import normalize
+
 class User(Document):
     username = StringField(required=True, unique=True, max_length=80)
     email = StringField(required=True, unique=True, max_length=120)
@@ -34,6 +36,8 @@ class Hotel(Document):
     description = StringField()
     address = StringField(required=True, max_length=255)
     city = StringField(required=True, max_length=100)
+    # Case-folded, accent-stripped city for indexed exact and prefix filtering
+    city_key = StringField(max_length=100)
     state = StringField(max_length=100)
     country = StringField(required=True, max_length=100)
     zip_code = StringField(max_length=20)
@@ -46,30 +50,67 @@ class Hotel(Document):
     available_rooms = IntField(required=True)
     amenities = ListField(StringField())
     images = ListField(StringField())
+    # Identifier in the source system of a bulk import; re-importing a row updates the hotel
+    external_id = StringField(max_length=100)
     created_at = DateTimeField(default=datetime.utcnow)
     updated_at = DateTimeField(default=datetime.utcnow)
     
     meta = {
         'collection': 'hotels',
         'indexes': [
-            'city',
+            {'fields': ['external_id'], 'unique': True, 'sparse': True},
+            'city_key',
             'rating',
-            'price_per_night'
+            'price_per_night',
+            {
+                # Full-text index for /api/hotels/search, ranked by these weights
+                'fields': ['$name', '$city', '$address', '$description'],
+                'default_language': 'english',
+                'weights': {'name': 10, 'city': 5, 'address': 3, 'description': 1}
+            }
         ]
     }
     
     def save(self, *args, **kwargs):
         if not self.id:
             self.created_at = datetime.utcnow()
+        self.city_key = normalize(self.city)
         self.updated_at = datetime.utcnow()
         return super(Hotel, self).save(*args, **kwargs)
     
+    @classmethod
+    def backfill_city_keys(cls, batch_size=1000):
+        """Set city_key on hotels saved before it existed; returns the number updated"""
+        from pymongo import UpdateOne
+        collection = cls._get_collection()
+        updated = 0
+        batch = []
+        for doc in collection.find({'city_key': {'$exists': False}}, {'city': 1}):
+            batch.append(UpdateOne({'_id': doc['_id']}, {'$set': {'city_key': normalize(doc.get('city'))}}))
+            if len(batch) >= batch_size:
+                updated += collection.bulk_write(batch, ordered=False).modified_count
+                batch = []
+        if batch:
+            updated += collection.bulk_write(batch, ordered=False).modified_count
+        return updated
+    
     def __repr__(self):
         return f'<Hotel {self.name}>'
 
+class HotelSummary(EmbeddedDocument):
+    """Copy of the hotel fields shown in booking listings, stored on the booking"""
+    name = StringField(max_length=100)
+    city = StringField(max_length=100)
+    country = StringField(max_length=100)
+    
+    @classmethod
+    def from_hotel(cls, hotel):
+        return cls(name=hotel.name, city=hotel.city, country=hotel.country)
+
 class Booking(Document):
     user = ReferenceField(User, required=True)
     hotel = ReferenceField(Hotel, required=True)
+    hotel_summary = EmbeddedDocumentField(HotelSummary)
     check_in_date = DateField(required=True)
     check_out_date = DateField(required=True)
     num_guests = IntField(required=True)
@@ -83,19 +124,58 @@ class Booking(Document):
     meta = {
         'collection': 'bookings',
         'indexes': [
-            'user',
-            'hotel',
             'check_in_date',
             'check_out_date',
-            'status'
+            'status',
+            # Newest-first listing and keyset pagination of a user's bookings
+            {'fields': ['user', '-created_at', '-id']},
+            # Same listing filtered by status (GET /api/bookings?status=)
+            {'fields': ['user', 'status', '-created_at', '-id']},
+            # Overlap checks and ledger rebuilds per hotel; also serves hotel-only lookups
+            {'fields': ['hotel', 'status', 'check_in_date', 'check_out_date']}
         ]
     }
     
     def save(self, *args, **kwargs):
         if not self.id:
             self.created_at = datetime.utcnow()
+            # Denormalize the hotel so booking listings need no join
+            if self.hotel_summary is None and isinstance(self.hotel, Hotel):
+                self.hotel_summary = HotelSummary.from_hotel(self.hotel)
         self.updated_at = datetime.utcnow()
         return super(Booking, self).save(*args, **kwargs)
     
     def __repr__(self):
-        return f'<Booking {self.id} - User {self.user.username} - Hotel {self.hotel.name}>'
+        # Use the stored ids so printing a booking never dereferences user or hotel
+        user = self._data.get('user')
+        hotel = self._data.get('hotel')
+        return f'<Booking {self.id} - User {getattr(user, "id", user)} - Hotel {getattr(hotel, "id", hotel)}>'
+
+class HotelNight(Document):
+    """Occupancy ledger: number of confirmed bookings holding a room on one night."""
+    hotel = ReferenceField(Hotel, required=True, reverse_delete_rule=CASCADE)
+    night = DateField(required=True)
+    booked = IntField(default=0)
+    
+    meta = {
+        'collection': 'hotel_nights',
+        'indexes': [
+            {'fields': ['hotel', 'night'], 'unique': True}
+        ]
+    }
+    
+    def __repr__(self):
+        return f'<HotelNight {self.night} booked={self.booked}>'
+
+class CatalogState(Document):
+    """Version counter bumped on every hotel catalog write; drives hotel ETags."""
+    name = StringField(primary_key=True, max_length=50)
+    version = IntField(default=0)
+    updated_at = DateTimeField(default=datetime.utcnow)
+    
+    meta = {
+        'collection': 'catalog_state'
+    }
+    
+    def __repr__(self):
+        return f'<CatalogState {self.name} v{self.version}>'
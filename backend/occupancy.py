@@ -0,0 +1,465 @@
+"""
+Per-night occupancy ledger.
+
+Every confirmed booking holds one room on each night of its stay. Instead of
+counting overlapping bookings on every availability check, we keep one small
+counter document per hotel-night (see models.HotelNight) and update it whenever
+a booking is created, moved or cancelled. An availability check for an N-night
+stay then reads at most N counters.
+
+Reservations go through reserve_stay(), which takes each night with a single
+conditional increment (``booked < capacity``) and gives back the nights it
+already took if a later one is full. Two requests racing for the last room can
+never both win, so no global lock is needed across workers. The capacity is
+read from MongoDB, not from the hotel passed in, which may be a cached copy.
+
+The *_async functions at the end apply the same ledger rules through a Motor
+collection, for the ASGI routes; there a hotel is a raw document.
+"""
+from datetime import datetime, timedelta
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+
+def stay_nights(check_in_date, check_out_date):
+    """Return the nights (as dates) occupied by a stay; check-out night is excluded"""
+    nights = []
+    night = check_in_date
+    while night < check_out_date:
+        nights.append(night)
+        night += timedelta(days=1)
+    return nights
+
+
+def _night_key(night):
+    # DateField values are stored as midnight datetimes
+    return datetime(night.year, night.month, night.day)
+
+
+def _hotel_id(hotel):
+    if isinstance(hotel, dict):
+        return hotel['_id']
+    return getattr(hotel, 'id', hotel)
+
+
+def _capacity(hotel):
+    if isinstance(hotel, dict):
+        return hotel.get('available_rooms', 0)
+    return hotel.available_rooms
+
+
+def _capacity_query(hotel_ids):
+    return {'_id': {'$in': list(hotel_ids)}}, {'available_rooms': 1}
+
+
+def _current_capacities(hotel_ids):
+    """
+    {hotel_id: available_rooms} as stored now. Reservations never trust the
+    capacity of the hotel they are given, which may come from a per-worker
+    cache; a deleted hotel has no rooms.
+    """
+    from models import Hotel
+    query, fields = _capacity_query(hotel_ids)
+    capacities = {hotel_id: 0 for hotel_id in hotel_ids}
+    capacities.update((doc['_id'], doc.get('available_rooms', 0))
+                      for doc in Hotel._get_collection().find(query, fields))
+    return capacities
+
+
+def _stay_filter(hotel_ids, check_in_date, check_out_date):
+    return {
+        'hotel': {'$in': hotel_ids},
+        'night': {'$gte': _night_key(check_in_date), '$lt': _night_key(check_out_date)}
+    }
+
+
+def _peak_pipeline(hotel_ids, check_in_date, check_out_date):
+    return [
+        {'$match': _stay_filter(hotel_ids, check_in_date, check_out_date)},
+        {'$group': {'_id': '$hotel', 'peak': {'$max': '$booked'}}}
+    ]
+
+
+def booked_per_night(hotel, check_in_date, check_out_date):
+    """Return {night: booked} for the nights of the stay that have a counter"""
+    from models import HotelNight
+    counters = HotelNight.objects(
+        hotel=_hotel_id(hotel),
+        night__gte=check_in_date,
+        night__lt=check_out_date
+    ).only('night', 'booked').as_pymongo()
+    return {c['night'].date(): c.get('booked', 0) for c in counters}
+
+
+def free_rooms(hotel, check_in_date, check_out_date, exclude=None):
+    """
+    Return the minimum number of free rooms across every night of the stay.
+
+    ``exclude`` is an optional (check_in_date, check_out_date) pair for a stay
+    that is already counted in the ledger and should be ignored, e.g. the
+    current dates of a booking that is being moved.
+    """
+    booked = booked_per_night(hotel, check_in_date, check_out_date)
+
+    if exclude:
+        for night in stay_nights(*exclude):
+            if night in booked:
+                booked[night] -= 1
+
+    peak = max(booked.values(), default=0)
+    return max(0, hotel.available_rooms - peak)
+
+
+def free_rooms_by_hotel(hotels, check_in_date, check_out_date):
+    """
+    Return {hotel_id: free rooms} for many hotels with a single grouped
+    aggregation over the ledger.
+    """
+    from models import HotelNight
+    pipeline = _peak_pipeline([_hotel_id(hotel) for hotel in hotels], check_in_date, check_out_date)
+    peaks = {row['_id']: row['peak'] for row in HotelNight.objects.aggregate(pipeline)}
+    return {
+        hotel.id: max(0, hotel.available_rooms - peaks.get(hotel.id, 0))
+        for hotel in hotels
+    }
+
+
+def availability_stages(check_in_date, check_out_date, rooms_needed=1):
+    """
+    Aggregation stages for the hotels collection that keep only hotels with at
+    least ``rooms_needed`` free rooms on every night of the stay.
+
+    Each hotel is joined with its ledger counters for the stay (served by the
+    (hotel, night) index) and gets a ``free_rooms`` field.
+    """
+    from models import HotelNight
+    return [
+        {'$lookup': {
+            'from': HotelNight._get_collection_name(),
+            'let': {'hotel_id': '$_id'},
+            'pipeline': [
+                {'$match': {
+                    '$expr': {'$eq': ['$hotel', '$$hotel_id']},
+                    'night': {'$gte': _night_key(check_in_date), '$lt': _night_key(check_out_date)}
+                }},
+                {'$group': {'_id': None, 'peak': {'$max': '$booked'}}}
+            ],
+            'as': 'occupancy'
+        }},
+        {'$addFields': {
+            'free_rooms': {'$subtract': [
+                '$available_rooms',
+                {'$ifNull': [{'$max': '$occupancy.peak'}, 0]}
+            ]}
+        }},
+        {'$match': {'free_rooms': {'$gte': rooms_needed}}},
+        {'$project': {'occupancy': 0}}
+    ]
+
+
+def _take_query(hotel_id, night, capacity, rooms=1):
+    return {'hotel': hotel_id, 'night': _night_key(night), 'booked': {'$lte': capacity - rooms}}
+
+
+def _release_requests(hotel, nights):
+    return [
+        UpdateOne(
+            {'hotel': _hotel_id(hotel), 'night': _night_key(night)},
+            {'$inc': {'booked': -1}}
+        )
+        for night in nights
+    ]
+
+
+def _moved_nights(old_dates, new_dates):
+    """Return (nights to take, nights to give back) when moving a stay"""
+    old_nights = stay_nights(*old_dates)
+    new_nights = stay_nights(*new_dates)
+    added = [night for night in new_nights if night not in old_nights]
+    removed = [night for night in old_nights if night not in new_nights]
+    return added, removed
+
+
+def _take_night(collection, hotel_id, night, capacity, rooms=1):
+    query = _take_query(hotel_id, night, capacity, rooms)
+    try:
+        # Creates the counter on the first booking for this night
+        collection.find_one_and_update(query, {'$inc': {'booked': rooms}}, upsert=True)
+        return True
+    except DuplicateKeyError:
+        # The counter exists and is full, or a concurrent request created it first
+        return collection.find_one_and_update(query, {'$inc': {'booked': rooms}}) is not None
+
+
+def _release_nights(hotel, nights):
+    from models import HotelNight
+    requests = _release_requests(hotel, nights)
+    if requests:
+        HotelNight._get_collection().bulk_write(requests, ordered=False)
+
+
+def _reserve_nights(hotel, nights):
+    from models import HotelNight
+    if not nights:
+        return True
+    hotel_id = _hotel_id(hotel)
+    capacity = _current_capacities([hotel_id])[hotel_id]
+    if capacity <= 0:
+        return False
+
+    collection = HotelNight._get_collection()
+    taken = []
+    for night in nights:
+        if not _take_night(collection, hotel_id, night, capacity):
+            # Roll back the nights we already hold
+            _release_nights(hotel, taken)
+            return False
+        taken.append(night)
+    return True
+
+
+def reserve_stay(hotel, check_in_date, check_out_date):
+    """
+    Atomically take one room on every night of the stay.
+
+    Returns False, leaving the ledger unchanged, if any night is already at the
+    hotel's capacity.
+    """
+    return _reserve_nights(hotel, stay_nights(check_in_date, check_out_date))
+
+
+def move_stay(hotel, old_dates, new_dates):
+    """
+    Start moving a reservation from ``old_dates`` to ``new_dates`` (both
+    (check_in_date, check_out_date) pairs) by taking the nights only the new
+    stay has.
+
+    Nights shared by both stays stay held, and so do the old nights until the
+    booking is written: then call finish_move() to give them back, or
+    undo_move() if the write did not go through. Until then nobody else can
+    take them, so neither call can push a night past capacity. Returns False,
+    leaving the ledger unchanged, if a new night is full.
+    """
+    added, _ = _moved_nights(old_dates, new_dates)
+    return _reserve_nights(hotel, added)
+
+
+def finish_move(hotel, old_dates, new_dates):
+    """Give back the nights a written move_stay() left behind"""
+    _, removed = _moved_nights(old_dates, new_dates)
+    _release_nights(hotel, removed)
+
+
+def undo_move(hotel, old_dates, new_dates):
+    """Give back the nights move_stay() took when the booking write did not go through"""
+    added, _ = _moved_nights(old_dates, new_dates)
+    _release_nights(hotel, added)
+
+
+def release_stay(hotel, check_in_date, check_out_date):
+    """Give back the room held on every night of the stay"""
+    _release_nights(hotel, stay_nights(check_in_date, check_out_date))
+
+
+def _block_rooms(stays):
+    """{(hotel_id, night): rooms} needed by a list of (hotel, check_in_date, check_out_date)"""
+    rooms = {}
+    for hotel, check_in_date, check_out_date in stays:
+        for night in stay_nights(check_in_date, check_out_date):
+            key = (_hotel_id(hotel), night)
+            rooms[key] = rooms.get(key, 0) + 1
+    return rooms
+
+
+def _release_rooms(rooms):
+    from models import HotelNight
+    requests = [
+        UpdateOne({'hotel': hotel_id, 'night': _night_key(night)}, {'$inc': {'booked': -count}})
+        for (hotel_id, night), count in rooms
+    ]
+    if requests:
+        HotelNight._get_collection().bulk_write(requests, ordered=False)
+
+
+def check_block(stays):
+    """
+    Return, for each (hotel, check_in_date, check_out_date) in ``stays``,
+    whether it fits, reading the ledger for every hotel and night with a
+    single query. Stays are considered in order: one that fits takes its
+    rooms away from the stays after it.
+
+    This is only a pre-check; the rooms are taken by reserve_block() or
+    reserve_stay(), which stay correct under concurrent bookings.
+    """
+    from models import HotelNight
+    if not stays:
+        return []
+    hotel_ids = list({_hotel_id(hotel) for hotel, _, _ in stays})
+    start = min(check_in_date for _, check_in_date, _ in stays)
+    end = max(check_out_date for _, _, check_out_date in stays)
+    counters = HotelNight.objects(__raw__=_stay_filter(hotel_ids, start, end)).only('hotel', 'night', 'booked')
+    booked = {(c['hotel'], c['night'].date()): c.get('booked', 0) for c in counters.as_pymongo()}
+
+    fits = []
+    for hotel, check_in_date, check_out_date in stays:
+        keys = [(_hotel_id(hotel), night) for night in stay_nights(check_in_date, check_out_date)]
+        fit = all(booked.get(key, 0) < _capacity(hotel) for key in keys)
+        if fit:
+            for key in keys:
+                booked[key] = booked.get(key, 0) + 1
+        fits.append(fit)
+    return fits
+
+
+def reserve_block(stays):
+    """
+    Atomically take one room per stay on every night of several stays (a list
+    of (hotel, check_in_date, check_out_date)), all or nothing. The rooms the
+    block needs on one hotel-night are taken with a single conditional
+    increment.
+
+    Returns False, leaving the ledger unchanged, if any hotel-night lacks the
+    rooms.
+    """
+    from models import HotelNight
+    collection = HotelNight._get_collection()
+    capacities = _current_capacities({_hotel_id(hotel) for hotel, _, _ in stays})
+    taken = []
+    for (hotel_id, night), rooms in _block_rooms(stays).items():
+        capacity = capacities[hotel_id]
+        if rooms > capacity or not _take_night(collection, hotel_id, night, capacity, rooms):
+            _release_rooms(taken)
+            return False
+        taken.append(((hotel_id, night), rooms))
+    return True
+
+
+def release_block(stays):
+    """Give back the rooms taken by reserve_block()"""
+    _release_rooms(_block_rooms(stays).items())
+
+
+def _insert_counters(totals):
+    from models import HotelNight
+    if totals:
+        HotelNight._get_collection().insert_many(
+            [{'hotel': hotel_id, 'night': night, 'booked': booked}
+             for (hotel_id, night), booked in totals.items()],
+            ordered=False
+        )
+    return len(totals)
+
+
+def rebuild(hotel=None, batch_size=10000):
+    """
+    Recompute the ledger from confirmed bookings.
+
+    Used after seeding or when bookings were written without going through the
+    booking routes. Pass a hotel to rebuild only its counters.
+
+    Bookings are read in hotel order, so every counter of a hotel is complete
+    once the next hotel starts; counters are written whenever at least
+    ``batch_size`` are complete, and memory stays bounded however many
+    bookings there are.
+    """
+    from models import Booking, HotelNight
+    counters = HotelNight.objects
+    bookings = Booking.objects(status='confirmed')
+    if hotel is not None:
+        counters = counters.filter(hotel=_hotel_id(hotel))
+        bookings = bookings.filter(hotel=_hotel_id(hotel))
+    counters.delete()
+
+    written = 0
+    totals = {}
+    current = None
+    bookings = bookings.order_by('hotel').only('hotel', 'check_in_date', 'check_out_date')
+    for booking in bookings.as_pymongo():
+        if booking['hotel'] != current and len(totals) >= batch_size:
+            written += _insert_counters(totals)
+            totals = {}
+        current = booking['hotel']
+        check_in_date = booking['check_in_date'].date()
+        check_out_date = booking['check_out_date'].date()
+        for night in stay_nights(check_in_date, check_out_date):
+            key = (booking['hotel'], _night_key(night))
+            totals[key] = totals.get(key, 0) + 1
+    return written + _insert_counters(totals)
+
+
+async def free_rooms_async(collection, hotel, check_in_date, check_out_date):
+    """free_rooms() through a Motor hotel_nights collection"""
+    peaks = await free_rooms_by_hotel_async(collection, [hotel], check_in_date, check_out_date)
+    return peaks[_hotel_id(hotel)]
+
+
+async def free_rooms_by_hotel_async(collection, hotels, check_in_date, check_out_date):
+    """free_rooms_by_hotel() through a Motor hotel_nights collection"""
+    pipeline = _peak_pipeline([_hotel_id(hotel) for hotel in hotels], check_in_date, check_out_date)
+    peaks = {row['_id']: row['peak'] async for row in collection.aggregate(pipeline)}
+    return {
+        _hotel_id(hotel): max(0, _capacity(hotel) - peaks.get(_hotel_id(hotel), 0))
+        for hotel in hotels
+    }
+
+
+async def _take_night_async(collection, hotel_id, night, capacity):
+    query = _take_query(hotel_id, night, capacity)
+    try:
+        await collection.find_one_and_update(query, {'$inc': {'booked': 1}}, upsert=True)
+        return True
+    except DuplicateKeyError:
+        return await collection.find_one_and_update(query, {'$inc': {'booked': 1}}) is not None
+
+
+async def _release_nights_async(collection, hotel, nights):
+    requests = _release_requests(hotel, nights)
+    if requests:
+        await collection.bulk_write(requests, ordered=False)
+
+
+async def _reserve_nights_async(collection, hotel, nights):
+    if not nights:
+        return True
+    hotel_id = _hotel_id(hotel)
+    query, fields = _capacity_query([hotel_id])
+    doc = await collection.database.hotels.find_one(query, fields)
+    capacity = doc.get('available_rooms', 0) if doc else 0
+    if capacity <= 0:
+        return False
+
+    taken = []
+    for night in nights:
+        if not await _take_night_async(collection, hotel_id, night, capacity):
+            await _release_nights_async(collection, hotel, taken)
+            return False
+        taken.append(night)
+    return True
+
+
+async def reserve_stay_async(collection, hotel, check_in_date, check_out_date):
+    """reserve_stay() through a Motor hotel_nights collection"""
+    return await _reserve_nights_async(collection, hotel, stay_nights(check_in_date, check_out_date))
+
+
+async def move_stay_async(collection, hotel, old_dates, new_dates):
+    """move_stay() through a Motor hotel_nights collection"""
+    added, _ = _moved_nights(old_dates, new_dates)
+    return await _reserve_nights_async(collection, hotel, added)
+
+
+async def finish_move_async(collection, hotel, old_dates, new_dates):
+    """finish_move() through a Motor hotel_nights collection"""
+    _, removed = _moved_nights(old_dates, new_dates)
+    await _release_nights_async(collection, hotel, removed)
+
+
+async def undo_move_async(collection, hotel, old_dates, new_dates):
+    """undo_move() through a Motor hotel_nights collection"""
+    added, _ = _moved_nights(old_dates, new_dates)
+    await _release_nights_async(collection, hotel, added)
+
+
+async def release_stay_async(collection, hotel, check_in_date, check_out_date):
+    """release_stay() through a Motor hotel_nights collection"""
+    await _release_nights_async(collection, hotel, stay_nights(check_in_date, check_out_date))
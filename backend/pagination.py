@@ -0,0 +1,50 @@
+"""
+Keyset (cursor) pagination helpers.
+
+A cursor is an opaque, URL-safe token holding the sort key and _id of the last
+row of a page. The next page seeks past it with range predicates on an index,
+so every page costs the same no matter how deep it is, unlike skip/limit.
+"""
+import base64
+from bson import json_util
+
+
+def encode_cursor(*values):
+    """Encode the sort key values of the last row into an opaque cursor"""
+    raw = json_util.dumps(list(values)).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, types):
+    """
+    Decode a cursor produced by encode_cursor into one value per type in
+    ``types`` (e.g. ``(datetime, ObjectId)``).
+
+    Raises ValueError for anything that is not a cursor we issued. The values
+    go straight into a query filter, so a value of another type (a dict
+    would be read as a query operator) is rejected too.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json_util.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != len(types):
+        raise ValueError('Invalid cursor')
+    if not all(isinstance(value, kind) for value, kind in zip(values, types)):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def seek_after(fields, values):
+    """
+    Build the raw filter selecting rows strictly after ``values`` in the order
+    given by ``fields``, a list of (field, direction) pairs with direction
+    1 (ascending) or -1 (descending).
+    """
+    clauses = []
+    for i, (field, direction) in enumerate(fields):
+        clause = {f: v for (f, _), v in zip(fields[:i], values[:i])}
+        clause[field] = {'$gt' if direction == 1 else '$lt': values[i]}
+        clauses.append(clause)
+    return clauses[0] if len(clauses) == 1 else {'$or': clauses}
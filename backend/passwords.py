@@ -0,0 +1,73 @@
+"""
+Password hashing on a bounded worker pool.
+
+bcrypt is deliberately slow CPU work. Running it inline lets a burst of
+logins occupy every request thread, and the booking endpoints starve. Hashes
+are computed on a small dedicated pool instead (bcrypt releases the GIL while
+hashing). Once the pool and its short queue are full, new requests are refused
+with HashingBusy, which the auth routes turn into a 503, instead of piling up.
+
+Configuration (environment):
+    BCRYPT_LOG_ROUNDS        bcrypt cost for new hashes (default 12); older
+                             hashes are upgraded on the next successful login
+    PASSWORD_HASH_WORKERS    threads hashing concurrently (default: CPU count)
+    PASSWORD_HASH_QUEUE      extra requests allowed to wait (default 4 per worker)
+    PASSWORD_HASH_TIMEOUT    seconds a request waits for its hash (default 10)
+"""
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+import os
+import threading
+
+WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', str(os.cpu_count() or 2)))
+QUEUE_LIMIT = int(os.getenv('PASSWORD_HASH_QUEUE', str(WORKERS * 4)))
+TIMEOUT = float(os.getenv('PASSWORD_HASH_TIMEOUT', '10'))
+
+_executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='password-hash')
+_slots = threading.BoundedSemaphore(WORKERS + QUEUE_LIMIT)
+
+
+class HashingBusy(Exception):
+    """All hashing workers and queue slots are taken, or the hash timed out"""
+
+
+def _bcrypt():
+    from app import bcrypt
+    return bcrypt
+
+
+def _run(fn, *args):
+    if not _slots.acquire(blocking=False):
+        raise HashingBusy()
+    try:
+        future = _executor.submit(fn, *args)
+    except Exception:
+        _slots.release()
+        raise
+    future.add_done_callback(lambda _: _slots.release())
+    try:
+        return future.result(timeout=TIMEOUT)
+    except TimeoutError:
+        raise HashingBusy()
+
+
+def hash_password(password):
+    """Return a bcrypt hash of ``password`` at the configured cost"""
+    return _run(_bcrypt().generate_password_hash, password).decode('utf-8')
+
+
+def check_password(password_hash, password):
+    return _run(_bcrypt().check_password_hash, password_hash, password)
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a bcrypt hash such as '$2b$12$...', or None"""
+    parts = (password_hash or '').split('$')
+    try:
+        return int(parts[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def needs_rehash(password_hash):
+    """True when the hash was made with a different cost than configured"""
+    return hash_rounds(password_hash) != _bcrypt()._log_rounds
@@ -0,0 +1,224 @@
+"""
+Query budgets for tests: count the MongoDB commands a block of code sends.
+
+N+1 queries, such as dereferencing ``booking.hotel`` for every booking on a
+page, stay invisible in a test that only checks the response. A budget makes
+them fail:
+
+    from query_budget import query_budget
+
+    with query_budget(3):
+        client.get('/api/bookings/?per_page=50', headers=auth)
+
+When more commands are sent than the budget allows, QueryBudgetExceeded (an
+AssertionError) lists each of them as collection, command and redacted shape,
+and points at the shapes that repeat. record_queries() only collects them:
+
+    with record_queries() as queries:
+        client.get('/api/bookings/?per_page=5', headers=auth)
+    assert len(queries) == ...
+
+Only commands sent by the thread that entered the block are counted, so
+background work (typeahead refresh, slow-query explains) does not interfere.
+The Flask test client handles requests on the calling thread.
+
+Against a real MongoDB, commands are counted by a pymongo listener, which
+only sees clients created after this module is imported: import it before
+the app connects, e.g. load it as a pytest plugin with ``-p query_budget`` or
+``pytest_plugins = ['query_budget']``, which also provides a ``query_budget``
+fixture. Against mongomock, which sends no command events, the collection
+methods are wrapped instead.
+"""
+from collections import Counter, namedtuple
+import functools
+import json
+import threading
+
+from pymongo import monitoring
+
+import database
+import metrics
+from slow_queries import command_shape
+
+Query = namedtuple('Query', 'collection command shape')
+
+# mongomock Collection methods -> (command name, command field, method argument it comes from).
+# find() is counted when its cursor first reads, as pymongo only sends it then.
+MONGOMOCK_COMMANDS = {
+    'find_one': ('find', 'filter', 'filter'),
+    'find_one_and_update': ('findAndModify', 'query', 'filter'),
+    'find_one_and_replace': ('findAndModify', 'query', 'filter'),
+    'find_one_and_delete': ('findAndModify', 'query', 'filter'),
+    'insert_one': ('insert', 'documents', 'document'),
+    'insert_many': ('insert', 'documents', 'documents'),
+    'update_one': ('update', 'q', 'filter'),
+    'update_many': ('update', 'q', 'filter'),
+    'replace_one': ('update', 'q', 'filter'),
+    'delete_one': ('delete', 'q', 'filter'),
+    'delete_many': ('delete', 'q', 'filter'),
+    'bulk_write': ('bulkWrite', None, None),
+    'aggregate': ('aggregate', 'pipeline', 'pipeline'),
+    'count_documents': ('aggregate', 'filter', 'filter'),
+    'estimated_document_count': ('count', None, None),
+    'distinct': ('distinct', 'key', 'key'),
+    'create_index': ('createIndexes', None, None)
+}
+
+# Recorders active on each thread
+_active = threading.local()
+_mongomock_wrapped = False
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _record(collection, command_name, command):
+    recorders = getattr(_active, 'recorders', None)
+    if recorders:
+        query = Query(collection, command_name, command_shape(command_name, command))
+        for recorder in recorders:
+            recorder.append(query)
+
+
+class _Listener(monitoring.CommandListener):
+    def started(self, event):
+        if getattr(_active, 'recorders', None):
+            _record(metrics.command_collection(event.command_name, event.command), event.command_name,
+                    event.command)
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+listener = _Listener()
+
+
+def _wrap_mongomock():
+    """Record mongomock collection calls as the commands pymongo would send"""
+    global _mongomock_wrapped
+    if _mongomock_wrapped:
+        return
+    from mongomock.collection import Collection, Cursor
+
+    def recorded(method, command_name, field, argument):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            command = {command_name: self.name}
+            if field:
+                value = args[0] if args else kwargs.get(argument)
+                if field == 'documents':
+                    value = [value] if isinstance(value, dict) else list(value or ())
+                command[field] = value
+            _record(self.name, command_name, command)
+            # mongomock runs some of these through find(); that is not another command
+            _active.mongomock_depth = getattr(_active, 'mongomock_depth', 0) + 1
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                _active.mongomock_depth -= 1
+        return wrapper
+
+    for name, (command_name, field, argument) in MONGOMOCK_COMMANDS.items():
+        setattr(Collection, name, recorded(getattr(Collection, name), command_name, field, argument))
+
+    compute_results = Cursor._compute_results
+    rewind = Cursor.rewind
+
+    @functools.wraps(compute_results)
+    def cursor_compute_results(self, *args, **kwargs):
+        if not getattr(self, '_query_budget_sent', False) and not getattr(_active, 'mongomock_depth', 0):
+            self._query_budget_sent = True
+            name = self.collection.name
+            _record(name, 'find', {'find': name, 'filter': self._spec})
+        return compute_results(self, *args, **kwargs)
+
+    @functools.wraps(rewind)
+    def cursor_rewind(self):
+        self._query_budget_sent = False
+        return rewind(self)
+
+    Cursor._compute_results = cursor_compute_results
+    Cursor.rewind = cursor_rewind
+    _mongomock_wrapped = True
+
+
+def _check_connection():
+    """Make sure the commands of the current connection will be seen"""
+    from mongoengine.connection import get_connection
+    client = get_connection()
+    if type(client).__module__.startswith('mongomock'):
+        _wrap_mongomock()
+    elif listener not in client.options.event_listeners:
+        raise RuntimeError('MongoDB connection was opened before query_budget was imported; '
+                           'load it as a pytest plugin (-p query_budget) or import it before the app')
+
+
+class QueryRecorder(list):
+    """List of the Query tuples sent by this thread inside the with block"""
+
+    def __enter__(self):
+        _check_connection()
+        if not hasattr(_active, 'recorders'):
+            _active.recorders = []
+        _active.recorders.append(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _active.recorders.remove(self)
+        return False
+
+    def describe(self):
+        """Numbered list of the commands, with the repeated shapes (likely N+1) last"""
+        lines = []
+        keys = []
+        for number, query in enumerate(self, 1):
+            key = f'{query.command} {query.collection} {json.dumps(query.shape, default=str)}'
+            keys.append(key)
+            lines.append(f'  {number}. {key}')
+        repeated = [(key, count) for key, count in Counter(keys).items() if count > 1]
+        if repeated:
+            lines.append('Repeated:')
+            lines.extend(f'  {count} x {key}' for key, count in repeated)
+        return '\n'.join(lines)
+
+
+def record_queries():
+    return QueryRecorder()
+
+
+class QueryBudget(QueryRecorder):
+    def __init__(self, limit, label=None):
+        super().__init__()
+        self.limit = limit
+        self.label = label
+
+    def __exit__(self, exc_type, exc, tb):
+        super().__exit__(exc_type, exc, tb)
+        if exc_type is None and len(self) > self.limit:
+            prefix = f'{self.label}: ' if self.label else ''
+            raise QueryBudgetExceeded(f'{prefix}expected at most {self.limit} MongoDB commands, '
+                                      f'{len(self)} were sent:\n{self.describe()}')
+        return False
+
+
+def query_budget(limit, label=None):
+    """Fail the with block when it sends more than ``limit`` MongoDB commands"""
+    return QueryBudget(limit, label)
+
+
+database.add_listener(listener)
+
+try:
+    import pytest
+except ImportError:
+    pytest = None
+
+if pytest is not None:
+    @pytest.fixture(name='query_budget')
+    def query_budget_fixture():
+        """The query_budget context manager, for tests that load this module as a plugin"""
+        return query_budget
@@ -0,0 +1,361 @@
+"""
+ASGI (Quart + Motor) variant of the /api/bookings routes.
+
+Same validation, ledger rules and response bodies as routes/bookings.py. New
+bookings are built and validated with the Booking model and inserted as its
+to_mongo() document.
+"""
+from datetime import datetime, date
+
+from bson import ObjectId
+from quart import Blueprint, request, jsonify, g
+
+import async_support
+import occupancy
+import pagination
+import validation
+from routes.bookings import BOOKING_LIST_FIELDS, _booking_list_item
+
+async_bookings_bp = Blueprint('async_bookings', __name__)
+
+
+def _bookings():
+    from models import Booking
+    return async_support.collection(Booking)
+
+
+def _nights():
+    from models import HotelNight
+    return async_support.collection(HotelNight)
+
+
+async def _hotel_summaries(hotel_ids):
+    from models import Hotel
+    hotels = await async_support.collection(Hotel).find(
+        {'_id': {'$in': list(set(hotel_ids))}},
+        {'name': 1, 'city': 1, 'country': 1}
+    ).to_list(None)
+    return {
+        hotel['_id']: {
+            'id': str(hotel['_id']),
+            'name': hotel.get('name'),
+            'city': hotel.get('city'),
+            'country': hotel.get('country')
+        }
+        for hotel in hotels
+    }
+
+
+async def _owned_booking(booking_id):
+    """Return (booking, error response) for a booking of the current user"""
+    oid = async_support.object_id(booking_id)
+    booking = await _bookings().find_one({'_id': oid}) if oid else None
+    if not booking:
+        return None, (jsonify({'error': 'Booking not found'}), 404)
+    if booking['user'] != g.user['_id']:
+        return None, (jsonify({'error': 'Unauthorized access'}), 403)
+    return booking, None
+
+
+@async_bookings_bp.route('/', methods=['POST'])
+@async_support.jwt_required
+async def create_booking():
+    try:
+        try:
+            data = validation.parse_new_booking(await request.get_json())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        check_in_date = data['check_in_date']
+        check_out_date = data['check_out_date']
+
+        from models import Booking, HotelSummary
+        hotel = await async_support.load_hotel(data['hotel_id'])
+        if not hotel:
+            return jsonify({'error': 'Hotel not found'}), 404
+
+        # Validate with the model before taking any rooms
+        from mongoengine.errors import ValidationError
+        nights = (check_out_date - check_in_date).days
+        now = datetime.utcnow()
+        new_booking = Booking(
+            user=g.user['_id'],
+            hotel=hotel['_id'],
+            hotel_summary=HotelSummary(name=hotel.get('name'), city=hotel.get('city'), country=hotel.get('country')),
+            check_in_date=check_in_date,
+            check_out_date=check_out_date,
+            num_guests=data['num_guests'],
+            room_type=data['room_type'],
+            total_price=hotel['price_per_night'] * nights,
+            special_requests=data['special_requests'],
+            created_at=now,
+            updated_at=now
+        )
+        try:
+            new_booking.validate()
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+
+        if not await occupancy.reserve_stay_async(_nights(), hotel, check_in_date, check_out_date):
+            return jsonify({'error': 'No rooms available for the selected dates'}), 400
+
+        try:
+            result = await _bookings().insert_one(new_booking.to_mongo())
+        except Exception:
+            await occupancy.release_stay_async(_nights(), hotel, check_in_date, check_out_date)
+            raise
+
+        return jsonify({
+            'message': 'Booking created successfully',
+            'booking': {
+                'id': str(result.inserted_id),
+                'hotel_id': str(hotel['_id']),
+                'check_in_date': check_in_date.isoformat(),
+                'check_out_date': check_out_date.isoformat(),
+                'num_guests': new_booking.num_guests,
+                'room_type': new_booking.room_type,
+                'total_price': new_booking.total_price,
+                'status': new_booking.status,
+                'created_at': now.isoformat()
+            }
+        }), 201
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_bookings_bp.route('/', methods=['GET'])
+@async_support.jwt_required
+async def get_user_bookings():
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        status = request.args.get('status')
+
+        filters = {'user': g.user['_id']}
+        if status:
+            filters['status'] = status
+        query = filters
+
+        use_cursor = 'cursor' in request.args
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        projection = dict.fromkeys(BOOKING_LIST_FIELDS, 1)
+        order = [('created_at', -1), ('_id', -1)]
+
+        if use_cursor:
+            total = await _bookings().count_documents(filters) if include_total else None
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    last_created_at, last_id = pagination.decode_cursor(cursor, (datetime, ObjectId))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                query = {'$and': [filters, pagination.seek_after(order, [last_created_at, last_id])]}
+            bookings = await _bookings().find(query, projection).sort(order).limit(per_page + 1).to_list(None)
+            has_next = len(bookings) > per_page
+            bookings = bookings[:per_page]
+        else:
+            total = await _bookings().count_documents(filters)
+            skip = (page - 1) * per_page
+            bookings = await _bookings().find(query, projection).sort(order).skip(skip).limit(per_page).to_list(None)
+
+        missing = [booking['hotel'] for booking in bookings if not booking.get('hotel_summary')]
+        hotels = await _hotel_summaries(missing) if missing else {}
+        booking_list = []
+        for booking in bookings:
+            summary = booking.get('hotel_summary')
+            if summary:
+                hotel_info = {
+                    'id': str(booking['hotel']),
+                    'name': summary.get('name'),
+                    'city': summary.get('city'),
+                    'country': summary.get('country')
+                }
+            else:
+                hotel_info = hotels.get(booking['hotel'])
+            booking_list.append(_booking_list_item(booking, hotel_info))
+
+        if use_cursor:
+            pagination_data = {
+                'per_page': per_page,
+                'next_cursor': pagination.encode_cursor(bookings[-1]['created_at'], bookings[-1]['_id']) if has_next else None,
+                'has_next': has_next
+            }
+            if total is not None:
+                pagination_data['total'] = total
+            return jsonify({'bookings': booking_list, 'pagination': pagination_data}), 200
+
+        total_pages = (total + per_page - 1) // per_page
+
+        return jsonify({
+            'bookings': booking_list,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': total_pages,
+                'has_next': page < total_pages,
+                'has_prev': page > 1
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_bookings_bp.route('/<booking_id>', methods=['GET'])
+@async_support.jwt_required
+async def get_booking_detail(booking_id):
+    try:
+        booking, error = await _owned_booking(booking_id)
+        if error:
+            return error
+
+        hotel = await async_support.load_hotel(booking['hotel'])
+        hotel_info = {
+            'id': str(hotel['_id']),
+            'name': hotel.get('name'),
+            'address': hotel.get('address'),
+            'city': hotel.get('city'),
+            'state': hotel.get('state'),
+            'country': hotel.get('country'),
+            'phone': hotel.get('phone'),
+            'email': hotel.get('email')
+        } if hotel else None
+
+        return jsonify({
+            'id': str(booking['_id']),
+            'hotel': hotel_info,
+            'check_in_date': booking['check_in_date'].date().isoformat(),
+            'check_out_date': booking['check_out_date'].date().isoformat(),
+            'num_guests': booking.get('num_guests'),
+            'room_type': booking.get('room_type'),
+            'total_price': booking.get('total_price'),
+            'status': booking.get('status', 'confirmed'),
+            'special_requests': booking.get('special_requests'),
+            'created_at': booking['created_at'].isoformat(),
+            'updated_at': booking['updated_at'].isoformat()
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_bookings_bp.route('/<booking_id>', methods=['PUT'])
+@async_support.jwt_required
+async def update_booking(booking_id):
+    try:
+        booking, error = await _owned_booking(booking_id)
+        if error:
+            return error
+
+        if booking.get('status', 'confirmed') != 'confirmed':
+            return jsonify({'error': 'Only confirmed bookings can be modified'}), 400
+
+        data = await request.get_json()
+        changes = {field: data[field] for field in ('special_requests', 'room_type', 'num_guests') if field in data}
+        old_dates = (booking['check_in_date'].date(), booking['check_out_date'].date())
+        new_dates = old_dates
+        hotel = None
+
+        if 'check_in_date' in data or 'check_out_date' in data:
+            try:
+                new_dates = validation.parse_stay(
+                    data.get('check_in_date', old_dates[0].isoformat()),
+                    data.get('check_out_date', old_dates[1].isoformat())
+                )
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+
+            hotel = await async_support.load_hotel(booking['hotel'])
+            if not hotel:
+                return jsonify({'error': 'Hotel not found'}), 404
+            changes['check_in_date'] = datetime.combine(new_dates[0], datetime.min.time())
+            changes['check_out_date'] = datetime.combine(new_dates[1], datetime.min.time())
+            changes['total_price'] = hotel['price_per_night'] * (new_dates[1] - new_dates[0]).days
+
+        # Validate the updated booking with the model before the ledger is touched
+        from models import Booking
+        from mongoengine.errors import ValidationError
+        old_stay = {'check_in_date': booking['check_in_date'], 'check_out_date': booking['check_out_date']}
+        booking.update(changes)
+        try:
+            document = Booking._from_son(booking)
+            document.validate()
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        # Written as the model stores them, e.g. num_guests '7' as 7
+        converted = document.to_mongo()
+        changes = {field: converted.get(field) for field in changes}
+        booking.update(changes)
+
+        if hotel is not None and not await occupancy.move_stay_async(_nights(), hotel, old_dates, new_dates):
+            return jsonify({'error': 'No rooms available for the new dates'}), 400
+
+        # Only written if the booking is still confirmed for the nights it
+        # holds; otherwise the new nights are given back
+        changes['updated_at'] = datetime.utcnow()
+        try:
+            result = await _bookings().update_one(
+                {'_id': booking['_id'], 'status': 'confirmed', **old_stay},
+                {'$set': changes}
+            )
+        except Exception:
+            if hotel is not None:
+                await occupancy.undo_move_async(_nights(), hotel, old_dates, new_dates)
+            raise
+        if not result.matched_count:
+            if hotel is not None:
+                await occupancy.undo_move_async(_nights(), hotel, old_dates, new_dates)
+            return jsonify({'error': 'Booking was changed by another request, please retry'}), 409
+        if hotel is not None:
+            await occupancy.finish_move_async(_nights(), hotel, old_dates, new_dates)
+
+        return jsonify({
+            'message': 'Booking updated successfully',
+            'booking': {
+                'id': str(booking['_id']),
+                'check_in_date': new_dates[0].isoformat(),
+                'check_out_date': new_dates[1].isoformat(),
+                'num_guests': booking.get('num_guests'),
+                'room_type': booking.get('room_type'),
+                'total_price': booking.get('total_price'),
+                'status': booking.get('status', 'confirmed'),
+                'special_requests': booking.get('special_requests')
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_bookings_bp.route('/<booking_id>/cancel', methods=['POST'])
+@async_support.jwt_required
+async def cancel_booking(booking_id):
+    try:
+        booking, error = await _owned_booking(booking_id)
+        if error:
+            return error
+
+        if booking.get('status', 'confirmed') != 'confirmed':
+            return jsonify({'error': 'Only confirmed bookings can be cancelled'}), 400
+
+        check_in_date = booking['check_in_date'].date()
+        check_out_date = booking['check_out_date'].date()
+        if check_in_date <= date.today():
+            return jsonify({'error': 'Cannot cancel booking on or after check-in date'}), 400
+
+        # The status and date checks are part of the update, so a repeated
+        # cancel cannot release the nights twice, and a concurrent update that
+        # moved the stay makes this match nothing
+        result = await _bookings().update_one(
+            {'_id': booking['_id'], 'status': 'confirmed',
+             'check_in_date': booking['check_in_date'], 'check_out_date': booking['check_out_date']},
+            {'$set': {'status': 'cancelled', 'updated_at': datetime.utcnow()}}
+        )
+        if not result.modified_count:
+            return jsonify({'error': 'Booking was changed by another request, please retry'}), 409
+        await occupancy.release_stay_async(_nights(), booking['hotel'], check_in_date, check_out_date)
+
+        return jsonify({
+            'message': 'Booking cancelled successfully',
+            'booking_id': str(booking['_id'])
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
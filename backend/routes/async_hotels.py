@@ -0,0 +1,250 @@
+"""
+ASGI (Quart + Motor) variant of the public /api/hotels routes.
+
+Same parameters, validation and response bodies as routes/hotels.py; the
+admin routes and conditional GET stay on the Flask app.
+"""
+from bson import ObjectId
+from quart import Blueprint, request, jsonify
+
+import async_support
+import occupancy
+import pagination
+import validation
+from routes.hotels import (
+    HOTEL_LIST_FIELDS, HOTEL_SEARCH_FIELDS, MAX_BULK_AVAILABILITY_HOTELS, SEARCH_RESULT_LIMIT,
+    _hotel_list_item, _hotel_search_item, _hotel_detail_item
+)
+
+async_hotels_bp = Blueprint('async_hotels', __name__)
+
+
+def _hotels():
+    from models import Hotel
+    return async_support.collection(Hotel)
+
+
+def _nights():
+    from models import HotelNight
+    return async_support.collection(HotelNight)
+
+
+@async_hotels_bp.route('/', methods=['GET'])
+@async_hotels_bp.route('', methods=['GET'])
+async def get_hotels():
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 10, type=int)
+        guests = request.args.get('guests', 1, type=int)
+
+        try:
+            check_in_date, check_out_date = validation.parse_listing_stay(
+                request.args.get('check_in'), request.args.get('check_out'), guests)
+            filters = validation.hotel_filter(
+                request.args.get('city'),
+                request.args.get('city_match', 'prefix'),
+                request.args.get('min_price', type=float),
+                request.args.get('max_price', type=float),
+                request.args.get('rating', type=float)
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        use_cursor = 'cursor' in request.args
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        query = dict(filters)
+
+        if use_cursor:
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    last_id, = pagination.decode_cursor(cursor, (ObjectId,))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                query = {'$and': [filters, pagination.seek_after([('_id', 1)], [last_id])]}
+            skip = 0
+            limit = per_page + 1
+        else:
+            skip = (page - 1) * per_page
+            limit = per_page
+
+        hotels = _hotels()
+        total = None
+
+        if check_in_date:
+            stages = occupancy.availability_stages(check_in_date, check_out_date)
+            projection = {'$project': dict.fromkeys(HOTEL_LIST_FIELDS + ('free_rooms',), 1)}
+            if use_cursor:
+                pipeline = [{'$match': query}, {'$sort': {'_id': 1}}] + stages + [{'$limit': limit}, projection]
+                docs = await hotels.aggregate(pipeline).to_list(None)
+                if include_total:
+                    counted = await hotels.aggregate([{'$match': filters}] + stages + [{'$count': 'count'}]).to_list(None)
+                    total = counted[0]['count'] if counted else 0
+            else:
+                result = (await hotels.aggregate([{'$match': query}] + stages + [
+                    {'$facet': {
+                        'total': [{'$count': 'count'}],
+                        'hotels': [{'$skip': skip}, {'$limit': limit}, projection]
+                    }}
+                ]).to_list(None))[0]
+                total = result['total'][0]['count'] if result['total'] else 0
+                docs = result['hotels']
+        else:
+            if not use_cursor or include_total:
+                total = await hotels.count_documents(filters)
+            find = hotels.find(query, dict.fromkeys(HOTEL_LIST_FIELDS, 1))
+            if use_cursor:
+                find = find.sort('_id', 1)
+            docs = await find.skip(skip).limit(limit).to_list(None)
+
+        has_next = use_cursor and len(docs) > per_page
+        docs = docs[:per_page]
+
+        hotel_list = []
+        for doc in docs:
+            hotel_data = _hotel_list_item(doc)
+            if 'free_rooms' in doc:
+                hotel_data['free_rooms'] = doc['free_rooms']
+            hotel_list.append(hotel_data)
+
+        if use_cursor:
+            pagination_data = {
+                'per_page': per_page,
+                'next_cursor': pagination.encode_cursor(docs[-1]['_id']) if has_next else None,
+                'has_next': has_next
+            }
+            if total is not None:
+                pagination_data['total'] = total
+            return jsonify({'hotels': hotel_list, 'pagination': pagination_data}), 200
+
+        total_pages = (total + per_page - 1) // per_page
+
+        return jsonify({
+            'hotels': hotel_list,
+            'pagination': {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': total_pages,
+                'has_next': page < total_pages,
+                'has_prev': page > 1
+            }
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_hotels_bp.route('/<hotel_id>', methods=['GET'])
+async def get_hotel_detail(hotel_id):
+    try:
+        hotel = await async_support.load_hotel(hotel_id)
+        if not hotel:
+            return jsonify({'error': 'Hotel not found'}), 404
+        return jsonify(_hotel_detail_item(hotel)), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_hotels_bp.route('/search', methods=['GET'])
+async def search_hotels():
+    try:
+        query = request.args.get('q', '')
+        if not query:
+            return jsonify({'error': 'Search query is required'}), 400
+
+        projection = dict.fromkeys(HOTEL_SEARCH_FIELDS, 1)
+        projection['_text_score'] = {'$meta': 'textScore'}
+        docs = await _hotels().find({'$text': {'$search': query}}, projection) \
+            .sort([('_text_score', {'$meta': 'textScore'})]) \
+            .limit(SEARCH_RESULT_LIMIT) \
+            .to_list(None)
+        hotel_list = [_hotel_search_item(doc) for doc in docs]
+
+        return jsonify({
+            'query': query,
+            'results': hotel_list,
+            'total': len(hotel_list)
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_hotels_bp.route('/<hotel_id>/availability', methods=['GET'])
+async def check_availability(hotel_id):
+    try:
+        hotel = await async_support.load_hotel(hotel_id)
+        if not hotel:
+            return jsonify({'error': 'Hotel not found'}), 404
+
+        check_in = request.args.get('check_in')
+        check_out = request.args.get('check_out')
+        try:
+            check_in_date, check_out_date = validation.parse_stay(check_in, check_out)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        available_rooms = await occupancy.free_rooms_async(_nights(), hotel, check_in_date, check_out_date)
+
+        return jsonify({
+            'hotel_id': str(hotel['_id']),
+            'check_in': check_in,
+            'check_out': check_out,
+            'available_rooms': available_rooms,
+            'total_rooms': hotel.get('total_rooms'),
+            'price_per_night': hotel.get('price_per_night'),
+            'is_available': available_rooms > 0
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@async_hotels_bp.route('/availability', methods=['POST'])
+async def check_availability_bulk():
+    try:
+        data = await request.get_json() or {}
+        hotel_ids = data.get('hotel_ids')
+        check_in = data.get('check_in')
+        check_out = data.get('check_out')
+
+        if not isinstance(hotel_ids, list) or not hotel_ids:
+            return jsonify({'error': 'hotel_ids must be a non-empty list'}), 400
+
+        if len(hotel_ids) > MAX_BULK_AVAILABILITY_HOTELS:
+            return jsonify({'error': f'At most {MAX_BULK_AVAILABILITY_HOTELS} hotels can be checked at once'}), 400
+
+        try:
+            check_in_date, check_out_date = validation.parse_stay(check_in, check_out)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        valid_ids = [async_support.object_id(h) for h in hotel_ids if async_support.object_id(h)]
+        hotels = await _hotels().find(
+            {'_id': {'$in': valid_ids}},
+            {'total_rooms': 1, 'available_rooms': 1, 'price_per_night': 1}
+        ).to_list(None)
+        free = await occupancy.free_rooms_by_hotel_async(_nights(), hotels, check_in_date, check_out_date)
+
+        found = {str(hotel['_id']): hotel for hotel in hotels}
+        results = []
+        not_found = []
+        for hotel_id in hotel_ids:
+            hotel = found.get(hotel_id)
+            if not hotel:
+                not_found.append(hotel_id)
+                continue
+            results.append({
+                'hotel_id': hotel_id,
+                'available_rooms': free[hotel['_id']],
+                'total_rooms': hotel.get('total_rooms'),
+                'price_per_night': hotel.get('price_per_night'),
+                'is_available': free[hotel['_id']] > 0
+            })
+
+        return jsonify({
+            'check_in': check_in,
+            'check_out': check_out,
+            'results': results,
+            'not_found': not_found
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
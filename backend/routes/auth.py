@@ -1,19 +1,22 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_current_user
 from flask_bcrypt import Bcrypt
 from datetime import datetime
 
 auth_bp = Blueprint('auth', __name__)
 
-# Import these after the blueprint is created to avoid circular imports
-def get_bcrypt():
-    from app import bcrypt
-    return bcrypt
+def _busy():
+    response = jsonify({'error': 'Server is busy, please try again shortly'})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def create_user_token(user):
+    # Role claims travel in the token so authorization needs no user lookup
+    return create_access_token(identity=str(user.id), additional_claims={'is_admin': user.is_admin})
 
 @auth_bp.route('/register', methods=['POST'])
 def register():
     try:
-        bcrypt = get_bcrypt()
         data = request.get_json()
         
         # Validate required fields
@@ -30,8 +33,12 @@ def register():
         if User.objects(email=data['email']).first():
             return jsonify({'error': 'Email already exists'}), 400
         
-        # Hash password
-        password_hash = bcrypt.generate_password_hash(data['password']).decode('utf-8')
+        # Hash password on the bounded hashing pool
+        import passwords
+        try:
+            password_hash = passwords.hash_password(data['password'])
+        except passwords.HashingBusy:
+            return _busy()
         
         # Create new user
         new_user = User(
@@ -46,7 +53,7 @@ def register():
         new_user.save()
         
         # Create access token
-        access_token = create_access_token(identity=str(new_user.id))
+        access_token = create_user_token(new_user)
         
         return jsonify({
             'message': 'User registered successfully',
@@ -67,7 +74,6 @@ def register():
 @auth_bp.route('/login', methods=['POST'])
 def login():
     try:
-        bcrypt = get_bcrypt()
         data = request.get_json()
         
         if not data.get('username') or not data.get('password'):
@@ -77,11 +83,27 @@ def login():
         from models import User
         user = User.objects(username=data['username']).first()
         
-        if not user or not bcrypt.check_password_hash(user.password_hash, data['password']):
+        import passwords
+        try:
+            valid = bool(user) and passwords.check_password(user.password_hash, data['password'])
+        except passwords.HashingBusy:
+            return _busy()
+        
+        if not valid:
             return jsonify({'error': 'Invalid username or password'}), 401
         
+        # Upgrade the stored hash when BCRYPT_LOG_ROUNDS changed; this is
+        # best effort and never fails the login
+        if passwords.needs_rehash(user.password_hash):
+            try:
+                User.objects(id=user.id).update_one(
+                    set__password_hash=passwords.hash_password(data['password'])
+                )
+            except passwords.HashingBusy:
+                pass
+        
         # Create access token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_user_token(user)
         
         return jsonify({
             'message': 'Login successful',
@@ -103,12 +125,7 @@ def login():
 @jwt_required()
 def get_profile():
     try:
-        current_user_id = get_jwt_identity()
-        from models import User
-        user = User.objects(id=current_user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = get_current_user()
         
         return jsonify({
             'id': str(user.id),
@@ -130,6 +147,7 @@ def update_profile():
     try:
         current_user_id = get_jwt_identity()
         from models import User
+        # Profile writes start from the stored document, not the cached user
         user = User.objects(id=current_user_id).first()
         
         if not user:
@@ -152,6 +170,8 @@ def update_profile():
             user.email = data['email']
         
         user.save()
+        import cache
+        cache.users.delete(current_user_id)
         
         return jsonify({
             'message': 'Profile updated successfully',
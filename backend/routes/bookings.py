@@ -1,74 +1,92 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, Response, request, jsonify, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_current_user
 from datetime import datetime, date
 import json
+import validation
+from routes.hotels import _require_admin
 
 bookings_bp = Blueprint('bookings', __name__)
 
+# Largest number of bookings accepted by POST /api/bookings/batch
+MAX_BATCH_BOOKINGS = 50
+
+# all_or_nothing: every item is booked or none is; best_effort: each item on its own
+BATCH_MODES = ('all_or_nothing', 'best_effort')
+
+# The booking listing loads only the fields it returns, as raw pymongo dicts
+BOOKING_LIST_FIELDS = ('hotel', 'hotel_summary', 'check_in_date', 'check_out_date', 'num_guests', 'room_type',
+                       'total_price', 'status', 'special_requests', 'created_at')
+
+def _hotel_summaries(hotel_ids):
+    """Fetch id/name/city/country for many hotels with a single $in query"""
+    from models import Hotel
+    hotels = Hotel.objects(id__in=list(set(hotel_ids))).only('name', 'city', 'country').as_pymongo()
+    return {
+        hotel['_id']: {
+            'id': str(hotel['_id']),
+            'name': hotel.get('name'),
+            'city': hotel.get('city'),
+            'country': hotel.get('country')
+        }
+        for hotel in hotels
+    }
+
+def _booking_list_item(doc, hotel_info):
+    return {
+        'id': str(doc['_id']),
+        'hotel': hotel_info,
+        'check_in_date': doc['check_in_date'].date().isoformat(),
+        'check_out_date': doc['check_out_date'].date().isoformat(),
+        'num_guests': doc.get('num_guests'),
+        'room_type': doc.get('room_type'),
+        'total_price': doc.get('total_price'),
+        'status': doc.get('status', 'confirmed'),
+        'special_requests': doc.get('special_requests'),
+        'created_at': doc['created_at'].isoformat()
+    }
+
+def _created_booking_item(booking, hotel):
+    return {
+        'id': str(booking.id),
+        'hotel_id': str(hotel.id),
+        'check_in_date': booking.check_in_date.isoformat(),
+        'check_out_date': booking.check_out_date.isoformat(),
+        'num_guests': booking.num_guests,
+        'room_type': booking.room_type,
+        'total_price': booking.total_price,
+        'status': booking.status,
+        'created_at': booking.created_at.isoformat()
+    }
+
 @bookings_bp.route('/', methods=['POST'])
 @jwt_required()
 def create_booking():
     try:
-        current_user_id = get_jwt_identity()
-        data = request.get_json()
-        
-        # Validate required fields
-        required_fields = ['hotel_id', 'check_in_date', 'check_out_date', 'num_guests', 'room_type']
-        for field in required_fields:
-            if not data.get(field):
-                return jsonify({'error': f'{field} is required'}), 400
-        
-        # Parse dates
+        # Validate required fields and dates
         try:
-            check_in_date = datetime.strptime(data['check_in_date'], '%Y-%m-%d').date()
-            check_out_date = datetime.strptime(data['check_out_date'], '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-        
-        # Validate dates
-        if check_in_date < date.today():
-            return jsonify({'error': 'Check-in date cannot be in the past'}), 400
-        
-        if check_in_date >= check_out_date:
-            return jsonify({'error': 'Check-out date must be after check-in date'}), 400
+            data = validation.parse_new_booking(request.get_json())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        check_in_date = data['check_in_date']
+        check_out_date = data['check_out_date']
         
         # Check hotel availability
-        from models import Hotel, Booking, User
-        hotel = Hotel.objects(id=data['hotel_id']).first()
+        from models import Booking
+        import cache
+        hotel = cache.hotels.get(data['hotel_id'])
         if not hotel:
             return jsonify({'error': 'Hotel not found'}), 404
         
-        user = User.objects(id=current_user_id).first()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = get_current_user()
         
         # Calculate number of nights
         nights = (check_out_date - check_in_date).days
         
-        # Check for conflicting bookings
-        conflicting_bookings = Booking.objects.filter(
-            hotel=hotel,
-            status='confirmed',
-            __raw__={
-                '$or': [
-                    {
-                        'check_in_date': {'$lte': check_in_date},
-                        'check_out_date': {'$gt': check_in_date}
-                    },
-                    {
-                        'check_in_date': {'$lt': check_out_date},
-                        'check_out_date': {'$gte': check_out_date}
-                    },
-                    {
-                        'check_in_date': {'$gte': check_in_date},
-                        'check_out_date': {'$lte': check_out_date}
-                    }
-                ]
-            }
-        ).count()
-        
-        available_rooms = max(0, hotel.available_rooms - conflicting_bookings)
-        if available_rooms <= 0:
+        # Reserve a room on every night of the stay; each night is a single
+        # conditional increment on the occupancy ledger, so concurrent
+        # requests cannot overbook
+        import occupancy
+        if not occupancy.reserve_stay(hotel, check_in_date, check_out_date):
             return jsonify({'error': 'No rooms available for the selected dates'}), 400
         
         # Calculate total price
@@ -86,80 +104,240 @@ def create_booking():
             special_requests=data.get('special_requests', '')
         )
         
-        new_booking.save()
+        try:
+            new_booking.save()
+        except Exception:
+            occupancy.release_stay(hotel, check_in_date, check_out_date)
+            raise
         
         return jsonify({
             'message': 'Booking created successfully',
-            'booking': {
-                'id': str(new_booking.id),
-                'hotel_id': str(hotel.id),
-                'check_in_date': new_booking.check_in_date.isoformat(),
-                'check_out_date': new_booking.check_out_date.isoformat(),
-                'num_guests': new_booking.num_guests,
-                'room_type': new_booking.room_type,
-                'total_price': new_booking.total_price,
-                'status': new_booking.status,
-                'created_at': new_booking.created_at.isoformat()
-            }
+            'booking': _created_booking_item(new_booking, hotel)
         }), 201
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@bookings_bp.route('/batch', methods=['POST'])
+@jwt_required()
+def create_bookings_batch():
+    try:
+        body = request.get_json() or {}
+        items = body.get('bookings')
+        mode = body.get('mode', 'all_or_nothing')
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'bookings must be a non-empty list'}), 400
+        
+        if len(items) > MAX_BATCH_BOOKINGS:
+            return jsonify({'error': f'At most {MAX_BATCH_BOOKINGS} bookings can be made at once'}), 400
+        
+        if mode not in BATCH_MODES:
+            return jsonify({'error': f"mode must be one of: {', '.join(BATCH_MODES)}"}), 400
+        
+        results = [{'index': i} for i in range(len(items))]
+        
+        def fail(i, error):
+            results[i].update(status='failed', error=error)
+        
+        def respond(status_code):
+            created = sum(1 for r in results if r.get('status') == 'created')
+            return jsonify({
+                'mode': mode,
+                'created': created,
+                'failed': len(results) - created,
+                'results': results
+            }), status_code
+        
+        # Validate every item before touching the ledger
+        parsed = {}
+        for i, item in enumerate(items):
+            try:
+                parsed[i] = validation.parse_new_booking(item)
+            except ValueError as e:
+                fail(i, str(e))
+        
+        # The hotels of all items with one $in query, the user once
+        from bson import ObjectId
+        from mongoengine.errors import ValidationError
+        from models import Booking, Hotel, HotelSummary
+        hotel_ids = {data['hotel_id'] for data in parsed.values() if ObjectId.is_valid(data['hotel_id'])}
+        hotels = {str(hotel.id): hotel for hotel in Hotel.objects(id__in=list(hotel_ids))}
+        user = get_current_user()
+        now = datetime.utcnow()
+        
+        bookings = {}
+        for i, data in parsed.items():
+            hotel = hotels.get(data['hotel_id'])
+            if not hotel:
+                fail(i, 'Hotel not found')
+                continue
+            nights = (data['check_out_date'] - data['check_in_date']).days
+            # insert_many bypasses Booking.save(), so set what it would
+            booking = Booking(
+                user=user,
+                hotel=hotel,
+                hotel_summary=HotelSummary.from_hotel(hotel),
+                check_in_date=data['check_in_date'],
+                check_out_date=data['check_out_date'],
+                num_guests=data['num_guests'],
+                room_type=data['room_type'],
+                total_price=hotel.price_per_night * nights,
+                special_requests=data['special_requests'],
+                created_at=now,
+                updated_at=now
+            )
+            try:
+                booking.validate()
+            except ValidationError as e:
+                fail(i, str(e))
+                continue
+            bookings[i] = booking
+        
+        if mode == 'all_or_nothing' and len(bookings) < len(items):
+            for i in bookings:
+                results[i]['status'] = 'not_attempted'
+            return respond(400)
+        
+        # One grouped read of the ledger for every hotel and night in the batch
+        import occupancy
+        stays = {i: (booking.hotel, booking.check_in_date, booking.check_out_date) for i, booking in bookings.items()}
+        for i, fit in zip(list(stays), occupancy.check_block(list(stays.values()))):
+            if not fit:
+                fail(i, 'No rooms available for the selected dates')
+                del bookings[i]
+        
+        if mode == 'all_or_nothing':
+            if len(bookings) < len(items):
+                for i in bookings:
+                    fail(i, 'Not booked: other bookings in the batch are unavailable')
+                return respond(409)
+            # The pre-check can race with other bookings; the conditional
+            # ledger increments decide
+            if not occupancy.reserve_block(list(stays.values())):
+                for i in bookings:
+                    fail(i, 'No rooms available for the selected dates')
+                return respond(409)
+        else:
+            # Each item takes its rooms on its own
+            for i in list(bookings):
+                if not occupancy.reserve_stay(*stays[i]):
+                    fail(i, 'No rooms available for the selected dates')
+                    del bookings[i]
+        
+        # pymongo assigns every document its _id before sending the batch
+        docs = [booking.to_mongo() for booking in bookings.values()]
+        failed_writes = {}
+        if docs:
+            from pymongo.errors import BulkWriteError
+            try:
+                Booking._get_collection().insert_many(docs, ordered=(mode == 'all_or_nothing'))
+            except Exception as e:
+                if mode == 'all_or_nothing':
+                    # Undo the whole batch: bookings already written and all rooms
+                    Booking.objects(id__in=[doc['_id'] for doc in docs]).delete()
+                    occupancy.release_block(list(stays.values()))
+                    raise
+                if not isinstance(e, BulkWriteError):
+                    for i in bookings:
+                        occupancy.release_stay(*stays[i])
+                    raise
+                # Best effort: the other documents were written
+                failed_writes = {error['index']: error.get('errmsg', 'Write failed') for error in e.details['writeErrors']}
+        
+        for position, (i, booking) in enumerate(bookings.items()):
+            if position in failed_writes:
+                occupancy.release_stay(*stays[i])
+                fail(i, failed_writes[position])
+                continue
+            booking.id = docs[position]['_id']
+            results[i].update(status='created', booking=_created_booking_item(booking, booking.hotel))
+        
+        if all(r['status'] == 'created' for r in results):
+            return respond(201)
+        return respond(207)
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bookings_bp.route('/', methods=['GET'])
 @jwt_required()
 def get_user_bookings():
     try:
-        current_user_id = get_jwt_identity()
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
         
         # Build query
-        from models import Booking, Hotel, User
-        user = User.objects(id=current_user_id).first()
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        from models import Booking
+        user = get_current_user()
         
         query = Booking.objects.filter(user=user)
         
         if status:
             query = query.filter(status=status)
         
-        # Order by creation date (newest first)
-        query = query.order_by('-created_at')
-        
-        # Get total count for pagination
-        total = query.count()
-        
-        # Apply pagination
-        skip = (page - 1) * per_page
-        bookings = query.skip(skip).limit(per_page)
-        
+        # Order by creation date (newest first), _id breaks ties
+        query = query.order_by('-created_at', '-id')
+        
+        # Keyset pagination is opt-in: pass cursor (empty for the first page)
+        # and follow next_cursor. The exact total is only counted on request.
+        use_cursor = 'cursor' in request.args
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        
+        if use_cursor:
+            import pagination
+            from bson import ObjectId
+            total = query.count() if include_total else None
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    last_created_at, last_id = pagination.decode_cursor(cursor, (datetime, ObjectId))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                query = query.filter(__raw__=pagination.seek_after(
+                    [('created_at', -1), ('_id', -1)],
+                    [last_created_at, last_id]
+                ))
+            # One extra row tells us whether there is a next page
+            bookings = list(query.limit(per_page + 1).only(*BOOKING_LIST_FIELDS).as_pymongo())
+            has_next = len(bookings) > per_page
+            bookings = bookings[:per_page]
+        else:
+            # Get total count for pagination
+            total = query.count()
+            
+            # Apply pagination
+            skip = (page - 1) * per_page
+            bookings = list(query.skip(skip).limit(per_page).only(*BOOKING_LIST_FIELDS).as_pymongo())
+        
+        # Hotel information comes from the summary stored on each booking;
+        # bookings written before it existed are resolved in one $in query
+        missing = [booking['hotel'] for booking in bookings if not booking.get('hotel_summary')]
+        hotels = _hotel_summaries(missing) if missing else {}
         booking_list = []
         for booking in bookings:
-            # Get hotel information
-            hotel = booking.hotel
-            hotel_info = {
-                'id': str(hotel.id),
-                'name': hotel.name,
-                'city': hotel.city,
-                'country': hotel.country
-            } if hotel else None
-            
-            booking_data = {
-                'id': str(booking.id),
-                'hotel': hotel_info,
-                'check_in_date': booking.check_in_date.isoformat(),
-                'check_out_date': booking.check_out_date.isoformat(),
-                'num_guests': booking.num_guests,
-                'room_type': booking.room_type,
-                'total_price': booking.total_price,
-                'status': booking.status,
-                'special_requests': booking.special_requests,
-                'created_at': booking.created_at.isoformat()
+            summary = booking.get('hotel_summary')
+            if summary:
+                hotel_info = {
+                    'id': str(booking['hotel']),
+                    'name': summary.get('name'),
+                    'city': summary.get('city'),
+                    'country': summary.get('country')
+                }
+            else:
+                hotel_info = hotels.get(booking['hotel'])
+            booking_list.append(_booking_list_item(booking, hotel_info))
+        
+        if use_cursor:
+            pagination_data = {
+                'per_page': per_page,
+                'next_cursor': pagination.encode_cursor(bookings[-1]['created_at'], bookings[-1]['_id']) if has_next else None,
+                'has_next': has_next
             }
-            booking_list.append(booking_data)
+            if total is not None:
+                pagination_data['total'] = total
+            return jsonify({'bookings': booking_list, 'pagination': pagination_data}), 200
         
         total_pages = (total + per_page - 1) // per_page
         
@@ -178,13 +356,49 @@ def get_user_bookings():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Admin export of all bookings, streamed as a chunked response
+EXPORT_MIMETYPES = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+@bookings_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_bookings():
+    try:
+        if not _require_admin():
+            return jsonify({'error': 'Admin privileges required'}), 403
+        import booking_export
+        fmt = request.args.get('format', 'ndjson')
+        if fmt not in booking_export.FORMATS:
+            return jsonify({'error': f"format must be one of: {', '.join(booking_export.FORMATS)}"}), 400
+        batch_size = request.args.get('batch_size', booking_export.DEFAULT_BATCH_SIZE, type=int)
+        if batch_size < 1:
+            return jsonify({'error': 'batch_size must be at least 1'}), 400
+        try:
+            query = booking_export.export_filter(
+                hotel_id=request.args.get('hotel_id'),
+                status=request.args.get('status'),
+                check_in_from=request.args.get('from'),
+                check_in_to=request.args.get('to')
+            )
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # No Content-Length: the server sends each batch as a chunk as soon
+        # as it is read, and memory stays at one batch
+        chunks = booking_export.encode(booking_export.iter_batches(query, batch_size), fmt)
+        response = Response(stream_with_context(chunks), mimetype=EXPORT_MIMETYPES[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename=bookings.{fmt}'
+        return response
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @bookings_bp.route('/<booking_id>', methods=['GET'])
 @jwt_required()
 def get_booking_detail(booking_id):
     try:
         current_user_id = get_jwt_identity()
         from models import Booking, Hotel, User
-        booking = Booking.objects(id=booking_id).first()
+        # References stay as ids; the owner check only needs the user id
+        booking = Booking.objects(id=booking_id).no_dereference().first()
         
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
@@ -194,7 +408,8 @@ def get_booking_detail(booking_id):
             return jsonify({'error': 'Unauthorized access'}), 403
         
         # Get hotel information
-        hotel = booking.hotel
+        import cache
+        hotel = cache.hotels.get(booking.hotel.id)
         hotel_info = {
             'id': str(hotel.id),
             'name': hotel.name,
@@ -231,7 +446,8 @@ def update_booking(booking_id):
     try:
         current_user_id = get_jwt_identity()
         from models import Booking, Hotel, User
-        booking = Booking.objects(id=booking_id).first()
+        # References stay as ids; the owner check only needs the user id
+        booking = Booking.objects(id=booking_id).no_dereference().first()
         
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
@@ -256,55 +472,68 @@ def update_booking(booking_id):
         if 'num_guests' in data:
             booking.num_guests = data['num_guests']
         
-        # Update dates if provided
+        import occupancy
+        old_dates = (booking.check_in_date, booking.check_out_date)
+        hotel = None
+        
+        # Update dates and recalculate price if provided
         if 'check_in_date' in data or 'check_out_date' in data:
             new_check_in = data.get('check_in_date', booking.check_in_date.isoformat())
             new_check_out = data.get('check_out_date', booking.check_out_date.isoformat())
             
             try:
-                check_in_date = datetime.strptime(new_check_in, '%Y-%m-%d').date()
-                check_out_date = datetime.strptime(new_check_out, '%Y-%m-%d').date()
-            except ValueError:
-                return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-            
-            if check_in_date >= check_out_date:
-                return jsonify({'error': 'Check-out date must be after check-in date'}), 400
-            
-            # Check availability for new dates
-            hotel = booking.hotel
-            conflicting_bookings = Booking.objects.filter(
-                hotel=hotel,
-                status='confirmed',
-                id__ne=booking_id,
-                __raw__={
-                    '$or': [
-                        {
-                            'check_in_date': {'$lte': check_in_date},
-                            'check_out_date': {'$gt': check_in_date}
-                        },
-                        {
-                            'check_in_date': {'$lt': check_out_date},
-                            'check_out_date': {'$gte': check_out_date}
-                        },
-                        {
-                            'check_in_date': {'$gte': check_in_date},
-                            'check_out_date': {'$lte': check_out_date}
-                        }
-                    ]
-                }
-            ).count()
+                check_in_date, check_out_date = validation.parse_stay(new_check_in, new_check_out)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
             
-            available_rooms = max(0, hotel.available_rooms - conflicting_bookings)
-            if available_rooms <= 0:
-                return jsonify({'error': 'No rooms available for the new dates'}), 400
-            
-            # Update dates and recalculate price
+            import cache
+            hotel = cache.hotels.get(booking.hotel.id)
+            if not hotel:
+                return jsonify({'error': 'Hotel not found'}), 404
             booking.check_in_date = check_in_date
             booking.check_out_date = check_out_date
             nights = (check_out_date - check_in_date).days
             booking.total_price = hotel.price_per_night * nights
         
-        booking.save()
+        # Validate before the ledger is touched
+        from mongoengine.errors import ValidationError
+        try:
+            booking.validate()
+        except ValidationError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Reserve the new nights on the ledger; the booking keeps holding its
+        # old nights until it is written
+        new_dates = (booking.check_in_date, booking.check_out_date)
+        if hotel is not None and not occupancy.move_stay(hotel, old_dates, new_dates):
+            return jsonify({'error': 'No rooms available for the new dates'}), 400
+        
+        # Only written if the booking is still confirmed for the nights it
+        # holds. A concurrent update or cancel makes this match nothing, and
+        # the new nights are given back; otherwise the old ones are.
+        try:
+            updated = Booking.objects(
+                id=booking.id, status='confirmed',
+                check_in_date=old_dates[0], check_out_date=old_dates[1]
+            ).update_one(
+                set__special_requests=booking.special_requests,
+                set__room_type=booking.room_type,
+                set__num_guests=booking.num_guests,
+                set__check_in_date=booking.check_in_date,
+                set__check_out_date=booking.check_out_date,
+                set__total_price=booking.total_price,
+                set__updated_at=datetime.utcnow()
+            )
+        except Exception:
+            if hotel is not None:
+                occupancy.undo_move(hotel, old_dates, new_dates)
+            raise
+        if not updated:
+            if hotel is not None:
+                occupancy.undo_move(hotel, old_dates, new_dates)
+            return jsonify({'error': 'Booking was changed by another request, please retry'}), 409
+        if hotel is not None:
+            occupancy.finish_move(hotel, old_dates, new_dates)
         
         return jsonify({
             'message': 'Booking updated successfully',
@@ -329,7 +558,8 @@ def cancel_booking(booking_id):
     try:
         current_user_id = get_jwt_identity()
         from models import Booking
-        booking = Booking.objects(id=booking_id).first()
+        # References stay as ids; the owner check only needs the user id
+        booking = Booking.objects(id=booking_id).no_dereference().first()
         
         if not booking:
             return jsonify({'error': 'Booking not found'}), 404
@@ -346,9 +576,22 @@ def cancel_booking(booking_id):
         if booking.check_in_date <= date.today():
             return jsonify({'error': 'Cannot cancel booking on or after check-in date'}), 400
         
-        # Cancel booking
-        booking.status = 'cancelled'
-        booking.save()
+        # Cancel booking and free its nights in the occupancy ledger. The
+        # status check is part of the update so a repeated cancel request
+        # cannot release the nights twice.
+        import occupancy
+        # The dates are checked too: a concurrent update that moved the stay
+        # makes this match nothing instead of releasing the old nights.
+        cancelled = Booking.objects(
+            id=booking.id, status='confirmed',
+            check_in_date=booking.check_in_date, check_out_date=booking.check_out_date
+        ).update_one(
+            set__status='cancelled',
+            set__updated_at=datetime.utcnow()
+        )
+        if not cancelled:
+            return jsonify({'error': 'Booking was changed by another request, please retry'}), 409
+        occupancy.release_stay(booking.hotel, booking.check_in_date, booking.check_out_date)
         
         return jsonify({
             'message': 'Booking cancelled successfully',
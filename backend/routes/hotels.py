@@ -1,69 +1,190 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
+from flask import Blueprint, request, jsonify, g
+from flask_jwt_extended import jwt_required, get_jwt, get_current_user
 import json
+import catalog
+import validation
 
 hotels_bp = Blueprint('hotels', __name__)
 
+# Upper bound on hotel ids accepted by the bulk availability endpoint
+MAX_BULK_AVAILABILITY_HOTELS = 100
+
+# Number of ranked results returned by /search
+SEARCH_RESULT_LIMIT = 20
+
+# Default and maximum number of results returned by /suggest
+SUGGEST_DEFAULT_LIMIT = 10
+SUGGEST_MAX_LIMIT = 20
+
 def _require_admin():
-    from models import User
-    user_id = get_jwt_identity()
-    user = User.objects(id=user_id).first()
+    claims = get_jwt()
+    if 'is_admin' in claims:
+        return bool(claims['is_admin'])
+    # Tokens issued before role claims existed: fall back to the loaded user
+    user = get_current_user()
     return bool(user and user.is_admin)
 
+# Read endpoints load only the fields they return, as raw pymongo dicts, and
+# map them straight to response dicts without building Hotel documents
+HOTEL_LIST_FIELDS = ('name', 'description', 'address', 'city', 'state', 'country',
+                     'rating', 'price_per_night', 'available_rooms', 'amenities', 'images')
+HOTEL_SEARCH_FIELDS = ('name', 'description', 'city', 'rating', 'price_per_night', 'available_rooms')
+
+def _hotel_list_item(doc):
+    return {
+        'id': str(doc['_id']),
+        'name': doc.get('name'),
+        'description': doc.get('description'),
+        'address': doc.get('address'),
+        'city': doc.get('city'),
+        'state': doc.get('state'),
+        'country': doc.get('country'),
+        'rating': doc.get('rating', 0.0),
+        'price_per_night': doc.get('price_per_night'),
+        'available_rooms': doc.get('available_rooms'),
+        'amenities': doc.get('amenities', []),
+        'images': doc.get('images', [])
+    }
+
+def _hotel_detail_item(doc):
+    return {
+        'id': str(doc['_id']),
+        'name': doc.get('name'),
+        'description': doc.get('description'),
+        'address': doc.get('address'),
+        'city': doc.get('city'),
+        'state': doc.get('state'),
+        'country': doc.get('country'),
+        'zip_code': doc.get('zip_code'),
+        'phone': doc.get('phone'),
+        'email': doc.get('email'),
+        'website': doc.get('website'),
+        'rating': doc.get('rating', 0.0),
+        'price_per_night': doc.get('price_per_night'),
+        'total_rooms': doc.get('total_rooms'),
+        'available_rooms': doc.get('available_rooms'),
+        'amenities': doc.get('amenities', []),
+        'images': doc.get('images', []),
+        'created_at': doc['created_at'].isoformat()
+    }
+
+def _hotel_search_item(doc):
+    return {
+        'id': str(doc['_id']),
+        'name': doc.get('name'),
+        'description': doc.get('description'),
+        'city': doc.get('city'),
+        'rating': doc.get('rating', 0.0),
+        'price_per_night': doc.get('price_per_night'),
+        'available_rooms': doc.get('available_rooms'),
+        'score': doc.get('_text_score')
+    }
+
 @hotels_bp.route('/', methods=['GET'])
 @hotels_bp.route('', methods=['GET'])
+@catalog.conditional_get
 def get_hotels():
     try:
         # Get query parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         city = request.args.get('city')
+        city_match = request.args.get('city_match', 'prefix')
         min_price = request.args.get('min_price', type=float)
         max_price = request.args.get('max_price', type=float)
         rating = request.args.get('rating', type=float)
+        check_in = request.args.get('check_in')
+        check_out = request.args.get('check_out')
+        guests = request.args.get('guests', 1, type=int)
         
-        # Build query
-        from models import Hotel
-        query = Hotel.objects
+        # Optional stay dates: only list hotels with a free room on every night
+        try:
+            check_in_date, check_out_date = validation.parse_listing_stay(check_in, check_out, guests)
+            filters = validation.hotel_filter(city, city_match, min_price, max_price, rating)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        if city:
-            query = query.filter(city__icontains=city)
+        # Build query; city matching uses the city_key index unless the
+        # client opts in to substring matching
+        from models import Hotel
+        query = Hotel.objects(__raw__=filters)
         
-        if min_price is not None:
-            query = query.filter(price_per_night__gte=min_price)
+        # Keyset pagination is opt-in: pass cursor (empty for the first page)
+        # and follow next_cursor. The exact total is only counted on request.
+        use_cursor = 'cursor' in request.args
+        include_total = request.args.get('include_total', 'false').lower() == 'true'
+        count_query = query
         
-        if max_price is not None:
-            query = query.filter(price_per_night__lte=max_price)
+        if use_cursor:
+            import pagination
+            from bson import ObjectId
+            query = query.order_by('id')
+            cursor = request.args.get('cursor')
+            if cursor:
+                try:
+                    last_id, = pagination.decode_cursor(cursor, (ObjectId,))
+                except ValueError as e:
+                    return jsonify({'error': str(e)}), 400
+                query = query.filter(__raw__=pagination.seek_after([('_id', 1)], [last_id]))
+            # One extra row tells us whether there is a next page
+            skip = 0
+            limit = per_page + 1
+        else:
+            skip = (page - 1) * per_page
+            limit = per_page
         
-        if rating is not None:
-            query = query.filter(rating__gte=rating)
+        total = None
         
-        # Get total count for pagination
-        total = query.count()
+        if check_in_date:
+            # Availability is evaluated in the database: each hotel is joined
+            # with its occupancy ledger for the stay, so the total and the page
+            # only contain bookable hotels. A booking holds one room whatever
+            # the party size, so any hotel with a free room fits the guests.
+            import occupancy
+            stages = occupancy.availability_stages(check_in_date, check_out_date)
+            projection = {'$project': dict.fromkeys(HOTEL_LIST_FIELDS + ('free_rooms',), 1)}
+            if use_cursor:
+                docs = list(query.aggregate(stages + [{'$limit': limit}, projection]))
+                if include_total:
+                    counted = list(count_query.aggregate(stages + [{'$count': 'count'}]))
+                    total = counted[0]['count'] if counted else 0
+            else:
+                result = next(query.aggregate(stages + [
+                    {'$facet': {
+                        'total': [{'$count': 'count'}],
+                        'hotels': [{'$skip': skip}, {'$limit': limit}, projection]
+                    }}
+                ]))
+                total = result['total'][0]['count'] if result['total'] else 0
+                docs = result['hotels']
+        else:
+            if not use_cursor or include_total:
+                # Get total count for pagination
+                total = count_query.count()
+            
+            # Apply pagination
+            docs = list(query.skip(skip).limit(limit).only(*HOTEL_LIST_FIELDS).as_pymongo())
         
-        # Apply pagination
-        skip = (page - 1) * per_page
-        hotels = query.skip(skip).limit(per_page)
+        has_next = use_cursor and len(docs) > per_page
+        docs = docs[:per_page]
         
         hotel_list = []
-        for hotel in hotels:
-            hotel_data = {
-                'id': str(hotel.id),
-                'name': hotel.name,
-                'description': hotel.description,
-                'address': hotel.address,
-                'city': hotel.city,
-                'state': hotel.state,
-                'country': hotel.country,
-                'rating': hotel.rating,
-                'price_per_night': hotel.price_per_night,
-                'available_rooms': hotel.available_rooms,
-                'amenities': hotel.amenities,
-                'images': hotel.images
-            }
+        for doc in docs:
+            hotel_data = _hotel_list_item(doc)
+            if 'free_rooms' in doc:
+                hotel_data['free_rooms'] = doc['free_rooms']
             hotel_list.append(hotel_data)
         
+        if use_cursor:
+            pagination_data = {
+                'per_page': per_page,
+                'next_cursor': pagination.encode_cursor(docs[-1]['_id']) if has_next else None,
+                'has_next': has_next
+            }
+            if total is not None:
+                pagination_data['total'] = total
+            return jsonify({'hotels': hotel_list, 'pagination': pagination_data}), 200
+        
         total_pages = (total + per_page - 1) // per_page
         
         return jsonify({
@@ -82,72 +203,38 @@ def get_hotels():
         return jsonify({'error': str(e)}), 500
 
 @hotels_bp.route('/<hotel_id>', methods=['GET'])
+@catalog.conditional_get
 def get_hotel_detail(hotel_id):
     try:
-        from models import Hotel
-        hotel = Hotel.objects(id=hotel_id).first()
+        import cache
+        hotel = cache.hotels.get(hotel_id, g.get('catalog_version'))
         
         if not hotel:
             return jsonify({'error': 'Hotel not found'}), 404
         
-        hotel_data = {
-            'id': str(hotel.id),
-            'name': hotel.name,
-            'description': hotel.description,
-            'address': hotel.address,
-            'city': hotel.city,
-            'state': hotel.state,
-            'country': hotel.country,
-            'zip_code': hotel.zip_code,
-            'phone': hotel.phone,
-            'email': hotel.email,
-            'website': hotel.website,
-            'rating': hotel.rating,
-            'price_per_night': hotel.price_per_night,
-            'total_rooms': hotel.total_rooms,
-            'available_rooms': hotel.available_rooms,
-            'amenities': hotel.amenities,
-            'images': hotel.images,
-            'created_at': hotel.created_at.isoformat()
-        }
-        
-        return jsonify(hotel_data), 200
+        return jsonify(_hotel_detail_item(hotel.to_mongo())), 200
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @hotels_bp.route('/search', methods=['GET'])
+@catalog.conditional_get
 def search_hotels():
     try:
         query = request.args.get('q', '')
         if not query:
             return jsonify({'error': 'Search query is required'}), 400
         
-        # Search in hotel name, description, city, and address
+        # Search the weighted text index over name, city, address and
+        # description, best matches first. The query is tokenized and stemmed
+        # by MongoDB, never interpreted as a pattern.
         from models import Hotel
-        hotels = Hotel.objects.filter(
-            __raw__={
-                '$or': [
-                    {'name': {'$regex': query, '$options': 'i'}},
-                    {'description': {'$regex': query, '$options': 'i'}},
-                    {'city': {'$regex': query, '$options': 'i'}},
-                    {'address': {'$regex': query, '$options': 'i'}}
-                ]
-            }
-        ).limit(20)
+        hotels = Hotel.objects.search_text(query).order_by('$text_score').limit(SEARCH_RESULT_LIMIT)
         
-        hotel_list = []
-        for hotel in hotels:
-            hotel_data = {
-                'id': str(hotel.id),
-                'name': hotel.name,
-                'description': hotel.description,
-                'city': hotel.city,
-                'rating': hotel.rating,
-                'price_per_night': hotel.price_per_night,
-                'available_rooms': hotel.available_rooms
-            }
-            hotel_list.append(hotel_data)
+        hotel_list = [
+            _hotel_search_item(doc)
+            for doc in hotels.only(*HOTEL_SEARCH_FIELDS).as_pymongo()
+        ]
         
         return jsonify({
             'query': query,
@@ -158,11 +245,31 @@ def search_hotels():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@hotels_bp.route('/suggest', methods=['GET'])
+def suggest_hotels():
+    try:
+        prefix = request.args.get('prefix', '')
+        limit = request.args.get('limit', SUGGEST_DEFAULT_LIMIT, type=int)
+        limit = max(1, min(limit, SUGGEST_MAX_LIMIT))
+        
+        if not prefix.strip():
+            return jsonify({'error': 'prefix is required'}), 400
+        
+        # Cities and hotel names from the in-memory prefix index
+        import suggest
+        return jsonify({
+            'prefix': prefix,
+            'suggestions': suggest.index.lookup(prefix, limit)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @hotels_bp.route('/<hotel_id>/availability', methods=['GET'])
 def check_availability(hotel_id):
     try:
-        from models import Hotel, Booking
-        hotel = Hotel.objects(id=hotel_id).first()
+        import cache
+        hotel = cache.hotels.get(hotel_id)
         
         if not hotel:
             return jsonify({'error': 'Hotel not found'}), 404
@@ -170,41 +277,14 @@ def check_availability(hotel_id):
         check_in = request.args.get('check_in')
         check_out = request.args.get('check_out')
         
-        if not check_in or not check_out:
-            return jsonify({'error': 'Check-in and check-out dates are required'}), 400
-        
         try:
-            check_in_date = datetime.strptime(check_in, '%Y-%m-%d').date()
-            check_out_date = datetime.strptime(check_out, '%Y-%m-%d').date()
-        except ValueError:
-            return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 400
-        
-        if check_in_date >= check_out_date:
-            return jsonify({'error': 'Check-out date must be after check-in date'}), 400
-        
-        # Check for conflicting bookings
-        conflicting_bookings = Booking.objects.filter(
-            hotel=hotel,
-            status='confirmed',
-            __raw__={
-                '$or': [
-                    {
-                        'check_in_date': {'$lte': check_in_date},
-                        'check_out_date': {'$gt': check_in_date}
-                    },
-                    {
-                        'check_in_date': {'$lt': check_out_date},
-                        'check_out_date': {'$gte': check_out_date}
-                    },
-                    {
-                        'check_in_date': {'$gte': check_in_date},
-                        'check_out_date': {'$lte': check_out_date}
-                    }
-                ]
-            }
-        ).count()
+            check_in_date, check_out_date = validation.parse_stay(check_in, check_out)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         
-        available_rooms = max(0, hotel.available_rooms - conflicting_bookings)
+        # Minimum free rooms across the nights of the stay, from the occupancy ledger
+        import occupancy
+        available_rooms = occupancy.free_rooms(hotel, check_in_date, check_out_date)
         
         return jsonify({
             'hotel_id': str(hotel.id),
@@ -219,6 +299,59 @@ def check_availability(hotel_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@hotels_bp.route('/availability', methods=['POST'])
+def check_availability_bulk():
+    try:
+        data = request.get_json() or {}
+        hotel_ids = data.get('hotel_ids')
+        check_in = data.get('check_in')
+        check_out = data.get('check_out')
+        
+        if not isinstance(hotel_ids, list) or not hotel_ids:
+            return jsonify({'error': 'hotel_ids must be a non-empty list'}), 400
+        
+        if len(hotel_ids) > MAX_BULK_AVAILABILITY_HOTELS:
+            return jsonify({'error': f'At most {MAX_BULK_AVAILABILITY_HOTELS} hotels can be checked at once'}), 400
+        
+        try:
+            check_in_date, check_out_date = validation.parse_stay(check_in, check_out)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # One $in fetch for the hotels and one grouped aggregation over the ledger
+        from bson import ObjectId
+        from models import Hotel
+        import occupancy
+        valid_ids = [ObjectId(h) for h in hotel_ids if ObjectId.is_valid(h)]
+        hotels = list(Hotel.objects(id__in=valid_ids).only('total_rooms', 'available_rooms', 'price_per_night'))
+        free = occupancy.free_rooms_by_hotel(hotels, check_in_date, check_out_date)
+        
+        found = {str(hotel.id): hotel for hotel in hotels}
+        results = []
+        not_found = []
+        for hotel_id in hotel_ids:
+            hotel = found.get(hotel_id)
+            if not hotel:
+                not_found.append(hotel_id)
+                continue
+            results.append({
+                'hotel_id': hotel_id,
+                'available_rooms': free[hotel.id],
+                'total_rooms': hotel.total_rooms,
+                'price_per_night': hotel.price_per_night,
+                'is_available': free[hotel.id] > 0
+            })
+        
+        return jsonify({
+            'check_in': check_in,
+            'check_out': check_out,
+            'results': results,
+            'not_found': not_found
+        }), 200
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Admin create
 @hotels_bp.route('/', methods=['POST'])
 @hotels_bp.route('', methods=['POST'])
@@ -227,35 +360,53 @@ def create_hotel():
     try:
         if not _require_admin():
             return jsonify({'error': 'Admin privileges required'}), 403
-        data = request.get_json()
+        try:
+            fields = validation.parse_hotel(request.get_json())
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
         from models import Hotel
-        required = ['name','address','city','country','price_per_night','total_rooms','available_rooms']
-        for f in required:
-            if data.get(f) in [None, '']:
-                return jsonify({'error': f'{f} is required'}), 400
-        hotel = Hotel(
-            name=data['name'],
-            description=data.get('description',''),
-            address=data['address'],
-            city=data['city'],
-            state=data.get('state',''),
-            country=data['country'],
-            zip_code=data.get('zip_code',''),
-            phone=data.get('phone',''),
-            email=data.get('email',''),
-            website=data.get('website',''),
-            rating=float(data.get('rating', 0)),
-            price_per_night=float(data['price_per_night']),
-            total_rooms=int(data['total_rooms']),
-            available_rooms=int(data['available_rooms']),
-            amenities=list(data.get('amenities', [])),
-            images=list(data.get('images', []))
-        )
+        hotel = Hotel(**fields)
         hotel.save()
+        catalog.bump()
+        import suggest
+        suggest.index.add_hotel(hotel)
         return jsonify({'message': 'Hotel created', 'id': str(hotel.id)}), 201
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+# Admin bulk import: the body is streamed and parsed row by row
+IMPORT_CONTENT_TYPES = {'application/x-ndjson': 'ndjson', 'application/jsonl': 'ndjson', 'text/csv': 'csv'}
+
+@hotels_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_hotels():
+    try:
+        if not _require_admin():
+            return jsonify({'error': 'Admin privileges required'}), 403
+        import hotel_import
+        fmt = request.args.get('format') or IMPORT_CONTENT_TYPES.get(request.mimetype)
+        if fmt not in hotel_import.FORMATS:
+            return jsonify({'error': 'Send application/x-ndjson or text/csv, or pass format=ndjson|csv'}), 415
+        batch_size = request.args.get('batch_size', hotel_import.DEFAULT_BATCH_SIZE, type=int)
+        if batch_size < 1:
+            return jsonify({'error': 'batch_size must be at least 1'}), 400
+
+        import io
+        from flask import current_app
+        stream = io.TextIOWrapper(request.stream, encoding=request.mimetype_params.get('charset', 'utf-8'), newline='')
+
+        def progress(report):
+            current_app.logger.info('Hotel import: %d rows, %d inserted, %d updated, %d failed',
+                                    report.processed, report.inserted, report.updated, report.failed)
+
+        report = hotel_import.import_hotels(hotel_import.read_rows(stream, fmt), batch_size, progress)
+        if report.aborted:
+            # Partly imported: say what was written, not just that it failed
+            return jsonify({'error': report.aborted, **report.to_dict()}), 500
+        return jsonify(report.to_dict()), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Admin update
 @hotels_bp.route('/<hotel_id>', methods=['PUT'])
 @jwt_required()
@@ -264,6 +415,7 @@ def update_hotel(hotel_id):
         if not _require_admin():
             return jsonify({'error': 'Admin privileges required'}), 403
         from models import Hotel
+        # Admin writes always start from the stored document
         hotel = Hotel.objects(id=hotel_id).first()
         if not hotel:
             return jsonify({'error': 'Hotel not found'}), 404
@@ -272,7 +424,20 @@ def update_hotel(hotel_id):
         for f in fields:
             if f in data:
                 setattr(hotel, f, data[f])
-        hotel.save()
+        try:
+            hotel.save()
+            catalog.bump()
+        finally:
+            import cache
+            cache.hotels.invalidate(hotel.id)
+        # Replaces the hotel's old entries; a failed save left them as they were
+        import suggest
+        suggest.index.add_hotel(hotel)
+        
+        # Keep the hotel summary stored on bookings in step
+        if any(f in data for f in ('name', 'city', 'country')):
+            from models import Booking, HotelSummary
+            Booking.objects(hotel=hotel).update(set__hotel_summary=HotelSummary.from_hotel(hotel))
         return jsonify({'message': 'Hotel updated'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -285,10 +450,16 @@ def delete_hotel(hotel_id):
         if not _require_admin():
             return jsonify({'error': 'Admin privileges required'}), 403
         from models import Hotel
+        # Admin writes always start from the stored document
         hotel = Hotel.objects(id=hotel_id).first()
         if not hotel:
             return jsonify({'error': 'Hotel not found'}), 404
         hotel.delete()
+        catalog.bump()
+        import cache
+        cache.hotels.invalidate(hotel.id)
+        import suggest
+        suggest.index.remove_hotel(hotel)
         return jsonify({'message': 'Hotel deleted'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
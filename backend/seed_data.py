@@ -1,6 +1,7 @@
 from flask import Flask
 from flask_bcrypt import Bcrypt
 from datetime import datetime, date, timedelta
+from functools import lru_cache
 import json
 import os
 from dotenv import load_dotenv
@@ -38,12 +39,14 @@ def seed_database():
     
     try:
         # Import models after connecting to MongoDB
-        from models import User, Hotel, Booking
+        from models import User, Hotel, Booking, HotelNight
+        import occupancy
         
         # Clear existing data
         User.objects.delete()
         Hotel.objects.delete()
         Booking.objects.delete()
+        HotelNight.objects.delete()
         print("Cleared existing data")
         
         # Create sample users
@@ -221,6 +224,14 @@ def seed_database():
         
         print("Created bookings")
         
+        # Build the per-night occupancy ledger from the bookings above
+        occupancy.rebuild()
+        print("Built occupancy ledger")
+        
+        # Invalidate any cached hotel responses
+        import catalog
+        catalog.bump()
+        
         print("Database seeded successfully!")
         print(f"Created {len(hotels_data)} hotels")
         print(f"Created {len(sample_bookings)} sample bookings")
@@ -236,5 +247,419 @@ def seed_database():
         # Disconnect from MongoDB
         disconnect()
 
+# ---------------------------------------------------------------------------
+# Synthetic data at benchmark scale
+#
+#   python seed_data.py --hotels 100000 --users 1000000 --bookings 20000000 --seed 42
+#
+# Every document is a pure function of --seed, --today, the three counts and
+# --batch-size, so the same arguments load the same database whatever the
+# number of --workers. Ids are deterministic too: bookings refer to hotels and
+# users by index, and nothing is read back while loading. Collections are
+# loaded without indexes; indexes and the occupancy ledger are built after.
+# Bookings are drawn without regard to capacity, so once they are in, the
+# latest booked stays that take a hotel past its available_rooms on some night
+# are marked cancelled before the ledger is built.
+#
+# Skew: cities get Zipf-like shares of hotels and bookings, a few hotels in each
+# city take most of its bookings, check-ins peak in summer, around the year's
+# end and on weekends, and stays run 1-14 nights, so popular hotels have many
+# overlapping stays. Every user's password is password123; user 0 is the
+# admin (username admin).
+# ---------------------------------------------------------------------------
+
+# City, state, country, relative popularity
+SEED_CITIES = [
+    ('New York', 'NY', 'USA', 100), ('London', '', 'UK', 95), ('Paris', '', 'France', 90),
+    ('Tokyo', '', 'Japan', 70), ('Barcelona', '', 'Spain', 55), ('Rome', '', 'Italy', 50),
+    ('Miami', 'FL', 'USA', 45), ('Las Vegas', 'NV', 'USA', 45), ('Amsterdam', '', 'Netherlands', 40),
+    ('San Francisco', 'CA', 'USA', 35), ('Dubai', '', 'UAE', 35), ('Singapore', '', 'Singapore', 30),
+    ('Istanbul', '', 'Turkey', 30), ('Berlin', '', 'Germany', 28), ('Bangkok', '', 'Thailand', 28),
+    ('Los Angeles', 'CA', 'USA', 26), ('Lisbon', '', 'Portugal', 24), ('Sydney', 'NSW', 'Australia', 22),
+    ('Chicago', 'IL', 'USA', 20), ('Prague', '', 'Czech Republic', 18), ('Vienna', '', 'Austria', 16),
+    ('Boston', 'MA', 'USA', 15), ('Mexico City', '', 'Mexico', 14), ('São Paulo', 'SP', 'Brazil', 12),
+    ('Montréal', 'QC', 'Canada', 11), ('Kyoto', '', 'Japan', 10), ('Denver', 'CO', 'USA', 9),
+    ('Reykjavík', '', 'Iceland', 6), ('Zürich', '', 'Switzerland', 6), ('Santa Fe', 'NM', 'USA', 4)
+]
+SEED_NAME_PREFIXES = ['Grand', 'Royal', 'Urban', 'Seaside', 'Historic', 'Central', 'Park', 'Harbor',
+                      'Golden', 'Riverside', 'Sunset', 'Garden', 'Metropolitan', 'Boutique', 'Palace']
+SEED_NAME_SUFFIXES = ['Hotel', 'Inn', 'Suites', 'Resort', 'Lodge', 'Hostel', 'Residences', 'Plaza']
+SEED_STREETS = ['Main Street', 'Oak Avenue', 'Market Street', 'Harbor Road', 'King Street',
+                'Station Road', 'Park Lane', 'High Street', 'River Walk', 'Church Street']
+SEED_AMENITIES = ['WiFi', 'Pool', 'Spa', 'Gym', 'Restaurant', 'Bar', 'Room Service', 'Concierge',
+                  'Parking', 'Airport Shuttle', 'Pet Friendly', 'Kids Club', 'Rooftop Bar', 'Breakfast']
+SEED_IMAGES = ['https://images.unsplash.com/photo-1566073771259-6a8506099945?w=800',
+               'https://images.unsplash.com/photo-1551882547-ff40c63fe5fa?w=800',
+               'https://images.unsplash.com/photo-1520250497591-112f2f40a3f4?w=800',
+               'https://images.unsplash.com/photo-1571896349842-33c89424de2d?w=800']
+SEED_FIRST_NAMES = ['James', 'Mary', 'Wei', 'Fatima', 'Carlos', 'Aiko', 'Olga', 'Kwame', 'Priya',
+                    'Lucas', 'Emma', 'Noah', 'Sofia', 'Ahmed', 'Chloe', 'Mateo']
+SEED_LAST_NAMES = ['Smith', 'Garcia', 'Chen', 'Khan', 'Müller', 'Rossi', 'Sato', 'Okafor', 'Silva',
+                   'Nowak', 'Dubois', 'Kim', 'Johnson', 'Patel', 'Hansen', 'Ivanova']
+SEED_ROOM_TYPES = ['Standard Queen', 'Standard Twin', 'Deluxe King', 'Family Room', 'Junior Suite', 'Suite']
+SEED_REQUESTS = ['High floor', 'Late check-in', 'Quiet room', 'Extra pillows', 'Crib needed']
+
+# First byte after the timestamp in generated ObjectIds, per collection
+SEED_ID_KINDS = {'hotels': 1, 'users': 2, 'bookings': 3}
+
+# Bookings fall within this many days either side of --today
+SEED_BOOKING_WINDOW_DAYS = 365
+
+_spec = None
+_db = None
+
+
+def _seed_oid(kind, index, moment):
+    """Deterministic ObjectId: creation time, collection kind, then the document's index"""
+    from bson import ObjectId
+    seconds = int((moment - datetime(1970, 1, 1)).total_seconds())
+    return ObjectId(seconds.to_bytes(4, 'big') + bytes([SEED_ID_KINDS[kind]]) + index.to_bytes(7, 'big'))
+
+
+def _seed_password_hash(seed, password='password123'):
+    """bcrypt hash with a salt drawn from the seed, so reruns store the same hash"""
+    import random
+    import bcrypt as bcrypt_lib
+    alphabet = './ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789'
+    rng = random.Random(f"{seed}:password")
+    # 22 base64 characters carry bcrypt's 128-bit salt; the last one only 2 bits
+    salt = ''.join(rng.choice(alphabet) for _ in range(21)) + rng.choice('.Oeu')
+    rounds = int(os.getenv('BCRYPT_LOG_ROUNDS', '12'))
+    return bcrypt_lib.hashpw(password.encode('utf-8'), f"$2b${rounds:02d}${salt}".encode('ascii')).decode('utf-8')
+
+
+def _city_bounds(hotels):
+    """Hotel index ranges per city, sized by popularity (every city gets a hotel if it can)"""
+    total = sum(city[3] for city in SEED_CITIES)
+    bounds = []
+    start = 0
+    for position, city in enumerate(SEED_CITIES):
+        size = max(1, round(hotels * city[3] / total)) if position < len(SEED_CITIES) - 1 else hotels - start
+        stop = min(hotels, start + size)
+        if stop > start:
+            bounds.append((start, stop))
+        start = stop
+    return bounds
+
+
+def _hotel_city(spec, index):
+    for position, (start, stop) in enumerate(spec['city_bounds']):
+        if start <= index < stop:
+            return SEED_CITIES[position]
+    return SEED_CITIES[-1]
+
+
+def _seed_hotel(spec, index):
+    """Hotel document number ``index``; its own RNG, so bookings can rebuild it"""
+    import random
+    from suggest import normalize
+    rng = random.Random(f"{spec['seed']}:hotel:{index}")
+    city, state, country, popularity = _hotel_city(spec, index)
+    name = f"{rng.choice(SEED_NAME_PREFIXES)} {rng.choice(SEED_NAME_SUFFIXES)} {city}"
+    rating = round(min(5.0, max(1.0, rng.gauss(4.0, 0.5))), 1)
+    # Popular cities and better ratings cost more
+    price = round(40 * (1 + popularity / 50) * (rating / 3) * rng.lognormvariate(0, 0.35), 2)
+    total_rooms = min(1000, int(10 * rng.paretovariate(1.2)))
+    slug = f"hotel{index}"
+    created_at = spec['anchor'] - timedelta(days=rng.randint(30, 3000))
+    return {
+        '_id': _seed_oid('hotels', index, spec['anchor']),
+        'name': name,
+        'description': f"{name} offers {rng.choice(['comfortable', 'stylish', 'quiet', 'spacious'])} rooms "
+                       f"close to the sights of {city}.",
+        'address': f"{rng.randint(1, 999)} {rng.choice(SEED_STREETS)}",
+        'city': city,
+        'city_key': normalize(city),
+        'state': state,
+        'country': country,
+        'zip_code': f"{rng.randint(10000, 99999)}",
+        'phone': f"+1-555-{rng.randint(1000000, 9999999)}",
+        'email': f"info@{slug}.example.com",
+        'website': f"https://{slug}.example.com",
+        'rating': rating,
+        'price_per_night': price,
+        'total_rooms': total_rooms,
+        'available_rooms': total_rooms,
+        'amenities': rng.sample(SEED_AMENITIES, rng.randint(3, 8)),
+        'images': rng.sample(SEED_IMAGES, 2),
+        'created_at': created_at,
+        'updated_at': created_at
+    }
+
+
+def _seed_users(spec, start, stop, rng):
+    docs = []
+    for index in range(start, stop):
+        created_at = spec['anchor'] - timedelta(days=rng.randint(0, 2000), seconds=rng.randint(0, 86399))
+        username = 'admin' if index == 0 else f"user{index}"
+        docs.append({
+            '_id': _seed_oid('users', index, spec['anchor']),
+            'username': username,
+            'email': f"{username}@example.com",
+            'password_hash': spec['password_hash'],
+            'first_name': rng.choice(SEED_FIRST_NAMES),
+            'last_name': rng.choice(SEED_LAST_NAMES),
+            'phone': f"+1-555-{rng.randint(1000000, 9999999)}",
+            'is_admin': index == 0,
+            'created_at': created_at,
+            'updated_at': created_at
+        })
+    return docs
+
+
+def _season_weight(day):
+    """Relative demand for check-ins on ``day``: summer and year-end peaks, busier weekends"""
+    import math
+    weight = 1 + 0.6 * math.cos(2 * math.pi * (day.timetuple().tm_yday - 196) / 365)
+    if (day.month == 12 and day.day >= 20) or (day.month == 1 and day.day <= 3):
+        weight += 0.8
+    if day.weekday() in (4, 5):
+        weight += 0.3
+    return weight
+
+
+@lru_cache(maxsize=100000)
+def _cached_seed_hotel(index):
+    return _seed_hotel(_spec, index)
+
+
+def _seed_bookings(spec, start, stop, rng):
+    import bisect
+    anchor_date = spec['anchor'].date()
+    city_weights = spec['city_cum_weights']
+    docs = []
+    for index in range(start, stop):
+        # A hot city, then a few favourite hotels within it
+        city_start, city_stop = spec['city_bounds'][bisect.bisect(city_weights, rng.random() * city_weights[-1])]
+        hotel_doc = _cached_seed_hotel(city_start + int((city_stop - city_start) * rng.random() ** 3))
+        user_index = int(spec['users'] * rng.random() ** 2)
+
+        while True:
+            check_in = anchor_date + timedelta(days=rng.randint(-SEED_BOOKING_WINDOW_DAYS, SEED_BOOKING_WINDOW_DAYS))
+            if rng.random() * 2.7 < _season_weight(check_in):
+                break
+        nights = rng.choices(range(1, 15), weights=[14, 22, 18, 12, 9, 6, 8, 2, 1, 1, 1, 1, 1, 3])[0]
+        check_out = check_in + timedelta(days=nights)
+
+        lead = timedelta(days=min(300, int(rng.expovariate(1 / 30))), seconds=rng.randint(0, 86399))
+        created_at = min(datetime.combine(check_in, datetime.min.time()) - lead,
+                         spec['anchor'] - timedelta(seconds=rng.randint(1, 86400)))
+        if check_out <= anchor_date:
+            status = 'cancelled' if rng.random() < 0.1 else 'completed'
+        else:
+            status = 'cancelled' if rng.random() < 0.08 else 'confirmed'
+
+        docs.append({
+            '_id': _seed_oid('bookings', index, created_at),
+            'user': _seed_oid('users', user_index, spec['anchor']),
+            'hotel': hotel_doc['_id'],
+            'hotel_summary': {'name': hotel_doc['name'], 'city': hotel_doc['city'], 'country': hotel_doc['country']},
+            'check_in_date': datetime.combine(check_in, datetime.min.time()),
+            'check_out_date': datetime.combine(check_out, datetime.min.time()),
+            'num_guests': rng.choices([1, 2, 3, 4], weights=[25, 50, 12, 13])[0],
+            'room_type': rng.choice(SEED_ROOM_TYPES),
+            'total_price': round(hotel_doc['price_per_night'] * nights, 2),
+            'status': status,
+            'special_requests': rng.choice(SEED_REQUESTS) if rng.random() < 0.15 else '',
+            'created_at': created_at,
+            'updated_at': created_at
+        })
+    return docs
+
+
+def _init_seed_worker(spec, uri=None, options=None):
+    """Pool initializer: each worker process opens its own MongoDB connection"""
+    global _spec, _db
+    _spec = spec
+    # Hotels cached for an earlier load() in this process came from its spec
+    _cached_seed_hotel.cache_clear()
+    if uri is not None:
+        from pymongo import MongoClient
+        _db = MongoClient(uri, **options).get_default_database('hotels_reserved')
+    else:
+        from mongoengine.connection import get_db
+        _db = get_db()
+
+
+def _insert_seed_batch(task):
+    """Generate and bulk insert documents [start, stop) of one collection"""
+    import random
+    collection, start, stop = task
+    rng = random.Random(f"{_spec['seed']}:{collection}:{start}")
+    if collection == 'hotels':
+        docs = [_seed_hotel(_spec, index) for index in range(start, stop)]
+    elif collection == 'users':
+        docs = _seed_users(_spec, start, stop, rng)
+    else:
+        docs = _seed_bookings(_spec, start, stop, rng)
+    _db[collection].insert_many(docs, ordered=False)
+    return collection, len(docs)
+
+
+def _cancel_overbooked(batch_size=10000):
+    """
+    Cancel the stays that take a hotel past its available_rooms on some night,
+    keeping the earliest booked; returns how many were cancelled.
+
+    Booking ids start with the creation time, so "earliest" does not depend on
+    the order the loader workers inserted them in.
+    """
+    from models import Hotel, Booking
+    capacity = {hotel['_id']: hotel.get('available_rooms') or 0
+                for hotel in Hotel.objects.only('available_rooms').as_pymongo()}
+    cancelled = []
+    count = 0
+
+    def check(stays, rooms):
+        taken = {}
+        for booking_id, nights in sorted(stays):
+            if any(taken.get(night, 0) >= rooms for night in nights):
+                cancelled.append(booking_id)
+                continue
+            for night in nights:
+                taken[night] = taken.get(night, 0) + 1
+
+    def flush():
+        nonlocal count
+        if cancelled:
+            Booking.objects(id__in=cancelled).update(set__status='cancelled')
+            count += len(cancelled)
+            cancelled.clear()
+
+    import occupancy
+    current = None
+    stays = []
+    rooms = 0
+    # Confirmed and completed stays both held rooms; bookings come in hotel order
+    bookings = Booking.objects(status__in=['confirmed', 'completed']).order_by('hotel') \
+        .only('hotel', 'check_in_date', 'check_out_date').as_pymongo()
+    for booking in bookings:
+        if booking['hotel'] != current:
+            check(stays, rooms)
+            if len(cancelled) >= batch_size:
+                flush()
+            current = booking['hotel']
+            rooms = capacity.get(current, 0)
+            stays = []
+        stays.append((booking['_id'], occupancy.stay_nights(booking['check_in_date'].date(),
+                                                            booking['check_out_date'].date())))
+    check(stays, rooms)
+    flush()
+    return count
+
+
+def load(hotels, users, bookings, seed=42, workers=None, batch_size=1000, today=None):
+    """
+    Replace the database contents with synthetic data (see the notes above),
+    through the registered mongoengine connection
+    """
+    import time
+    if hotels < 1 or users < 1:
+        raise ValueError('--hotels and --users must be at least 1')
+    workers = workers or os.cpu_count() or 1
+    from models import User, Hotel, Booking, HotelNight
+    import database
+    import occupancy
+
+    anchor = datetime.combine(today or date.today(), datetime.min.time())
+    spec = {
+        'seed': seed,
+        'hotels': hotels,
+        'users': users,
+        'anchor': anchor,
+        'city_bounds': _city_bounds(hotels),
+        'password_hash': _seed_password_hash(seed)
+    }
+    # Bookings pick a city by popularity among the cities that got hotels
+    cum_weight = 0
+    spec['city_cum_weights'] = []
+    for position in range(len(spec['city_bounds'])):
+        cum_weight += SEED_CITIES[position][3]
+        spec['city_cum_weights'].append(cum_weight)
+
+    # Dropping also drops the indexes; they are built once the data is in
+    for model in (User, Hotel, Booking, HotelNight):
+        model.drop_collection()
+    print("Cleared existing data")
+
+    tasks = [(collection, start, min(count, start + batch_size))
+             for collection, count in (('hotels', hotels), ('users', users), ('bookings', bookings))
+             for start in range(0, count, batch_size)]
+    started = time.perf_counter()
+    inserted = {'hotels': 0, 'users': 0, 'bookings': 0}
+    if workers > 1:
+        import multiprocessing
+        # Spawned workers share no MongoClient with this process
+        pool = multiprocessing.get_context('spawn').Pool(
+            workers, _init_seed_worker, (spec, database.mongodb_uri(), database.pool_options())
+        )
+        results = pool.imap_unordered(_insert_seed_batch, tasks)
+    else:
+        pool = None
+        _init_seed_worker(spec)
+        results = map(_insert_seed_batch, tasks)
+    try:
+        for done, (collection, count) in enumerate(results, start=1):
+            inserted[collection] += count
+            if done % 100 == 0:
+                print(f"Inserted {inserted['hotels']} hotels, {inserted['users']} users, "
+                      f"{inserted['bookings']} bookings")
+    finally:
+        if pool is not None:
+            # Every task has finished unless loading failed
+            pool.terminate()
+            pool.join()
+    print(f"Loaded {hotels} hotels, {users} users and {bookings} bookings "
+          f"with {workers} workers in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    for model in (User, Hotel, Booking, HotelNight):
+        model.ensure_indexes()
+    print(f"Built indexes in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    overbooked = _cancel_overbooked()
+    print(f"Cancelled {overbooked} stays over hotel capacity in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    counters = occupancy.rebuild()
+    print(f"Built occupancy ledger ({counters} hotel-nights) in {time.perf_counter() - started:.1f}s")
+
+    import catalog
+    catalog.bump()
+    print("Admin credentials => username: admin, password: password123")
+
+
+def generate(hotels, users, bookings, **options):
+    """Connect as the sample seed does and load() synthetic data"""
+    create_app()
+    try:
+        load(hotels, users, bookings, **options)
+    finally:
+        disconnect()
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(
+        description='Seed the database. Without counts, load the small sample data set; '
+                    'with them, generate deterministic synthetic data at benchmark scale.'
+    )
+    parser.add_argument('--hotels', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--bookings', type=int)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--workers', type=int, help='parallel loader processes (default: CPU count)')
+    parser.add_argument('--batch-size', type=int, default=1000, help='documents per bulk insert')
+    parser.add_argument('--today', type=lambda value: datetime.strptime(value, '%Y-%m-%d').date(),
+                        help='date the data is generated around (default: today); fix it for identical reruns')
+    args = parser.parse_args()
+
+    if args.hotels is None and args.users is None and args.bookings is None:
+        seed_database()
+        return
+    generate(args.hotels or 1000, args.users or 10000, args.bookings or 100000,
+             seed=args.seed, workers=args.workers, batch_size=args.batch_size, today=args.today)
+
 if __name__ == '__main__':
-    seed_database()
+    main()
@@ -0,0 +1,206 @@
+"""
+Slow-query log with explain plans.
+
+A pymongo command listener times every command. One that takes at least
+SLOW_QUERY_MS is written to a rotating log file as a JSON line holding:
+- the command's shape, with collection, operators, field names, sort and
+  projection kept and every value replaced by "?"
+- its duration and the route that issued it
+- for reads, updates and deletes, the plan MongoDB picks for that shape, from
+  index_advisor.analyse(): the winning plan, the indexes it uses, any
+  collection scan or in-memory sort, and a suggested index
+
+Explains run on a background thread, never on the request thread. Each shape
+is explained at most once per SLOW_QUERY_EXPLAIN_TTL; beyond that and when
+the explain queue is full, entries are logged without a plan.
+
+Configuration (environment):
+    SLOW_QUERY_MS                 threshold in milliseconds (default 100, 0 disables the log)
+    SLOW_QUERY_LOG                log file (default slow_queries.log)
+    SLOW_QUERY_LOG_BYTES          size at which the file is rotated (default 10 MB)
+    SLOW_QUERY_LOG_BACKUPS        rotated files kept (default 5)
+    SLOW_QUERY_EXPLAIN            queryPlanner (plan only, default), executionStats
+                                  (runs the query again) or off
+    SLOW_QUERY_EXPLAIN_TTL        seconds before the same shape is explained again (default 600)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import json
+import logging
+from logging.handlers import RotatingFileHandler
+import os
+import threading
+
+from pymongo import monitoring
+
+import cache
+import metrics
+
+THRESHOLD_MS = float(os.getenv('SLOW_QUERY_MS', '100'))
+LOG_FILE = os.getenv('SLOW_QUERY_LOG', 'slow_queries.log')
+LOG_BYTES = int(os.getenv('SLOW_QUERY_LOG_BYTES', str(10 * 1024 * 1024)))
+LOG_BACKUPS = int(os.getenv('SLOW_QUERY_LOG_BACKUPS', '5'))
+EXPLAIN = os.getenv('SLOW_QUERY_EXPLAIN', 'queryPlanner')
+EXPLAIN_TTL = int(os.getenv('SLOW_QUERY_EXPLAIN_TTL', '600'))
+
+# Slow commands waiting on the background thread; more are logged inline without a plan
+EXPLAIN_QUEUE = 16
+
+# Commands explain accepts
+EXPLAINABLE = ('find', 'aggregate', 'count', 'distinct', 'update', 'delete', 'findAndModify')
+
+# Top-level fields copied verbatim into the shape: they describe how the
+# query runs, not the data it matches
+SHAPE_FIELDS = ('sort', 'projection', 'hint', 'limit', 'skip', 'batchSize', 'ordered', 'new', 'upsert', 'fields')
+
+# Driver and session fields that are neither shape nor accepted by explain
+DRIVER_FIELDS = ('lsid', 'txnNumber', '$clusterTime', '$db', '$readPreference', 'readConcern',
+                 'writeConcern', 'autocommit', 'startTransaction', 'apiVersion', 'comment')
+
+logger = logging.getLogger('slow_queries')
+logger.propagate = False
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slow-query-explain')
+_slots = threading.BoundedSemaphore(EXPLAIN_QUEUE)
+_explained = cache.TTLCache(maxsize=1024, ttl=EXPLAIN_TTL)
+# Set on the explain thread, whose own commands are not logged
+_explaining = threading.local()
+
+
+def redact(value):
+    """Shape of a command value: containers and keys kept, values replaced by '?'"""
+    if isinstance(value, dict):
+        return {k: redact(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        if all(not isinstance(item, (dict, list, tuple)) for item in value):
+            # $in lists and the like: same shape whatever their length
+            return ['?']
+        return [redact(item) for item in value]
+    return '?'
+
+
+def command_shape(command_name, command):
+    shape = {}
+    for key, value in command.items():
+        if key in DRIVER_FIELDS:
+            continue
+        if key == command_name or (command_name == 'getMore' and key == 'collection'):
+            shape[key] = value if isinstance(value, str) else '?'
+        elif key in SHAPE_FIELDS:
+            shape[key] = value
+        elif key == 'documents':
+            # Inserted documents are data, not shape
+            shape[key] = f'<{len(value)} documents>'
+        else:
+            shape[key] = redact(value)
+    return shape
+
+
+def _route():
+    from flask import has_request_context, request
+    if not has_request_context():
+        return None
+    rule = request.url_rule.rule if request.url_rule else request.path
+    return f'{request.method} {rule}'
+
+
+def _write(entry):
+    logger.warning(json.dumps(entry, default=str))
+
+
+def _write_entry(entry, command):
+    """Runs on the background thread: explain the command if asked to, then log it"""
+    try:
+        if command is not None:
+            _explaining.active = True
+            try:
+                from mongoengine.connection import get_connection
+                import index_advisor
+                db = get_connection()[entry['database']]
+                report = index_advisor.analyse(db, entry['route'], entry['collection'], command, EXPLAIN)
+                entry['plan'] = {key: value for key, value in report.items() if key not in ('route', 'collection')}
+            except Exception as e:
+                entry['plan'] = {'error': str(e)}
+            finally:
+                _explaining.active = False
+        _write(entry)
+    finally:
+        _slots.release()
+
+
+def _submit(entry, command_name, command):
+    """Hand the entry to the background thread, with its command when the shape needs explaining"""
+    if not _slots.acquire(blocking=False):
+        entry['plan'] = 'skipped: explain queue full'
+        _write(entry)
+        return
+    explain = None
+    if EXPLAIN != 'off' and command_name in EXPLAINABLE:
+        key = json.dumps([entry['database'], entry['shape']], sort_keys=True, default=str)
+        if not _explained.get(key)[0]:
+            _explained.set(key, True)
+            explain = {k: v for k, v in command.items() if k not in DRIVER_FIELDS}
+    try:
+        _executor.submit(_write_entry, entry, explain)
+    except RuntimeError:
+        # Executor already shut down (worker exiting)
+        _slots.release()
+        _write(entry)
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    def __init__(self, threshold_ms):
+        self.threshold = threshold_ms * 1000
+        # (connection, request id) -> (database, command, route), from started to succeeded/failed
+        self._pending = {}
+
+    def started(self, event):
+        if getattr(_explaining, 'active', False):
+            return
+        self._pending[(event.connection_id, event.request_id)] = (event.database_name, event.command, _route())
+
+    def succeeded(self, event):
+        self._finish(event, None)
+
+    def failed(self, event):
+        failure = event.failure
+        self._finish(event, str(failure.get('errmsg', failure) if isinstance(failure, dict) else failure))
+
+    def _finish(self, event, error):
+        pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None or event.duration_micros < self.threshold:
+            return
+        database_name, command, route = pending
+        shape = command_shape(event.command_name, command)
+        entry = {
+            'time': datetime.utcnow().isoformat(timespec='milliseconds') + 'Z',
+            'duration_ms': round(event.duration_micros / 1000, 1),
+            'route': route,
+            'database': database_name,
+            'collection': metrics.command_collection(event.command_name, command),
+            'command': event.command_name,
+            'shape': shape
+        }
+        if error is not None:
+            entry['error'] = error
+        _submit(entry, event.command_name, command)
+
+
+def init_app(app):
+    """Attach the rotating log and register the listener; call before database.connect()"""
+    if THRESHOLD_MS <= 0:
+        return
+    if not logger.handlers:
+        handler = RotatingFileHandler(LOG_FILE, maxBytes=LOG_BYTES, backupCount=LOG_BACKUPS, delay=True)
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+    import database
+    database.add_listener(listener)
+
+
+def shutdown():
+    """Write out the entries still queued; call before database.disconnect()"""
+    _executor.shutdown(wait=True)
+
+
+listener = SlowQueryListener(THRESHOLD_MS)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Concurrent stress test for the booking ledger.
+
+Fires many simultaneous POST /api/bookings requests for the same nights at a
+hotel with only a few rooms and checks that exactly that many succeed and that
+no night in the occupancy ledger goes over capacity.
+
+Run against a real MongoDB (it uses MONGODB_URI from .env); the test user,
+hotel, bookings and ledger counters it creates are removed afterwards.
+
+    python stress_booking.py --rooms 5 --requests 200 --workers 32
+"""
+
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import uuid
+
+
+def run_stress(rooms, num_requests, workers):
+    from app import app
+    from flask_jwt_extended import create_access_token
+    from models import User, Hotel, Booking, HotelNight
+    import occupancy
+
+    suffix = uuid.uuid4().hex[:8]
+    user = User(
+        username=f'stress_{suffix}',
+        email=f'stress_{suffix}@example.com',
+        password_hash='not-a-real-hash',
+        first_name='Stress',
+        last_name='Test'
+    )
+    user.save()
+    hotel = Hotel(
+        name=f'Stress Test Hotel {suffix}',
+        address='1 Load Street',
+        city='Testville',
+        country='Nowhere',
+        price_per_night=100.0,
+        total_rooms=rooms,
+        available_rooms=rooms
+    )
+    hotel.save()
+
+    with app.app_context():
+        token = create_access_token(identity=str(user.id))
+
+    check_in = date.today() + timedelta(days=10)
+    check_out = check_in + timedelta(days=3)
+    payload = {
+        'hotel_id': str(hotel.id),
+        'check_in_date': check_in.isoformat(),
+        'check_out_date': check_out.isoformat(),
+        'num_guests': 1,
+        'room_type': 'Standard'
+    }
+    headers = {'Authorization': f'Bearer {token}'}
+
+    def book(_):
+        client = app.test_client()
+        return client.post('/api/bookings/', json=payload, headers=headers).status_code
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            statuses = list(pool.map(book, range(num_requests)))
+
+        created = statuses.count(201)
+        rejected = statuses.count(400)
+        confirmed = Booking.objects(hotel=hotel, status='confirmed').count()
+        booked = occupancy.booked_per_night(hotel, check_in, check_out)
+
+        print(f"Requests: {num_requests}, workers: {workers}, rooms: {rooms}")
+        print(f"Created: {created}, rejected: {rejected}, other: {num_requests - created - rejected}")
+        print(f"Confirmed bookings in database: {confirmed}")
+        print(f"Ledger per night: {[booked.get(n, 0) for n in occupancy.stay_nights(check_in, check_out)]}")
+
+        ok = (
+            created == min(rooms, num_requests)
+            and confirmed == created
+            and all(booked.get(n, 0) == created for n in occupancy.stay_nights(check_in, check_out))
+        )
+        return ok
+
+    finally:
+        Booking.objects(hotel=hotel).delete()
+        HotelNight.objects(hotel=hotel).delete()
+        hotel.delete()
+        user.delete()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Concurrent overbooking stress test')
+    parser.add_argument('--rooms', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    print("=== Booking Concurrency Stress Test ===\n")
+    if run_stress(args.rooms, args.requests, args.workers):
+        print("\n🎉 No overbooking: every night is exactly at the number of created bookings.")
+    else:
+        print("\n⚠️  Overbooking or lost update detected. Check the output above for details.")
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
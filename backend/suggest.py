@@ -0,0 +1,176 @@
+"""
+In-memory typeahead index for /api/hotels/suggest.
+
+Holds the distinct city names and every hotel name as a sorted list of
+normalized keys, so a prefix lookup is one bisect plus a short scan. The list
+is rebuilt from the Hotel collection at startup and patched in place by the
+admin hotel routes. Other worker processes rebuild theirs within a second of
+a hotel write (they watch the catalog version), and at the latest when their
+copy is older than SUGGEST_REFRESH_SECONDS.
+"""
+from bisect import bisect_left, insort
+import os
+import threading
+import time
+import unicodedata
+
+import catalog
+
+REFRESH_SECONDS = int(os.getenv('SUGGEST_REFRESH_SECONDS', '300'))
+
+
+def normalize(text):
+    """Case-fold and strip accents so 'Zürich' and 'zurich' share a key"""
+    decomposed = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).casefold().strip()
+
+
+def _hotel_entry(hotel_id, name):
+    return (normalize(name), 'hotel', name, hotel_id)
+
+
+def _city_entry(city):
+    return (normalize(city), 'city', city, '')
+
+
+class SuggestIndex:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # Sorted (key, kind, label, hotel_id) tuples. Readers use whatever list
+        # is current; writers build a new list and swap it in.
+        self._entries = []
+        # Number of hotels per (key, 'city', label) entry
+        self._city_counts = {}
+        # hotel_id -> (name, city) as indexed, so a hotel is replaced or
+        # removed by id whatever its current name
+        self._hotels = {}
+        # (hotel_id, (name, city) or None) patches made while load() reads
+        # the collection, applied again to what it read
+        self._replay = None
+        self._loaded_at = None
+        # Set when the catalog changed since the list was read
+        self._stale = False
+        self._catalog = catalog.VersionWatch()
+
+    def load(self):
+        """Rebuild the index from the Hotel collection"""
+        with self._refresh_lock:
+            self._load()
+
+    def _load(self):
+        from models import Hotel
+        with self._lock:
+            self._replay = []
+            self._stale = False
+        try:
+            hotels = {
+                str(hotel['_id']): (hotel.get('name'), hotel.get('city'))
+                for hotel in Hotel.objects.only('name', 'city').as_pymongo()
+            }
+            with self._lock:
+                # A patch may or may not be in what was read; applying it again is harmless
+                for hotel_id, values in self._replay:
+                    if values is None:
+                        hotels.pop(hotel_id, None)
+                    else:
+                        hotels[hotel_id] = values
+                entries = []
+                city_counts = {}
+                for hotel_id, (name, city) in hotels.items():
+                    entries.append(_hotel_entry(hotel_id, name))
+                    city = _city_entry(city)
+                    city_counts[city] = city_counts.get(city, 0) + 1
+                entries.extend(city_counts)
+                entries.sort()
+                self._entries = entries
+                self._city_counts = city_counts
+                self._hotels = hotels
+                self._loaded_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._replay = None
+
+    def _needs_load(self):
+        return (self._stale or self._loaded_at is None
+                or time.monotonic() - self._loaded_at > REFRESH_SECONDS)
+
+    def _ensure_fresh(self):
+        if self._catalog.changed():
+            self._stale = True
+        if not self._needs_load():
+            return
+        # One thread rebuilds; the others keep serving the current list
+        if not self._refresh_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._needs_load():
+                self._load()
+        finally:
+            self._refresh_lock.release()
+
+    def _unindex(self, entries, hotel_id):
+        """Take a hotel out of ``entries``; call with the lock held"""
+        values = self._hotels.pop(hotel_id, None)
+        if values is None:
+            return
+        name, city = values
+        entry = _hotel_entry(hotel_id, name)
+        i = bisect_left(entries, entry)
+        if i < len(entries) and entries[i] == entry:
+            del entries[i]
+        city = _city_entry(city)
+        remaining = self._city_counts.get(city, 0) - 1
+        if remaining > 0:
+            self._city_counts[city] = remaining
+        else:
+            self._city_counts.pop(city, None)
+            i = bisect_left(entries, city)
+            if i < len(entries) and entries[i] == city:
+                del entries[i]
+
+    def add_hotel(self, hotel):
+        """Index a new hotel, or replace the entries of one already indexed"""
+        hotel_id = str(hotel.id)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((hotel_id, (hotel.name, hotel.city)))
+            entries = list(self._entries)
+            self._unindex(entries, hotel_id)
+            self._hotels[hotel_id] = (hotel.name, hotel.city)
+            insort(entries, _hotel_entry(hotel_id, hotel.name))
+            city = _city_entry(hotel.city)
+            if city not in self._city_counts:
+                insort(entries, city)
+            self._city_counts[city] = self._city_counts.get(city, 0) + 1
+            self._entries = entries
+
+    def remove_hotel(self, hotel):
+        hotel_id = str(hotel.id)
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((hotel_id, None))
+            entries = list(self._entries)
+            self._unindex(entries, hotel_id)
+            self._entries = entries
+
+    def lookup(self, prefix, limit=10):
+        """Return up to ``limit`` cities and hotel names starting with ``prefix``"""
+        self._ensure_fresh()
+        key = normalize(prefix)
+        if not key:
+            return []
+        entries = self._entries
+        results = []
+        i = bisect_left(entries, (key,))
+        while i < len(entries) and len(results) < limit and entries[i][0].startswith(key):
+            _, kind, label, hotel_id = entries[i]
+            suggestion = {'type': kind, 'text': label}
+            if hotel_id:
+                suggestion['hotel_id'] = hotel_id
+            results.append(suggestion)
+            i += 1
+        return results
+
+
+index = SuggestIndex()
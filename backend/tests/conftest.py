@@ -0,0 +1,80 @@
+"""
+Fixtures for tests of the Flask app against an in-memory mongomock database.
+
+Run from the backend directory: ``python -m pytest tests`` (needs pytest and
+mongomock). Each test module gets a fresh database.
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('BCRYPT_LOG_ROUNDS', '4')
+os.environ.setdefault('SLOW_QUERY_MS', '0')
+
+# Before the app connects, so its listener is on the client (see query_budget.py)
+import query_budget  # noqa: E402,F401
+
+
+@pytest.fixture(scope='module')
+def app():
+    import mongoengine
+    import mongomock
+    import database
+    from app import app
+    # The app registered a lazy connection to MONGODB_URI; nothing was opened
+    database.disconnect()
+    mongoengine.connect('hotels_test', host='mongodb://localhost', mongo_client_class=mongomock.MongoClient)
+    yield app
+    database.disconnect()
+
+
+@pytest.fixture(scope='module')
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture(scope='module')
+def hotel_ids(app):
+    from models import Hotel
+    hotels = [
+        Hotel(name=f'Test Hotel {number}', description='A test hotel', address=f'{number} Test Street',
+              city=city, country='USA', rating=4.0, price_per_night=100 + number, total_rooms=10,
+              available_rooms=10, amenities=['WiFi']).save()
+        for number, city in enumerate(['New York', 'Boston', 'Chicago', 'New York', 'Boston'])
+    ]
+    return [str(hotel.id) for hotel in hotels]
+
+
+@pytest.fixture(scope='module')
+def auth_headers(client):
+    response = client.post('/api/auth/register', json={
+        'username': 'budget', 'email': 'budget@example.com', 'password': 'password123',
+        'first_name': 'Budget', 'last_name': 'Test'
+    })
+    assert response.status_code == 201, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+@pytest.fixture(scope='module')
+def admin_headers(app):
+    from flask_jwt_extended import create_access_token
+    from models import User
+    admin = User(username='admin', email='admin@example.com', password_hash='-', first_name='Admin',
+                 last_name='Test', is_admin=True).save()
+    with app.app_context():
+        token = create_access_token(identity=str(admin.id), additional_claims={'is_admin': True})
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def make_hotel(app):
+    """Create a hotel with ``rooms`` rooms and return it"""
+    from models import Hotel
+
+    def make(rooms=1, **fields):
+        fields = {'name': 'Small Hotel', 'address': '1 Test Street', 'city': 'Boston', 'country': 'USA',
+                  'price_per_night': 100, 'total_rooms': rooms, 'available_rooms': rooms, **fields}
+        return Hotel(**fields).save()
+    return make
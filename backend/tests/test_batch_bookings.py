@@ -0,0 +1,113 @@
+from datetime import date, timedelta
+
+import occupancy
+
+START = date.today() + timedelta(days=60)
+
+
+def stay(hotel, first, nights=1, **fields):
+    check_in = START + timedelta(days=first)
+    return {'hotel_id': str(hotel.id), 'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=nights)).isoformat(),
+            'num_guests': 1, 'room_type': 'Standard Queen', **fields}
+
+
+def batch(client, headers, mode, items):
+    return client.post('/api/bookings/batch', headers=headers, json={'mode': mode, 'bookings': items})
+
+
+def booked(hotel):
+    """{night offset: rooms booked} of a hotel"""
+    from models import HotelNight
+    return {(counter.night - START).days: counter.booked
+            for counter in HotelNight.objects(hotel=hotel.id) if counter.booked}
+
+
+def bookings_of(hotel):
+    from models import Booking
+    return Booking.objects(hotel=hotel.id).count()
+
+
+def test_all_or_nothing_books_every_item(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=2)
+    response = batch(client, auth_headers, 'all_or_nothing', [stay(hotel, 0, 2), stay(hotel, 1)])
+    assert response.status_code == 201
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (2, 0)
+    assert [result['status'] for result in body['results']] == ['created', 'created']
+    assert bookings_of(hotel) == 2
+    assert booked(hotel) == {0: 1, 1: 2}
+
+
+def test_all_or_nothing_writes_nothing_when_an_item_is_full(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=1)
+    other = make_hotel(rooms=5)
+    response = batch(client, auth_headers, 'all_or_nothing', [stay(other, 0), stay(hotel, 0), stay(hotel, 0)])
+    assert response.status_code == 409
+    body = response.get_json()
+    assert (body['created'], body['failed']) == (0, 3)
+    assert all(result['status'] == 'failed' for result in body['results'])
+    assert body['results'][2]['error'] == 'No rooms available for the selected dates'
+    assert bookings_of(hotel) == bookings_of(other) == 0
+    assert booked(hotel) == booked(other) == {}
+
+
+def test_all_or_nothing_rolls_back_when_the_ledger_refuses(client, auth_headers, make_hotel, monkeypatch):
+    hotel = make_hotel(rooms=1)
+    assert occupancy.reserve_stay(hotel, START + timedelta(days=1), START + timedelta(days=2))
+    # The pre-check saw free rooms, then another booking took night 1
+    monkeypatch.setattr(occupancy, 'check_block', lambda stays: [True] * len(stays))
+    response = batch(client, auth_headers, 'all_or_nothing', [stay(hotel, 0), stay(hotel, 1)])
+    assert response.status_code == 409
+    assert response.get_json()['created'] == 0
+    assert bookings_of(hotel) == 0
+    assert booked(hotel) == {1: 1}
+
+
+def test_all_or_nothing_attempts_nothing_with_an_invalid_item(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=1)
+    response = batch(client, auth_headers, 'all_or_nothing', [stay(hotel, 0), stay(hotel, 1, nights=0)])
+    assert response.status_code == 400
+    results = response.get_json()['results']
+    assert results[0] == {'index': 0, 'status': 'not_attempted'}
+    assert results[1]['status'] == 'failed'
+    assert bookings_of(hotel) == 0
+    assert booked(hotel) == {}
+
+
+def test_best_effort_reports_each_item(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=1)
+    missing = '0' * 24
+    response = batch(client, auth_headers, 'best_effort', [
+        stay(hotel, 0),
+        stay(hotel, 0),
+        dict(stay(hotel, 1), hotel_id=missing),
+        stay(hotel, 2, num_guests=0),
+        stay(hotel, 3, nights=2)
+    ])
+    assert response.status_code == 207
+    body = response.get_json()
+    assert (body['mode'], body['created'], body['failed']) == ('best_effort', 2, 3)
+    results = body['results']
+    assert [result['index'] for result in results] == [0, 1, 2, 3, 4]
+    assert [result['status'] for result in results] == ['created', 'failed', 'failed', 'failed', 'created']
+    assert results[1]['error'] == 'No rooms available for the selected dates'
+    assert results[2]['error'] == 'Hotel not found'
+    assert results[0]['booking']['hotel_id'] == str(hotel.id)
+    assert bookings_of(hotel) == 2
+    assert booked(hotel) == {0: 1, 3: 1, 4: 1}
+
+
+def test_best_effort_all_created_is_201(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=1)
+    response = batch(client, auth_headers, 'best_effort', [stay(hotel, 0), stay(hotel, 1)])
+    assert response.status_code == 201
+    assert response.get_json()['created'] == 2
+
+
+def test_rejects_bad_batches(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=1)
+    assert batch(client, auth_headers, 'sometimes', [stay(hotel, 0)]).status_code == 400
+    assert batch(client, auth_headers, 'best_effort', []).status_code == 400
+    assert batch(client, auth_headers, 'best_effort', [stay(hotel, day) for day in range(51)]).status_code == 400
+    assert bookings_of(hotel) == 0
@@ -0,0 +1,102 @@
+from datetime import date, timedelta
+import csv
+import io
+import json
+
+import booking_export
+
+START = date.today() + timedelta(days=90)
+
+
+def book(client, headers, hotel, first, nights=1, **fields):
+    check_in = START + timedelta(days=first)
+    response = client.post('/api/bookings/', headers=headers, json={
+        'hotel_id': str(hotel.id), 'check_in_date': check_in.isoformat(),
+        'check_out_date': (check_in + timedelta(days=nights)).isoformat(),
+        'num_guests': 1, 'room_type': 'Standard Queen', **fields
+    })
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()['booking']['id']
+
+
+def export(client, headers, **params):
+    return client.get('/api/bookings/export', headers=headers, query_string=params)
+
+
+def test_csv_has_the_export_columns(client, auth_headers, admin_headers, make_hotel):
+    hotel = make_hotel(rooms=5, name='Csv Hotel', city='Denver')
+    booking_id = book(client, auth_headers, hotel, 0, nights=2, special_requests='Late arrival')
+
+    response = export(client, admin_headers, format='csv', hotel_id=str(hotel.id))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=bookings.csv'
+    rows = list(csv.reader(io.StringIO(response.get_data(as_text=True))))
+    assert tuple(rows[0]) == booking_export.COLUMNS
+    assert len(rows) == 2
+    row = dict(zip(rows[0], rows[1]))
+    assert (row['id'], row['hotel_id']) == (booking_id, str(hotel.id))
+    assert (row['hotel_name'], row['hotel_city'], row['hotel_country']) == ('Csv Hotel', 'Denver', 'USA')
+    assert (row['check_in_date'], row['check_out_date']) == (START.isoformat(), (START + timedelta(days=2)).isoformat())
+    assert (row['total_price'], row['status'], row['special_requests']) == ('200.0', 'confirmed', 'Late arrival')
+
+
+def test_streams_one_chunk_per_batch(client, auth_headers, admin_headers, make_hotel):
+    hotel = make_hotel(rooms=5)
+    booking_ids = {book(client, auth_headers, hotel, first) for first in range(5)}
+
+    query = booking_export.export_filter(hotel_id=str(hotel.id))
+    chunks = list(booking_export.encode(booking_export.iter_batches(query, batch_size=2), 'csv'))
+    # The header, then batches of 2, 2 and 1 bookings
+    assert chunks[0] == ','.join(booking_export.COLUMNS) + '\n'
+    assert [chunk.count('\n') for chunk in chunks[1:]] == [2, 2, 1]
+
+    response = export(client, admin_headers, format='ndjson', batch_size=2, hotel_id=str(hotel.id))
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert 'Content-Length' not in response.headers
+    assert response.mimetype == 'application/x-ndjson'
+    chunks = [chunk.decode('utf-8') for chunk in response.iter_encoded()]
+    assert [len(chunk.splitlines()) for chunk in chunks] == [2, 2, 1]
+    rows = [json.loads(line) for line in ''.join(chunks).splitlines()]
+    assert {row['id'] for row in rows} == booking_ids
+    assert all(set(row) == set(booking_export.COLUMNS) for row in rows)
+
+
+def test_resolves_hotels_without_a_summary(client, auth_headers, admin_headers, make_hotel):
+    from models import Booking
+    hotel = make_hotel(rooms=5, name='Older Hotel')
+    booking_id = book(client, auth_headers, hotel, 0)
+    Booking.objects(id=booking_id).update(unset__hotel_summary=True)
+
+    response = export(client, admin_headers, hotel_id=str(hotel.id))
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [row['hotel_name'] for row in rows] == ['Older Hotel']
+
+
+def test_filters(client, auth_headers, admin_headers, make_hotel):
+    hotel = make_hotel(rooms=5)
+    first = book(client, auth_headers, hotel, 0)
+    second = book(client, auth_headers, hotel, 3)
+    cancelled = book(client, auth_headers, hotel, 6)
+    assert client.post(f'/api/bookings/{cancelled}/cancel', headers=auth_headers).status_code == 200
+
+    def exported(**params):
+        response = export(client, admin_headers, hotel_id=str(hotel.id), **params)
+        assert response.status_code == 200
+        return {json.loads(line)['id'] for line in response.get_data(as_text=True).splitlines()}
+
+    assert exported() == {first, second, cancelled}
+    assert exported(status='confirmed') == {first, second}
+    # Both bounds are inclusive
+    assert exported(**{'from': (START + timedelta(days=3)).isoformat()}) == {second, cancelled}
+    assert exported(to=(START + timedelta(days=3)).isoformat()) == {first, second}
+
+
+def test_rejects_bad_requests(client, auth_headers, admin_headers):
+    assert export(client, auth_headers).status_code == 403
+    assert export(client, admin_headers, format='xml').status_code == 400
+    assert export(client, admin_headers, batch_size=0).status_code == 400
+    assert export(client, admin_headers, hotel_id='nope').status_code == 400
+    assert export(client, admin_headers, status='pending').status_code == 400
+    assert export(client, admin_headers, **{'from': '2024-02-01', 'to': '2024-01-01'}).status_code == 400
@@ -0,0 +1,124 @@
+from datetime import date, timedelta
+import json
+
+import catalog
+import hotel_import
+
+
+def row(external_id=None, **fields):
+    record = {'name': 'Imported Hotel', 'address': '1 Import Street', 'city': 'Denver', 'country': 'USA',
+              'price_per_night': 120, 'total_rooms': 10, 'available_rooms': 10, 'amenities': ['WiFi'], **fields}
+    if external_id is not None:
+        record['external_id'] = external_id
+    return record
+
+
+def import_ndjson(client, headers, records):
+    body = ''.join((record if isinstance(record, str) else json.dumps(record)) + '\n' for record in records)
+    return client.post('/api/hotels/import?format=ndjson', headers=headers, data=body.encode('utf-8'))
+
+
+def test_upserts_on_external_id(client, admin_headers):
+    from models import Hotel
+    response = import_ndjson(client, admin_headers, [row('up-1', name='Alpine Lodge'), row('up-2'), row()])
+    assert response.status_code == 200
+    assert response.get_json()['inserted'] == 3
+    created_at = Hotel.objects.get(external_id='up-1').created_at
+
+    response = import_ndjson(client, admin_headers, [row('up-1', name='Alpine Lodge Renamed'), row('up-2'), row()])
+    report = response.get_json()
+    assert (report['processed'], report['inserted'], report['updated'], report['failed']) == (3, 1, 2, 0)
+    assert Hotel.objects(external_id='up-1').count() == 1
+    hotel = Hotel.objects.get(external_id='up-1')
+    assert hotel.name == 'Alpine Lodge Renamed'
+    assert hotel.created_at == created_at
+    # Rows without an external_id are inserted every time
+    assert Hotel.objects(name='Imported Hotel', external_id=None).count() == 2
+
+
+def test_updated_hotel_refreshes_booking_summaries(client, admin_headers, auth_headers):
+    from models import Booking, Hotel
+    import_ndjson(client, admin_headers, [row('sum-1', name='Before')])
+    hotel = Hotel.objects.get(external_id='sum-1')
+    check_in = date.today() + timedelta(days=20)
+    response = client.post('/api/bookings/', headers=auth_headers, json={
+        'hotel_id': str(hotel.id), 'check_in_date': check_in.isoformat(),
+        'check_out_date': (check_in + timedelta(days=1)).isoformat(), 'num_guests': 1, 'room_type': 'Suite'
+    })
+    assert response.status_code == 201
+
+    import_ndjson(client, admin_headers, [row('sum-1', name='After', city='Aspen')])
+    summary = Booking.objects.get(hotel=hotel.id).hotel_summary
+    assert (summary.name, summary.city) == ('After', 'Aspen')
+
+
+def test_reports_rejected_rows(client, admin_headers):
+    from models import Hotel
+    response = import_ndjson(client, admin_headers, [
+        row('bad-1'),
+        '{not json',
+        row('bad-3', price_per_night='cheap'),
+        {'name': 'No Address'},
+        row('bad-5')
+    ])
+    assert response.status_code == 200
+    report = response.get_json()
+    assert (report['processed'], report['inserted'], report['failed']) == (5, 2, 3)
+    assert [error['row'] for error in report['errors']] == [2, 3, 4]
+    assert report['errors'][0]['error'].startswith('Invalid JSON')
+    assert report['aborted'] is None
+    assert Hotel.objects(external_id__in=['bad-1', 'bad-5']).count() == 2
+
+
+def test_reads_csv(client, admin_headers):
+    from models import Hotel
+    body = ('external_id,name,address,city,country,price_per_night,total_rooms,available_rooms,amenities\n'
+            'csv-1,Csv Inn,2 Csv Road,Austin,USA,80,5,5,WiFi|Pool\n')
+    response = client.post('/api/hotels/import', headers={**admin_headers, 'Content-Type': 'text/csv'},
+                           data=body.encode('utf-8'))
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['inserted'] == 1
+    hotel = Hotel.objects.get(external_id='csv-1')
+    assert (hotel.price_per_night, hotel.amenities) == (80, ['WiFi', 'Pool'])
+
+
+def test_partial_import_reports_what_was_written(app):
+    from models import Hotel
+
+    def rows():
+        for number in range(1, 4):
+            yield number, row(f'part-{number}')
+        raise OSError('connection reset')
+
+    report = hotel_import.import_hotels(rows(), batch_size=2)
+    assert report.aborted == 'Stopped after 3 rows: connection reset; the last 1 valid rows may be partly written'
+    assert (report.processed, report.inserted) == (3, 2)
+    assert report.to_dict()['aborted'] == report.aborted
+    assert Hotel.objects(external_id__in=['part-1', 'part-2']).count() == 2
+
+
+def test_import_invalidates_the_catalog(client, admin_headers):
+    import cache
+    import suggest
+    from models import Hotel
+    import_ndjson(client, admin_headers, [row('cat-1', name='Quartz Hotel')])
+    hotel = Hotel.objects.get(external_id='cat-1')
+    etag = client.get(f'/api/hotels/{hotel.id}').headers['ETag']
+    assert cache.hotels.get(hotel.id).name == 'Quartz Hotel'
+    version, _ = catalog.current_state()
+
+    import_ndjson(client, admin_headers, [row('cat-1', name='Quartzite Hotel')])
+    assert catalog.current_state()[0] == version + 1
+    assert cache.hotels.get(hotel.id).name == 'Quartzite Hotel'
+    response = client.get(f'/api/hotels/{hotel.id}')
+    assert response.headers['ETag'] != etag
+    assert response.get_json()['name'] == 'Quartzite Hotel'
+    assert [s['text'] for s in suggest.index.lookup('quartz')] == ['Quartzite Hotel']
+
+    # Nothing written, nothing to invalidate
+    import_ndjson(client, admin_headers, ['{not json'])
+    assert catalog.current_state()[0] == version + 1
+
+
+def test_import_needs_admin(client, auth_headers):
+    assert import_ndjson(client, auth_headers, [row('admin-1')]).status_code == 403
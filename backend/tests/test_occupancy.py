@@ -0,0 +1,201 @@
+from datetime import date, timedelta
+
+import occupancy
+
+START = date.today() + timedelta(days=30)
+
+
+def day(offset):
+    return START + timedelta(days=offset)
+
+
+def ledger(hotel):
+    """{night offset: rooms booked} of a hotel"""
+    from models import HotelNight
+    return {(counter.night - START).days: counter.booked
+            for counter in HotelNight.objects(hotel=hotel.id) if counter.booked}
+
+
+def book(client, headers, hotel, check_in, check_out):
+    return client.post('/api/bookings/', headers=headers, json={
+        'hotel_id': str(hotel.id), 'check_in_date': check_in.isoformat(),
+        'check_out_date': check_out.isoformat(), 'num_guests': 1, 'room_type': 'Standard Queen'
+    })
+
+
+def assert_matches_bookings(hotel):
+    """The ledger of a hotel is what rebuild() computes from its confirmed bookings"""
+    counters = ledger(hotel)
+    occupancy.rebuild(hotel)
+    assert ledger(hotel) == counters
+
+
+def test_reserves_up_to_capacity_and_rejects_past_it(make_hotel):
+    hotel = make_hotel(rooms=2)
+    assert occupancy.reserve_stay(hotel, day(0), day(2))
+    assert occupancy.reserve_stay(hotel, day(1), day(3))
+    assert ledger(hotel) == {0: 1, 1: 2, 2: 1}
+
+    # Night 1 is full, so nothing is taken, not even night 0
+    assert not occupancy.reserve_stay(hotel, day(0), day(2))
+    assert ledger(hotel) == {0: 1, 1: 2, 2: 1}
+    assert occupancy.free_rooms(hotel, day(0), day(3)) == 0
+    assert occupancy.reserve_stay(hotel, day(2), day(3))
+
+
+def test_capacity_is_read_from_the_database(make_hotel):
+    from models import Hotel
+    hotel = make_hotel(rooms=1)
+    Hotel.objects(id=hotel.id).update_one(set__available_rooms=0)
+    # The hotel passed in still says one room
+    assert not occupancy.reserve_stay(hotel, day(0), day(1))
+    assert ledger(hotel) == {}
+
+
+def test_move_keeps_old_nights_until_finished(make_hotel):
+    hotel = make_hotel(rooms=1)
+    old, new = (day(0), day(2)), (day(1), day(3))
+    assert occupancy.reserve_stay(hotel, *old)
+    assert occupancy.move_stay(hotel, old, new)
+    assert ledger(hotel) == {0: 1, 1: 1, 2: 1}
+    # Until the move is finished nobody else gets the old night
+    assert not occupancy.reserve_stay(hotel, day(0), day(1))
+
+    occupancy.finish_move(hotel, old, new)
+    assert ledger(hotel) == {1: 1, 2: 1}
+
+
+def test_undone_move_gives_back_only_new_nights(make_hotel):
+    hotel = make_hotel(rooms=1)
+    old, new = (day(0), day(2)), (day(1), day(3))
+    assert occupancy.reserve_stay(hotel, *old)
+    assert occupancy.move_stay(hotel, old, new)
+    occupancy.undo_move(hotel, old, new)
+    assert ledger(hotel) == {0: 1, 1: 1}
+
+
+def test_move_into_full_night_changes_nothing(make_hotel):
+    hotel = make_hotel(rooms=1)
+    assert occupancy.reserve_stay(hotel, day(0), day(2))
+    assert occupancy.reserve_stay(hotel, day(3), day(4))
+    assert not occupancy.move_stay(hotel, (day(0), day(2)), (day(2), day(4)))
+    assert ledger(hotel) == {0: 1, 1: 1, 3: 1}
+
+
+def test_booking_routes_keep_ledger_in_step(client, auth_headers, make_hotel):
+    hotel = make_hotel(rooms=1)
+    response = book(client, auth_headers, hotel, day(0), day(2))
+    assert response.status_code == 201
+    booking_id = response.get_json()['booking']['id']
+    assert book(client, auth_headers, hotel, day(1), day(2)).status_code == 400
+
+    response = client.put(f'/api/bookings/{booking_id}', headers=auth_headers,
+                          json={'check_in_date': day(1).isoformat(), 'check_out_date': day(3).isoformat()})
+    assert response.status_code == 200
+    assert ledger(hotel) == {1: 1, 2: 1}
+    assert_matches_bookings(hotel)
+
+    assert client.post(f'/api/bookings/{booking_id}/cancel', headers=auth_headers).status_code == 200
+    assert ledger(hotel) == {}
+    # A second cancel is refused and gives nothing back twice
+    assert client.post(f'/api/bookings/{booking_id}/cancel', headers=auth_headers).status_code == 400
+    assert ledger(hotel) == {}
+    assert book(client, auth_headers, hotel, day(0), day(3)).status_code == 201
+    assert_matches_bookings(hotel)
+
+
+def test_rebuild_counts_confirmed_bookings(client, auth_headers, make_hotel):
+    from models import Booking, HotelNight
+    hotel = make_hotel(rooms=3)
+    for check_in, check_out in ((day(0), day(2)), (day(1), day(3)), (day(1), day(2))):
+        assert book(client, auth_headers, hotel, check_in, check_out).status_code == 201
+    Booking.objects(hotel=hotel.id, check_in_date=day(1), check_out_date=day(2)).update(set__status='cancelled')
+    HotelNight.objects(hotel=hotel.id).update(set__booked=7)
+
+    occupancy.rebuild(hotel)
+    assert ledger(hotel) == {0: 1, 1: 2, 2: 1}
+
+
+def test_racing_bookings_for_last_room(client, auth_headers, make_hotel, monkeypatch):
+    hotel = make_hotel(rooms=1)
+    read_capacities = occupancy._current_capacities
+    competitor = []
+
+    def capacities_then_competitor(hotel_ids):
+        capacities = read_capacities(hotel_ids)
+        # The competing request books the room after the first one read the capacity
+        monkeypatch.setattr(occupancy, '_current_capacities', read_capacities)
+        competitor.append(book(client, auth_headers, hotel, day(0), day(1)))
+        return capacities
+
+    monkeypatch.setattr(occupancy, '_current_capacities', capacities_then_competitor)
+    response = book(client, auth_headers, hotel, day(0), day(1))
+    assert competitor[0].status_code == 201
+    assert response.status_code == 400
+    assert ledger(hotel) == {0: 1}
+    assert_matches_bookings(hotel)
+
+
+def test_update_racing_cancel_never_overbooks(client, auth_headers, make_hotel, monkeypatch):
+    from models import Booking
+    hotel = make_hotel(rooms=1)
+    response = book(client, auth_headers, hotel, day(0), day(2))
+    booking_id = response.get_json()['booking']['id']
+    move_stay = occupancy.move_stay
+    others = []
+
+    def move_then_cancel(hotel, old_dates, new_dates):
+        moved = move_stay(hotel, old_dates, new_dates)
+        # Meanwhile the booking is cancelled and someone takes its first night
+        assert client.post(f'/api/bookings/{booking_id}/cancel', headers=auth_headers).status_code == 200
+        others.append(book(client, auth_headers, hotel, day(0), day(1)))
+        return moved
+
+    monkeypatch.setattr(occupancy, 'move_stay', move_then_cancel)
+    response = client.put(f'/api/bookings/{booking_id}', headers=auth_headers,
+                          json={'check_in_date': day(1).isoformat(), 'check_out_date': day(3).isoformat()})
+    assert response.status_code == 409
+    assert others[0].status_code == 201
+    assert Booking.objects.get(id=booking_id).status == 'cancelled'
+    assert ledger(hotel) == {0: 1}
+    assert_matches_bookings(hotel)
+
+
+def test_failed_update_write_never_overbooks(client, auth_headers, make_hotel, monkeypatch):
+    from mongoengine.queryset import QuerySet
+    hotel = make_hotel(rooms=1)
+    response = book(client, auth_headers, hotel, day(0), day(2))
+    booking_id = response.get_json()['booking']['id']
+    move_stay = occupancy.move_stay
+    others = []
+
+    def failing_update_one(self, *args, **kwargs):
+        raise RuntimeError('write failed')
+
+    def move_then_compete(hotel, old_dates, new_dates):
+        moved = move_stay(hotel, old_dates, new_dates)
+        # Another request wants the night this booking is moving away from,
+        # then the booking write fails
+        others.append(book(client, auth_headers, hotel, day(0), day(1)))
+        monkeypatch.setattr(QuerySet, 'update_one', failing_update_one)
+        return moved
+
+    monkeypatch.setattr(occupancy, 'move_stay', move_then_compete)
+    response = client.put(f'/api/bookings/{booking_id}', headers=auth_headers,
+                          json={'check_in_date': day(1).isoformat(), 'check_out_date': day(3).isoformat()})
+    monkeypatch.undo()
+    assert response.status_code == 500
+    assert others[0].status_code == 400
+    assert ledger(hotel) == {0: 1, 1: 1}
+    assert_matches_bookings(hotel)
+
+
+def test_block_is_all_or_nothing(make_hotel):
+    hotel = make_hotel(rooms=3)
+    assert occupancy.reserve_stay(hotel, day(1), day(2))
+    # Three rooms on nights 0 and 1, where only two are free on night 1
+    stays = [(hotel, day(0), day(2))] * 3
+    assert not occupancy.reserve_block(stays)
+    assert ledger(hotel) == {1: 1}
+    assert occupancy.reserve_block(stays[1:])
+    assert ledger(hotel) == {0: 2, 1: 3}
@@ -0,0 +1,71 @@
+from datetime import date, timedelta
+
+import pytest
+
+from query_budget import QueryBudgetExceeded, query_budget, record_queries
+
+
+@pytest.fixture(scope='module')
+def bookings(client, hotel_ids, auth_headers):
+    """A dozen bookings of the test user, spread over every hotel"""
+    for number in range(12):
+        check_in = date.today() + timedelta(days=10 + 3 * number)
+        response = client.post('/api/bookings/', headers=auth_headers, json={
+            'hotel_id': hotel_ids[number % len(hotel_ids)],
+            'check_in_date': check_in.isoformat(),
+            'check_out_date': (check_in + timedelta(days=2)).isoformat(),
+            'num_guests': 2, 'room_type': 'Standard Queen'
+        })
+        assert response.status_code == 201, response.get_json()
+
+
+def _commands(client, path, headers=None):
+    with record_queries() as queries:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return queries
+
+
+def test_bookings_list_within_budget(client, auth_headers, bookings):
+    for per_page in (2, 50):
+        with query_budget(4, f'GET /api/bookings/?per_page={per_page}'):
+            response = client.get(f'/api/bookings/?per_page={per_page}', headers=auth_headers)
+        assert response.status_code == 200
+        assert len(response.get_json()['bookings']) == min(per_page, 12)
+
+
+def test_bookings_list_commands_do_not_grow_with_page_size(client, auth_headers, bookings):
+    small = _commands(client, '/api/bookings/?per_page=2', auth_headers)
+    large = _commands(client, '/api/bookings/?per_page=50', auth_headers)
+    assert len(large) == len(small), large.describe()
+    assert not [query for query in large if query.collection == 'hotels'], large.describe()
+
+
+def test_bookings_cursor_page_within_budget(client, auth_headers, bookings):
+    with query_budget(2, 'GET /api/bookings/?cursor='):
+        response = client.get('/api/bookings/?cursor=&per_page=5', headers=auth_headers)
+    assert response.status_code == 200
+    assert response.get_json()['pagination']['has_next']
+
+
+def test_hotels_list_within_budget(client, hotel_ids):
+    for per_page in (2, 50):
+        with query_budget(3, f'GET /api/hotels?per_page={per_page}'):
+            response = client.get(f'/api/hotels?per_page={per_page}')
+        assert response.status_code == 200
+        assert len(response.get_json()['hotels']) == min(per_page, len(hotel_ids))
+
+
+def test_hotels_list_commands_do_not_grow_with_page_size(client, hotel_ids):
+    small = _commands(client, '/api/hotels?per_page=2&city=New')
+    large = _commands(client, '/api/hotels?per_page=50&city=New')
+    assert len(large) == len(small), large.describe()
+
+
+def test_exceeded_budget_lists_the_commands(client, hotel_ids):
+    with pytest.raises(QueryBudgetExceeded) as excinfo:
+        with query_budget(0, 'GET /api/hotels'):
+            client.get('/api/hotels?per_page=5')
+    message = str(excinfo.value)
+    assert message.startswith('GET /api/hotels: expected at most 0 MongoDB commands')
+    assert ' hotels ' in message
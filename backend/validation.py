@@ -0,0 +1,145 @@
+"""
+Request validation shared by the Flask routes and their ASGI variants.
+
+The functions take plain request values and return parsed ones. Invalid input
+raises ValueError carrying the message the API answers with (as a 400), so
+both the sync and the async routes report errors identically.
+"""
+from datetime import datetime, date
+import re
+
+from suggest import normalize
+
+DATE_FORMAT = '%Y-%m-%d'
+
+# How GET /api/hotels matches the city filter against the normalized city_key
+CITY_MATCH_MODES = ('prefix', 'exact', 'contains')
+
+BOOKING_REQUIRED_FIELDS = ('hotel_id', 'check_in_date', 'check_out_date', 'num_guests', 'room_type')
+
+HOTEL_REQUIRED_FIELDS = ('name', 'address', 'city', 'country', 'price_per_night', 'total_rooms', 'available_rooms')
+HOTEL_TEXT_FIELDS = ('description', 'state', 'zip_code', 'phone', 'email', 'website')
+
+
+def parse_date(value):
+    try:
+        return datetime.strptime(value, DATE_FORMAT).date()
+    except (TypeError, ValueError):
+        raise ValueError('Invalid date format. Use YYYY-MM-DD')
+
+
+def parse_stay(check_in, check_out):
+    """Return (check_in_date, check_out_date) for a stay of at least one night"""
+    if not check_in or not check_out:
+        raise ValueError('Check-in and check-out dates are required')
+    check_in_date = parse_date(check_in)
+    check_out_date = parse_date(check_out)
+    if check_in_date >= check_out_date:
+        raise ValueError('Check-out date must be after check-in date')
+    return check_in_date, check_out_date
+
+
+def parse_listing_stay(check_in, check_out, guests):
+    """
+    Optional stay filter of GET /api/hotels. Returns (None, None) when no
+    dates were given, else the parsed stay.
+    """
+    if not check_in and not check_out:
+        return None, None
+    if not check_in or not check_out:
+        raise ValueError('Both check_in and check_out are required to filter by availability')
+    check_in_date, check_out_date = parse_stay(check_in, check_out)
+    if guests < 1:
+        raise ValueError('guests must be at least 1')
+    return check_in_date, check_out_date
+
+
+def hotel_filter(city=None, city_match='prefix', min_price=None, max_price=None, rating=None):
+    """
+    Raw MongoDB filter for the GET /api/hotels query parameters.
+
+    Exact and prefix city matches compare against the indexed city_key;
+    substring matching is an unanchored regex over every hotel, so clients
+    opt in to it with city_match=contains.
+    """
+    if city_match not in CITY_MATCH_MODES:
+        raise ValueError(f"city_match must be one of: {', '.join(CITY_MATCH_MODES)}")
+
+    query = {}
+    if city:
+        if city_match == 'exact':
+            query['city_key'] = normalize(city)
+        elif city_match == 'prefix':
+            query['city_key'] = {'$regex': '^' + re.escape(normalize(city))}
+        else:
+            query['city'] = {'$regex': re.escape(city), '$options': 'i'}
+
+    price = {}
+    if min_price is not None:
+        price['$gte'] = min_price
+    if max_price is not None:
+        price['$lte'] = max_price
+    if price:
+        query['price_per_night'] = price
+
+    if rating is not None:
+        query['rating'] = {'$gte': rating}
+    return query
+
+
+def parse_new_booking(data):
+    """Validate the body of POST /api/bookings, or one item of /api/bookings/batch"""
+    if not isinstance(data, dict):
+        raise ValueError('Booking must be a JSON object')
+    for field in BOOKING_REQUIRED_FIELDS:
+        if not data.get(field):
+            raise ValueError(f'{field} is required')
+
+    check_in_date = parse_date(data['check_in_date'])
+    check_out_date = parse_date(data['check_out_date'])
+    if check_in_date < date.today():
+        raise ValueError('Check-in date cannot be in the past')
+    if check_in_date >= check_out_date:
+        raise ValueError('Check-out date must be after check-in date')
+
+    return {
+        'hotel_id': data['hotel_id'],
+        'check_in_date': check_in_date,
+        'check_out_date': check_out_date,
+        'num_guests': data['num_guests'],
+        'room_type': data['room_type'],
+        'special_requests': data.get('special_requests', '')
+    }
+
+
+def _number(data, field, kind, default=None):
+    value = data.get(field, default)
+    try:
+        return kind(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+
+
+def parse_hotel(data):
+    """Validate a new hotel: the admin create route and each bulk import row"""
+    if not isinstance(data, dict):
+        raise ValueError('Hotel must be a JSON object')
+    for field in HOTEL_REQUIRED_FIELDS:
+        if data.get(field) in [None, '']:
+            raise ValueError(f'{field} is required')
+
+    hotel = {
+        'name': data['name'],
+        'address': data['address'],
+        'city': data['city'],
+        'country': data['country'],
+        'rating': _number(data, 'rating', float, 0),
+        'price_per_night': _number(data, 'price_per_night', float),
+        'total_rooms': _number(data, 'total_rooms', int),
+        'available_rooms': _number(data, 'available_rooms', int),
+        'amenities': list(data.get('amenities', [])),
+        'images': list(data.get('images', []))
+    }
+    for field in HOTEL_TEXT_FIELDS:
+        hotel[field] = data.get(field, '')
+    return hotel
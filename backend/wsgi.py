@@ -0,0 +1,11 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+The app only registers its MongoDB connection at import time; every worker
+opens its own connection pool after fork (see gunicorn.conf.py).
+"""
+from app import app
+
+application = app
@@ -83,9 +83,15 @@ export const hotelsAPI = {
     if (params.page) queryParams.append('page', params.page);
     if (params.per_page) queryParams.append('per_page', params.per_page);
     if (params.city) queryParams.append('city', params.city);
+    if (params.city_match) queryParams.append('city_match', params.city_match);
     if (params.min_price) queryParams.append('min_price', params.min_price);
     if (params.max_price) queryParams.append('max_price', params.max_price);
     if (params.rating) queryParams.append('rating', params.rating);
+    if (params.check_in) queryParams.append('check_in', params.check_in);
+    if (params.check_out) queryParams.append('check_out', params.check_out);
+    if (params.guests) queryParams.append('guests', params.guests);
+    if (params.cursor !== undefined) queryParams.append('cursor', params.cursor);
+    if (params.include_total) queryParams.append('include_total', 'true');
     
     const url = `${API_BASE_URL}/hotels${queryParams.toString() ? `?${queryParams.toString()}` : ''}`;
     
@@ -114,6 +120,18 @@ export const hotelsAPI = {
     return handleResponse(response);
   },
 
+  // Typeahead suggestions (cities and hotel names) for a search prefix
+  suggest: async (prefix, limit = 10) => {
+    const response = await fetch(
+      `${API_BASE_URL}/hotels/suggest?prefix=${encodeURIComponent(prefix)}&limit=${limit}`,
+      {
+        method: 'GET',
+        headers: getHeaders(false),
+      }
+    );
+    return handleResponse(response);
+  },
+
   // Check hotel availability
   checkAvailability: async (hotelId, checkIn, checkOut) => {
     const response = await fetch(
@@ -126,6 +144,16 @@ export const hotelsAPI = {
     return handleResponse(response);
   },
 
+  // Check availability for many hotels in one request
+  checkAvailabilityBulk: async (hotelIds, checkIn, checkOut) => {
+    const response = await fetch(`${API_BASE_URL}/hotels/availability`, {
+      method: 'POST',
+      headers: getHeaders(false),
+      body: JSON.stringify({ hotel_ids: hotelIds, check_in: checkIn, check_out: checkOut }),
+    });
+    return handleResponse(response);
+  },
+
   // Admin: create hotel
   createHotel: async (hotelData) => {
     const response = await fetch(`${API_BASE_URL}/hotels`, {
@@ -168,6 +196,16 @@ export const bookingsAPI = {
     return handleResponse(response);
   },
 
+  // Create several bookings at once; mode is 'all_or_nothing' (default) or 'best_effort'
+  createBookingsBatch: async (bookings, mode = 'all_or_nothing') => {
+    const response = await fetch(`${API_BASE_URL}/bookings/batch`, {
+      method: 'POST',
+      headers: getHeaders(true),
+      body: JSON.stringify({ bookings, mode }),
+    });
+    return handleResponse(response);
+  },
+
   // Get user bookings
   getUserBookings: async (params = {}) => {
     const queryParams = new URLSearchParams();
@@ -175,6 +213,8 @@ export const bookingsAPI = {
     if (params.page) queryParams.append('page', params.page);
     if (params.per_page) queryParams.append('per_page', params.per_page);
     if (params.status) queryParams.append('status', params.status);
+    if (params.cursor !== undefined) queryParams.append('cursor', params.cursor);
+    if (params.include_total) queryParams.append('include_total', 'true');
     
     const url = `${API_BASE_URL}/bookings${queryParams.toString() ? `?${queryParams.toString()}` : ''}`;
     